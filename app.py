@@ -3,24 +3,111 @@ Flask Web Application for Smart Parking System
 Main application file
 """
 
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, Response, g, has_request_context
+from werkzeug.local import LocalProxy
 from functools import wraps
+import hmac
+import json
+import logging
 import os
+import time
 from datetime import datetime, timedelta
 
 # Import existing modules
-from modules.authentication import Authentication
-from modules.slot_manager import SlotManager
-from modules.booking_manager import BookingManager
+from modules.storage import Storage
+from modules.repositories import SlotRepository
+from modules.event_bus import EventBus
+from modules.booking_scheduler import BookingScheduler
+from modules.overstay_monitor import OverstayMonitor
+from modules.reports import ReportManager
+from modules.booking_archiver import BookingArchiver
+from modules.response_cache import ResponseCache
 from utils.helpers import Helper
+from utils.validators import Validator
+from utils.metrics import Metrics
+from config import Config
+
+logging.basicConfig(level=Config.LOG_LEVEL, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
-app.secret_key = 'smart_parking_secret_key_2025'  # Change this in production
+app.secret_key = Config.SECRET_KEY  # Change this in production
+
+
+class LotServices:
+    """Repositories and background jobs of one lot (one database or memory store shared by all of them)"""
+    
+    def __init__(self, storage, lot):
+        self.lot = lot
+        self.db = storage.database(lot)
+        self.slot_manager = storage.slots(lot)
+        self.booking_manager = storage.bookings(lot)
+        # Reports read the SQL rollups, which only the SQLite backend keeps
+        self.report_manager = ReportManager(self.db, lot=lot) if storage.has_sql else None
+        self.event_bus = EventBus.for_database(self.db)
+        self.response_cache = ResponseCache.for_database(self.db)
+        # Activate scheduled bookings when they fall due
+        self.scheduler = BookingScheduler(self.booking_manager)
+        # Announce bookings that run past their package
+        self.overstay_monitor = OverstayMonitor(self.booking_manager)
+    
+    def start(self):
+        """Start the lot's background jobs"""
+        self.scheduler.start()
+        self.overstay_monitor.start()
+    
+    def stop(self):
+        """Stop the lot's background jobs"""
+        self.scheduler.stop()
+        self.overstay_monitor.stop()
+
+
+storage = auth = metrics = None
+lots = {}
+
+
+def init_storage(backend_storage):
+    """Serve every request from a Storage (SQLite or in-memory); replaces the current one"""
+    global storage, auth, metrics, lots
+    for services in lots.values():
+        services.stop()
+    
+    # Users and admins are global; everything else belongs to one lot
+    storage = backend_storage
+    auth = storage.users
+    metrics = Metrics.for_database(storage.users_db)
+    lots = {lot: LotServices(storage, lot) for lot in storage.lot_ids()}
+    if Config.SCHEDULER_ENABLED:
+        for services in lots.values():
+            services.start()
+
+
+init_storage(Storage())
 
-# Initialize managers
-auth = Authentication()
-slot_manager = SlotManager()
-booking_manager = BookingManager()
+
+def current_lot():
+    """Lot of the current request: ?lot=, then the lot chosen in the session, then the default"""
+    if has_request_context():
+        for lot in (request.args.get('lot'), session.get('lot')):
+            if lot in lots:
+                return lot
+    return storage.default_lot
+
+
+# These follow the lot of the request being served (the default lot outside a request)
+db = LocalProxy(lambda: lots[current_lot()].db)
+slot_manager = LocalProxy(lambda: lots[current_lot()].slot_manager)
+booking_manager = LocalProxy(lambda: lots[current_lot()].booking_manager)
+report_manager = LocalProxy(lambda: lots[current_lot()].report_manager)
+event_bus = LocalProxy(lambda: lots[current_lot()].event_bus)
+response_cache = LocalProxy(lambda: lots[current_lot()].response_cache)
+
+# Seconds between SSE keep-alive comments on idle streams
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'
+}
 
 
 # Login required decorator
@@ -44,7 +131,105 @@ def admin_required(f):
     return decorated_function
 
 
+def sql_required(f):
+    """For routes built on SQL (reports, archive, profiler): 501 on the in-memory backend"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not storage.has_sql:
+            return jsonify({'success': False, 'message': 'Not available with the in-memory storage backend.'}), 501
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def dashboard_stats(lot=None):
+    """Slot and booking statistics, served from the response cache between writes"""
+    services = lots[lot or current_lot()]
+    return services.response_cache.get_or_load('stats', lambda: {
+        'slots': services.slot_manager.get_slot_statistics(),
+        'bookings': services.booking_manager.get_booking_statistics()
+    })
+
+
+@app.context_processor
+def inject_lots():
+    return {'lot_ids': list(lots), 'current_lot': current_lot()}
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Time every request under its route pattern (not the raw path, to keep labels bounded)"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe_request(route, request.method, response.status_code, time.perf_counter() - started)
+    return response
+
+
+def active_booking_payload(user_id, lot=None):
+    """JSON body for /api/booking/active"""
+    active_booking = lots[lot or current_lot()].booking_manager.get_active_booking(user_id)
+    
+    if active_booking:
+        duration = Helper.calculate_duration(active_booking[4])
+        cost = Helper.calculate_cost(duration)
+        
+        return {
+            'success': True,
+            'booking': {
+                'id': active_booking[0],
+                'slot_number': active_booking[1],
+                'slot_type': active_booking[2],
+                'vehicle_number': active_booking[3],
+                'booking_time': active_booking[4],
+                'booking_time_formatted': Helper.format_datetime(active_booking[4]),
+                'floor': active_booking[5],
+                'duration': duration,
+                'cost': cost
+            }
+        }
+    else:
+        return {'success': False, 'message': 'No active booking'}
+
+
+def floor_slots_payload(floor, lot=None):
+    """JSON body for /api/slots/floor/<floor>"""
+    available_slots = lots[lot or current_lot()].slot_manager.get_available_slots(floor=floor)
+    
+    return [
+        {
+            'id': slot[0],
+            'slot_number': slot[1],
+            'slot_type': slot[2],
+            'floor': slot[3]
+        }
+        for slot in available_slots
+    ]
+
+
+def stats_body(lot=None):
+    """Serialized /api/stats body; cached too, so repeat polls skip JSON encoding"""
+    lot = lot or current_lot()
+    return lots[lot].response_cache.get_or_load('stats.json', lambda: json.dumps(dashboard_stats(lot)))
+
+
 # Routes
+@app.route('/lot', methods=['POST'])
+@login_required
+def select_lot():
+    """Switch the session to another parking lot"""
+    lot = request.form.get('lot')
+    if lot in lots:
+        session['lot'] = lot
+    else:
+        flash('Unknown parking lot', 'danger')
+    return redirect(url_for('index'))
+
+
 @app.route('/')
 def index():
     """Home page"""
@@ -119,12 +304,11 @@ def logout():
 @admin_required
 def admin_dashboard():
     """Admin dashboard"""
-    stats = slot_manager.get_slot_statistics()
-    booking_stats = booking_manager.get_booking_statistics()
+    cached = dashboard_stats()
     
     return render_template('admin/dashboard.html', 
-                         stats=stats, 
-                         booking_stats=booking_stats)
+                         stats=cached['slots'], 
+                         booking_stats=cached['bookings'])
 
 
 @app.route('/admin/slots')
@@ -142,8 +326,9 @@ def add_slot():
     slot_number = request.form.get('slot_number')
     slot_type = request.form.get('slot_type')
     floor = request.form.get('floor')
+    priority = request.form.get('priority', 0, type=int)
     
-    result = slot_manager.add_slot(slot_number, slot_type, int(floor))
+    result = slot_manager.add_slot(slot_number, slot_type, int(floor), priority=priority)
     
     if result['success']:
         flash(result['message'], 'success')
@@ -153,6 +338,41 @@ def add_slot():
     return redirect(url_for('admin_slots'))
 
 
+def read_slot_import(req):
+    """Parse uploaded or posted slot rows; returns the row list or raises ValueError"""
+    upload = req.files.get('file')
+    if upload and upload.filename:
+        fmt = 'json' if upload.filename.lower().endswith('.json') else 'csv'
+        content = upload.read().decode('utf-8-sig', errors='replace')
+    elif req.is_json:
+        fmt = 'json'
+        content = req.get_data(as_text=True)
+    else:
+        fmt = 'csv'
+        content = req.get_data(as_text=True)
+    return slot_manager.parse_slot_import(content, fmt)
+
+
+@app.route('/admin/slots/import', methods=['POST'])
+@admin_required
+def import_slots():
+    """Bulk import slots from an uploaded CSV or JSON file"""
+    try:
+        rows = read_slot_import(request)
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('admin_slots'))
+    
+    result = slot_manager.add_slots_bulk(rows, atomic=request.form.get('atomic') == '1')
+    flash(result['message'], 'success' if result['success'] else 'danger')
+    for error in result['errors'][:10]:
+        flash(f"Row {error['row']} ({error['slot_number'] or '-'}): {error['message']}", 'warning')
+    if len(result['errors']) > 10:
+        flash(f"...and {len(result['errors']) - 10} more rejected row(s).", 'warning')
+    
+    return redirect(url_for('admin_slots'))
+
+
 @app.route('/admin/slots/delete/<int:slot_id>', methods=['POST'])
 @admin_required
 def delete_slot(slot_id):
@@ -167,26 +387,81 @@ def delete_slot(slot_id):
     return redirect(url_for('admin_slots'))
 
 
+def parse_booking_filters(args):
+    """Read admin booking listing filters from query arguments"""
+    filters = {}
+    
+    status = args.get('status')
+    if status:
+        filters['status'] = status
+    
+    for arg, key in (('from', 'date_from'), ('to', 'date_to')):
+        value = args.get(arg)
+        if value:
+            if not Validator.validate_date(value):
+                raise ValueError(f"Invalid '{arg}' date. Use YYYY-MM-DD.")
+            filters[key] = value
+    
+    floor = args.get('floor')
+    if floor:
+        if not floor.isdigit():
+            raise ValueError("Invalid floor.")
+        filters['floor'] = int(floor)
+    
+    if args.get('history') == '1':
+        filters['include_history'] = True
+    
+    return filters
+
+
 @app.route('/admin/bookings')
 @admin_required
 def admin_bookings():
     """View all bookings"""
     filter_type = request.args.get('filter', 'all')
+    cursor = request.args.get('cursor')
+    
+    try:
+        filters = parse_booking_filters(request.args)
+    except ValueError as e:
+        flash(str(e), 'danger')
+        filters = {}
+    
+    page = booking_manager.get_bookings_page(
+        view=filter_type,
+        limit=request.args.get('limit', 50, type=int),
+        cursor=cursor,
+        **filters
+    )
     
     if filter_type == 'active':
-        bookings_raw = booking_manager.get_active_bookings()
         # Add duration calculation for active bookings
         bookings = []
-        for booking in bookings_raw:
-            # booking structure: id, username, phone, slot_number, vehicle_number, booking_time
-            duration = Helper.calculate_duration(booking[5])
+        for booking in page['bookings']:
+            # booking structure: id, username, phone, slot_number, vehicle_number, booking_time, booking_ts
             duration_detailed = Helper.calculate_duration_detailed(booking[5])
-            # Add duration as 7th element
-            bookings.append(booking + (duration_detailed['display'],))
+            # The template shows the six display columns, then the duration as the 7th element
+            # (booking_ts only feeds the page cursor)
+            bookings.append(booking[:6] + (duration_detailed['display'],))
     else:
-        bookings = booking_manager.get_all_bookings()
+        bookings = page['bookings']
     
-    return render_template('admin/bookings.html', bookings=bookings, filter_type=filter_type)
+    return render_template('admin/bookings.html',
+                         bookings=bookings,
+                         filter_type=filter_type,
+                         filters={k: v for k, v in request.args.items() if k in ('status', 'from', 'to', 'floor', 'history')},
+                         cursor=cursor,
+                         next_cursor=page['next_cursor'])
+
+
+@app.route('/admin/overstays')
+@admin_required
+def admin_overstays():
+    """Active bookings that ran past their package, with live overage estimates"""
+    floor = request.args.get('floor', type=int)
+    return render_template('admin/overstays.html',
+                         overstays=booking_manager.get_overstays(floor=floor, limit=booking_manager.MAX_PAGE_SIZE),
+                         floor=floor)
 
 
 # User Routes
@@ -197,11 +472,11 @@ def user_dashboard():
     user_id = session.get('user_id')
     username = session.get('username')
     
-    print(f"DEBUG: Dashboard accessed by User ID: {user_id}, Username: {username}")
+    logger.debug("Dashboard accessed by user %s (%s)", user_id, username)
     
     # Get active booking
     active_booking = booking_manager.get_active_booking(user_id)
-    print(f"DEBUG: Active booking for user {user_id}: {active_booking}")
+    logger.debug("Active booking for user %s: %s", user_id, active_booking)
     
     # Calculate duration and cost if active booking exists
     booking_info = None
@@ -238,12 +513,12 @@ def user_dashboard():
         })
     
     # Get available slots count
-    available_slots = slot_manager.get_available_slots()
+    available_count = slot_manager.count_available_slots()
     
     return render_template('user/dashboard.html', 
                          booking=booking_info,
                          scheduled_bookings=formatted_scheduled,
-                         available_count=len(available_slots))
+                         available_count=available_count)
 
 
 @app.route('/user/book-slot', methods=['GET', 'POST'])
@@ -284,18 +559,25 @@ def book_slot():
                 booking_date = None
                 booking_time = None
             
-            print(f"DEBUG: Booking attempt - User: {user_id}, Slot: {slot_id}, Vehicle: {vehicle_number}, Package: {package}, Time Option: {booking_time_option}")
+            logger.debug("Booking attempt - user %s, slot %s, vehicle %s, package %s, time option %s",
+                         user_id, slot_id, vehicle_number, package, booking_time_option)
+            
+            # 'auto' lets the allocator pick the best free slot of the requested type
+            auto_assign = slot_id == 'auto'
+            slot_type = request.form.get('slot_type')
             
             result = booking_manager.book_slot(
                 user_id, 
-                int(slot_id), 
+                None if auto_assign else int(slot_id), 
                 vehicle_number,
                 booking_date=booking_date,
                 booking_time=booking_time,
-                package=package
+                package=package,
+                slot_type=slot_type if slot_type in SlotRepository.SLOT_TYPES else None,
+                floor=request.form.get('preferred_floor', type=int) if auto_assign else None
             )
             
-            print(f"DEBUG: Booking result - {result}")
+            logger.debug("Booking result - %s", result)
             
             if result['success']:
                 flash(result['message'], 'success')
@@ -304,17 +586,14 @@ def book_slot():
                 flash(result['message'], 'danger')
                 return redirect(url_for('book_slot'))
         except Exception as e:
-            print(f"ERROR in book_slot: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error in book_slot")
             flash(f'Booking error: {str(e)}', 'danger')
             return redirect(url_for('book_slot'))
     
     # Get user's saved vehicle number
     user_id = session.get('user_id')
-    user_query = "SELECT vehicle_number FROM users WHERE id = ?"
-    user_data = auth.db.fetch_one(user_query, (user_id,))
-    saved_vehicle = user_data[0] if user_data and user_data[0] else None
+    profile = auth.get_user_profile(user_id)
+    saved_vehicle = profile['vehicle_number'] if profile and profile['vehicle_number'] else None
     
     # Get available slots grouped by floor
     available_slots = slot_manager.get_available_slots()
@@ -338,6 +617,7 @@ def book_slot():
     return render_template('user/book_slot.html', 
                          slots_by_floor=slots_by_floor,
                          floors=floors,
+                         slot_types=SlotRepository.SLOT_TYPES,
                          saved_vehicle=saved_vehicle)
 
 
@@ -348,11 +628,11 @@ def cancel_booking(booking_id):
     try:
         user_id = session.get('user_id')
         
-        print(f"DEBUG: Cancel booking attempt - User: {user_id}, Booking ID: {booking_id}")
+        logger.debug("Cancel booking attempt - user %s, booking %s", user_id, booking_id)
         
         result = booking_manager.cancel_booking(booking_id, user_id)
         
-        print(f"DEBUG: Cancel result - {result}")
+        logger.debug("Cancel result - %s", result)
         
         if result['success']:
             # Display comprehensive checkout information
@@ -365,9 +645,7 @@ def cancel_booking(booking_id):
         
         return redirect(url_for('user_dashboard'))
     except Exception as e:
-        print(f"ERROR in cancel_booking: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in cancel_booking")
         flash(f'Checkout error: {str(e)}', 'danger')
         return redirect(url_for('user_dashboard'))
 
@@ -377,7 +655,8 @@ def cancel_booking(booking_id):
 def user_bookings():
     """View booking history"""
     user_id = session.get('user_id')
-    bookings = booking_manager.get_user_bookings(user_id)
+    include_history = request.args.get('history') == '1'
+    bookings = booking_manager.get_user_bookings(user_id, include_history=include_history)
     
     # Get scheduled bookings
     scheduled = booking_manager.get_scheduled_bookings(user_id)
@@ -412,7 +691,8 @@ def user_bookings():
     
     return render_template('user/bookings.html', 
                          bookings=formatted_bookings,
-                         scheduled_bookings=formatted_scheduled)
+                         scheduled_bookings=formatted_scheduled,
+                         include_history=include_history)
 
 
 @app.route('/user/cancel-scheduled/<int:booking_id>', methods=['POST'])
@@ -430,7 +710,7 @@ def cancel_scheduled(booking_id):
         
         return redirect(url_for('user_bookings'))
     except Exception as e:
-        print(f"ERROR in cancel_scheduled: {str(e)}")
+        logger.exception("Error in cancel_scheduled")
         flash(f'Error cancelling scheduled booking: {str(e)}', 'danger')
         return redirect(url_for('user_bookings'))
 
@@ -441,63 +721,299 @@ def cancel_scheduled(booking_id):
 @login_required
 def get_active_booking_api():
     """Get active booking data (AJAX)"""
-    user_id = session.get('user_id')
-    active_booking = booking_manager.get_active_booking(user_id)
-    
-    if active_booking:
-        duration = Helper.calculate_duration(active_booking[4])
-        cost = Helper.calculate_cost(duration)
-        
-        return jsonify({
-            'success': True,
-            'booking': {
-                'id': active_booking[0],
-                'slot_number': active_booking[1],
-                'slot_type': active_booking[2],
-                'vehicle_number': active_booking[3],
-                'booking_time': active_booking[4],
-                'booking_time_formatted': Helper.format_datetime(active_booking[4]),
-                'floor': active_booking[5],
-                'duration': duration,
-                'cost': cost
-            }
-        })
-    else:
-        return jsonify({'success': False, 'message': 'No active booking'})
+    return jsonify(active_booking_payload(session.get('user_id')))
 
 
 @app.route('/api/slots/floor/<int:floor>')
 @login_required
 def get_slots_by_floor(floor):
     """Get slots by floor (AJAX)"""
-    available_slots = slot_manager.get_available_slots()
+    return jsonify(floor_slots_payload(floor))
+
+
+@app.route('/api/fleet/bookings', methods=['POST'])
+@login_required
+def book_fleet_api():
+    """Book a slot for every vehicle in a JSON list in one transaction (AJAX)"""
+    data = request.get_json(silent=True) or {}
+    vehicles = data.get('vehicles')
+    if not isinstance(vehicles, list) or not vehicles:
+        return jsonify({'success': False, 'message': "Give 'vehicles' as a list of vehicle numbers."}), 400
     
-    floor_slots = [
-        {
-            'id': slot[0],
-            'slot_number': slot[1],
-            'slot_type': slot[2],
-            'floor': slot[3]
-        }
-        for slot in available_slots if slot[3] == floor
-    ]
+    slot_type = data.get('slot_type', 'Regular')
+    if slot_type not in SlotRepository.SLOT_TYPES:
+        return jsonify({'success': False, 'message': f'Unknown slot type {slot_type}.'}), 400
+    
+    floor = data.get('floor')
+    if floor is not None and not isinstance(floor, int):
+        return jsonify({'success': False, 'message': 'Floor must be a whole number.'}), 400
+    
+    result = booking_manager.book_fleet(session.get('user_id'), vehicles, slot_type=slot_type, floor=floor,
+                                        package=data.get('package', 'hourly'),
+                                        atomic=data.get('atomic', True) is not False)
+    return jsonify(result), 200 if result['success'] else 422
+
+
+@app.route('/api/fleet/checkout', methods=['POST'])
+@login_required
+def checkout_fleet_api():
+    """Check out a list of active bookings (or all of them) in one transaction (AJAX)"""
+    data = request.get_json(silent=True) or {}
+    booking_ids = data.get('booking_ids')
+    if booking_ids is not None and not (isinstance(booking_ids, list)
+                                        and all(isinstance(booking_id, int) for booking_id in booking_ids)):
+        return jsonify({'success': False, 'message': "'booking_ids' must be a list of booking ids."}), 400
     
-    return jsonify(floor_slots)
+    result = booking_manager.checkout_fleet(session.get('user_id'), booking_ids)
+    return jsonify(result), 200 if result['success'] else 422
+
+
+@app.route('/api/admin/bookings')
+@admin_required
+def get_bookings_api():
+    """Get one keyset page of bookings (AJAX)"""
+    view = request.args.get('view', 'all')
+    
+    try:
+        filters = parse_booking_filters(request.args)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    page = booking_manager.get_bookings_page(
+        view=view,
+        limit=request.args.get('limit', 50, type=int),
+        cursor=request.args.get('cursor'),
+        **filters
+    )
+    
+    if view == 'active':
+        bookings = [
+            {
+                'id': b[0],
+                'username': b[1],
+                'phone': b[2],
+                'slot_number': b[3],
+                'vehicle_number': b[4],
+                'booking_time': b[5]
+            }
+            for b in page['bookings']
+        ]
+    else:
+        bookings = [
+            {
+                'id': b[0],
+                'username': b[1],
+                'slot_number': b[2],
+                'vehicle_number': b[3],
+                'booking_time': b[4],
+                'checkout_time': b[5],
+                'status': b[6]
+            }
+            for b in page['bookings']
+        ]
+    
+    return jsonify({
+        'success': True,
+        'bookings': bookings,
+        'next_cursor': page['next_cursor']
+    })
 
 
 @app.route('/api/stats')
 @admin_required
 def get_stats():
     """Get statistics (AJAX)"""
-    stats = slot_manager.get_slot_statistics()
-    booking_stats = booking_manager.get_booking_statistics()
+    return Response(stats_body(), mimetype='application/json')
+
+
+@app.route('/api/admin/slots/import', methods=['POST'])
+@admin_required
+def import_slots_api():
+    """Bulk import slots from a JSON or CSV body (AJAX); returns the per-row report"""
+    try:
+        rows = read_slot_import(request)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     
+    result = slot_manager.add_slots_bulk(rows, atomic=request.args.get('atomic') == '1')
+    return jsonify(result), 200 if result['success'] else 422
+
+
+@app.route('/api/admin/billing/reconcile')
+@admin_required
+@sql_required
+def reconcile_billing():
+    """Recompute billed amounts for a date range in one batch (AJAX)"""
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    if not (date_from and date_to and Validator.validate_date(date_from) and Validator.validate_date(date_to)):
+        return jsonify({'success': False, 'message': "Give 'from' and 'to' dates as YYYY-MM-DD."}), 400
+    
+    report = booking_manager.reconcile_billing(date_from, date_to)
+    report['success'] = True
+    return jsonify(report)
+
+
+@app.route('/api/reports')
+@admin_required
+@sql_required
+def get_reports():
+    """Revenue and occupancy report from the rollups (AJAX)"""
+    date_from = request.args.get('from')
+    date_to = request.args.get('to', date_from)
+    if not (date_from and date_to and Validator.validate_date(date_from) and Validator.validate_date(date_to)):
+        return jsonify({'success': False, 'message': "Give 'from' (and optionally 'to') dates as YYYY-MM-DD."}), 400
+    
+    group_by = [column for column in request.args.get('group_by', '').split(',') if column]
+    floor = request.args.get('floor', type=int)
+    
+    try:
+        report = report_manager.get_report(date_from, date_to,
+                                           granularity=request.args.get('granularity', 'day'),
+                                           group_by=group_by, floor=floor)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    report['success'] = True
+    return jsonify(report)
+
+
+@app.route('/api/admin/archive', methods=['POST'])
+@admin_required
+@sql_required
+def archive_bookings():
+    """Move old finished bookings into the archive database (AJAX)"""
+    days = request.args.get('older_than_days', type=float)
+    if days is not None and days < 0:
+        return jsonify({'success': False, 'message': 'older_than_days must not be negative.'}), 400
+    
+    result = BookingArchiver(db, older_than_days=days).run()
+    result['success'] = True
+    return jsonify(result)
+
+
+@app.route('/api/admin/settle', methods=['POST'])
+@admin_required
+def settle_bookings():
+    """Check out every active booking matching the filters in one transaction (AJAX)"""
+    data = request.get_json(silent=True) or request.form
+    try:
+        floor = int(data['floor']) if data.get('floor') not in (None, '') else None
+        hours = float(data['older_than_hours']) if data.get('older_than_hours') not in (None, '') else None
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'floor and older_than_hours must be numbers.'}), 400
+    if hours is not None and hours < 0:
+        return jsonify({'success': False, 'message': 'older_than_hours must not be negative.'}), 400
+    
+    flags = {name: str(data.get(name, '')).lower() in ('1', 'true') for name in ('overstayed', 'dry_run')}
+    result = booking_manager.settle_bookings(floor=floor, older_than_hours=hours, **flags)
+    return jsonify(result), 200 if result['success'] else 500
+
+
+@app.route('/api/admin/overstays')
+@admin_required
+def get_overstays_api():
+    """Active bookings past their expected end, longest overdue first (AJAX)"""
+    limit = min(max(request.args.get('limit', 50, type=int), 1), booking_manager.MAX_PAGE_SIZE)
+    overstays = booking_manager.get_overstays(floor=request.args.get('floor', type=int), limit=limit)
     return jsonify({
-        'slots': stats,
-        'bookings': booking_stats
+        'success': True,
+        'count': len(overstays),
+        'overage_total': round(sum(overstay['overage'] for overstay in overstays), 2),
+        'overstays': overstays
     })
 
 
+@app.route('/api/admin/cache')
+@admin_required
+def get_cache_stats():
+    """Get user and response cache hit/miss counters (AJAX)"""
+    return jsonify({
+        'user_cache': auth.cache.stats() if auth.cache else None,
+        'response_cache': response_cache.stats()
+    })
+
+
+@app.route('/api/admin/queries')
+@admin_required
+@sql_required
+def get_query_profile():
+    """Top statements by total time and recent slow queries from the query profiler (AJAX)"""
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+    return jsonify(db.profiler.summary(limit))
+
+
+@app.route('/api/admin/queries', methods=['POST'])
+@admin_required
+@sql_required
+def control_query_profile():
+    """Enable, disable or reset the query profiler (AJAX)"""
+    data = request.get_json(silent=True) or request.form
+    action = data.get('action')
+    if action == 'enable':
+        db.profiler.enable()
+    elif action == 'disable':
+        db.profiler.disable()
+    elif action == 'reset':
+        db.profiler.reset()
+    else:
+        return jsonify({'success': False, 'message': "Action must be 'enable', 'disable' or 'reset'."}), 400
+    
+    return jsonify({'success': True, 'enabled': db.profiler.enabled})
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Request and query metrics in Prometheus text format (admin session or metrics token)"""
+    token = request.headers.get('Authorization', '')
+    token_ok = bool(Config.METRICS_TOKEN) and hmac.compare_digest(token, f"Bearer {Config.METRICS_TOKEN}")
+    if not token_ok and session.get('role') != 'admin':
+        return Response('Admin access required\n', status=403, mimetype='text/plain')
+    
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def stream_channels(floor, role):
+    """Event bus channels an /api/stream client follows (None when it has to pick a floor)"""
+    if floor is not None:
+        return [EventBus.floor_channel(floor)]
+    if role == 'admin':
+        return [EventBus.ADMIN_CHANNEL]
+    return None
+
+
+def sse_message(event):
+    """One bus event as a server-sent events message"""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+@app.route('/api/stream')
+@login_required
+def event_stream():
+    """Server-sent events stream of live changes: slot changes of one floor,
+    or (admins only) every slot and booking change"""
+    channels = stream_channels(request.args.get('floor', type=int), session.get('role'))
+    if channels is None:
+        return jsonify({'success': False, 'message': 'Specify a floor to follow'}), 400
+    
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    subscription = event_bus.subscribe(channels, last_event_id=last_event_id)
+    
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                event = subscription.get(timeout=STREAM_HEARTBEAT_SECONDS)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield sse_message(event)
+        finally:
+            subscription.close()
+    
+    return Response(generate(), mimetype='text/event-stream', headers=STREAM_HEADERS)
+
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
@@ -0,0 +1,33 @@
+"""
+Archive old bookings
+Moves Completed/Cancelled bookings older than the configured age into the
+archive database. Run it from cron (or by hand) against the live database;
+a running app notices the commits through its write epoch check
+(DB_SYNC_SECONDS) and drops its cached counters and responses.
+"""
+import argparse
+
+from config import Config
+from modules.booking_archiver import BookingArchiver
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Move old finished bookings into the archive database')
+    parser.add_argument('--older-than-days', type=float, default=Config.ARCHIVE_AFTER_DAYS,
+                        help='archive bookings that finished more than this many days ago')
+    parser.add_argument('--batch-size', type=int, default=Config.ARCHIVE_BATCH_SIZE,
+                        help='bookings moved per transaction')
+    parser.add_argument('--max-batches', type=int, default=None,
+                        help='stop after this many batches (default: until done)')
+    parser.add_argument('--lot', default=None,
+                        help='parking lot to archive (default: the default lot)')
+    args = parser.parse_args()
+
+    archiver = BookingArchiver(older_than_days=args.older_than_days, batch_size=args.batch_size, lot=args.lot)
+    result = archiver.run(max_batches=args.max_batches)
+    print(f"Archived {result['archived']} booking(s) in {result['batches']} batch(es) "
+          f"(finished before {result['cutoff']})")
+
+
+if __name__ == '__main__':
+    main()
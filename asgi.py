@@ -0,0 +1,285 @@
+"""
+ASGI entry point for the Smart Parking System
+Serves the polled JSON endpoints on asyncio and hands every other route to the Flask app
+
+Run with any ASGI server, e.g.:  uvicorn asgi:application --port 5000
+"""
+
+import asyncio
+import io
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import CookieError, SimpleCookie
+from urllib.parse import parse_qs
+
+from itsdangerous import BadSignature
+
+import app as web
+from config import Config
+from database.async_db import AsyncDatabase, Overloaded
+
+_DONE = object()
+
+
+class ApiServer:
+    """ASGI application for the asyncio serving mode.
+
+    GET /api/booking/active, /api/slots/floor/<floor> and /api/stats are
+    answered by async views: the Flask session cookie is verified on the
+    event loop and the SQLite work is awaited through AsyncDatabase, so a
+    waiting poll holds no thread. GET /api/stream is served on the loop too:
+    the event bus wakes it through loop.call_soon_threadsafe, so an open
+    stream holds no thread either and cannot starve the pages. Every other
+    request (the HTML pages, forms and admin APIs) runs the unchanged Flask
+    app on a separate thread pool, with the response streamed back chunk by
+    chunk.
+    """
+
+    def __init__(self, flask_app=None, database=None, wsgi_workers=None):
+        self.flask_app = flask_app or web.app
+        self.database = database or AsyncDatabase()
+        self.wsgi_executor = ThreadPoolExecutor(max_workers=wsgi_workers or Config.ASYNC_WSGI_WORKERS,
+                                                thread_name_prefix='async-wsgi')
+        self.login_url = self.flask_app.url_map.bind('').build('login')
+        # (pattern, Flask rule used as the metrics label, handler, admin only)
+        self.routes = [
+            (re.compile(r'/api/booking/active'), '/api/booking/active', self.active_booking, False),
+            (re.compile(r'/api/slots/floor/(\d+)'), '/api/slots/floor/<int:floor>', self.floor_slots, False),
+            (re.compile(r'/api/stats'), '/api/stats', self.stats, True),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            if scope['method'] == 'GET' and scope['path'] == '/api/stream':
+                await self.event_stream(scope, receive, send)
+                return
+            route = self.match(scope)
+            if route is None:
+                await self.wsgi(scope, receive, send)
+            else:
+                await self.api(route, scope, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.database.close()
+                self.wsgi_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def match(self, scope):
+        """(rule, handler, admin only, path arguments) for an async route, else None"""
+        if scope['method'] != 'GET':
+            return None
+        for pattern, rule, handler, admin_only in self.routes:
+            found = pattern.fullmatch(scope['path'])
+            if found:
+                return rule, handler, admin_only, found.groups()
+        return None
+
+    def load_session(self, scope):
+        """Decode the signed Flask session cookie ({} when missing or invalid)"""
+        cookie_name = self.flask_app.config['SESSION_COOKIE_NAME']
+        header = b'; '.join(value for name, value in scope['headers'] if name == b'cookie')
+        try:
+            morsel = SimpleCookie(header.decode('latin-1')).get(cookie_name)
+        except CookieError:
+            return {}
+        if morsel is None:
+            return {}
+
+        serializer = self.flask_app.session_interface.get_signing_serializer(self.flask_app)
+        max_age = int(self.flask_app.permanent_session_lifetime.total_seconds())
+        try:
+            return serializer.loads(morsel.value, max_age=max_age)
+        except BadSignature:
+            return {}
+
+    @staticmethod
+    def lot_for(scope, session):
+        """The lot a request is for, chosen the same way as app.current_lot()"""
+        for lot in (parse_qs(scope.get('query_string', b'').decode('latin-1')).get('lot', [None])[0],
+                    session.get('lot')):
+            if lot in web.lots:
+                return lot
+        return web.storage.default_lot
+
+    # Async views: each returns (status, JSON body as str)
+
+    async def active_booking(self, lot, session):
+        user_id = session['user_id']
+        payload = await self.database.call(('active_booking', lot, user_id), web.active_booking_payload, user_id, lot)
+        return 200, self.flask_app.json.dumps(payload)
+
+    async def floor_slots(self, lot, session, floor):
+        floor = int(floor)
+        payload = await self.database.call(('floor_slots', lot, floor), web.floor_slots_payload, floor, lot)
+        return 200, self.flask_app.json.dumps(payload)
+
+    async def stats(self, lot, session):
+        return 200, await self.database.call(('stats', lot), web.stats_body, lot)
+
+    async def api(self, route, scope, send):
+        rule, handler, admin_only, args = route
+        started = time.perf_counter()
+
+        session = self.load_session(scope)
+        if 'user_id' not in session or (admin_only and session.get('role') != 'admin'):
+            # Same outcome as login_required / admin_required on the Flask routes
+            status = 302
+            await self.respond(send, status, b'', [(b'location', self.login_url.encode())])
+        else:
+            try:
+                status, body = await handler(self.lot_for(scope, session), session, *args)
+                await self.respond(send, status, body.encode(), [(b'content-type', b'application/json')])
+            except Overloaded:
+                status = 503
+                await self.respond(send, status, b'{"message":"Server busy, retry shortly","success":false}',
+                                   [(b'content-type', b'application/json'), (b'retry-after', b'1')])
+
+        web.metrics.observe_request(rule, 'GET', status, time.perf_counter() - started)
+
+    async def event_stream(self, scope, receive, send):
+        """/api/stream as the Flask route serves it, fed from the event bus on the loop"""
+        started = time.perf_counter()
+        while (await receive()).get('more_body'):
+            pass
+
+        session = self.load_session(scope)
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        try:
+            floor = int(query.get('floor', [''])[0])
+        except ValueError:
+            floor = None
+        channels = web.stream_channels(floor, session.get('role'))
+        if 'user_id' not in session:
+            status = 302
+            await self.respond(send, status, b'', [(b'location', self.login_url.encode())])
+        elif channels is None:
+            status = 400
+            body = self.flask_app.json.dumps({'success': False, 'message': 'Specify a floor to follow'})
+            await self.respond(send, status, body.encode(), [(b'content-type', b'application/json')])
+        else:
+            status = 200
+        web.metrics.observe_request('/api/stream', 'GET', status, time.perf_counter() - started)
+        if status != 200:
+            return
+
+        headers = dict(scope['headers'])
+        try:
+            last_event_id = int(headers.get(b'last-event-id', b''))
+        except ValueError:
+            last_event_id = None
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+        bus = web.lots[self.lot_for(scope, session)].event_bus
+        subscription = bus.subscribe(channels, last_event_id=last_event_id,
+                                     on_event=lambda: loop.call_soon_threadsafe(ready.set))
+        disconnected = asyncio.ensure_future(receive())
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8')
+            ] + [(name.lower().encode(), value.encode()) for name, value in web.STREAM_HEADERS.items()]})
+            await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+            while not disconnected.done():
+                # Cleared before draining, so an event queued meanwhile sets it again
+                ready.clear()
+                event = subscription.get(timeout=0)
+                while event is not None:
+                    await send({'type': 'http.response.body', 'body': web.sse_message(event).encode(),
+                                'more_body': True})
+                    event = subscription.get(timeout=0)
+                waiter = asyncio.ensure_future(ready.wait())
+                done, _ = await asyncio.wait({waiter, disconnected}, timeout=web.STREAM_HEARTBEAT_SECONDS,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                if not done:
+                    await send({'type': 'http.response.body', 'body': b': keep-alive\n\n', 'more_body': True})
+        finally:
+            disconnected.cancel()
+            subscription.close()
+
+    @staticmethod
+    async def respond(send, status, body, headers):
+        headers = headers + [(b'content-length', str(len(body)).encode())]
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    # WSGI bridge for the Flask routes
+
+    @staticmethod
+    def wsgi_environ(scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                name = f'HTTP_{name}'
+            value = value.decode('latin-1')
+            environ[name] = f"{environ[name]},{value}" if name in environ else value
+        return environ
+
+    async def wsgi(self, scope, receive, send):
+        """Run the Flask app on the WSGI pool, streaming its response"""
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+
+        loop = asyncio.get_running_loop()
+        iterable = await loop.run_in_executor(self.wsgi_executor, self.flask_app.wsgi_app,
+                                              self.wsgi_environ(scope, body), start_response)
+        iterator = iter(iterable)
+        disconnected = asyncio.ensure_future(receive())
+        try:
+            chunk = await loop.run_in_executor(self.wsgi_executor, next, iterator, _DONE)
+            await send({'type': 'http.response.start', 'status': response['status'],
+                        'headers': response['headers']})
+            # Server-sent event streams never end on their own; stop once the client has gone
+            while chunk is not _DONE and not disconnected.done():
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await loop.run_in_executor(self.wsgi_executor, next, iterator, _DONE)
+            if not disconnected.done():
+                await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnected.cancel()
+            close = getattr(iterable, 'close', None)
+            if close:
+                await loop.run_in_executor(self.wsgi_executor, close)
+
+
+application = ApiServer()
@@ -0,0 +1,338 @@
+"""
+HTTP Load Benchmark
+Seeds a scratch database, serves app.py on a local port and drives its routes
+with concurrent simulated users. Prints requests/sec and p50/p95/p99 latency
+per route as JSON so releases can be compared.
+
+    python benchmark.py --slots 500 --users 200 --history 50000 --concurrency 32 --duration 30
+
+Run once with --storage memory to see how much of each route's latency is SQLite.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from http.cookiejar import CookieJar
+
+from utils.helpers import Helper
+
+SLOT_TYPES = ['Regular', 'Regular', 'Regular', 'VIP', 'EV Charging', 'Handicapped']
+PACKAGES = [('Hourly', 50, 1), ('Daily', 500, 24), ('Weekly', 1500, 168)]
+USER_PASSWORD = 'bench123'
+ADMIN_USERNAME = 'admin'
+ADMIN_PASSWORD = 'admin123'
+
+
+def seed_database(db, slots, users, history, floors=3, seed=0):
+    """Fill an empty database with slots, users and completed historical bookings"""
+    rng = random.Random(seed)
+    now = datetime.now()
+
+    with db.transaction() as cursor:
+        cursor.executemany(
+            "INSERT INTO slots (slot_number, slot_type, floor) VALUES (?, ?, ?)",
+            [(f'P{i:05d}', rng.choice(SLOT_TYPES), 1 + i % floors) for i in range(slots)]
+        )
+        cursor.executemany(
+            "INSERT INTO users (username, password, email, phone, vehicle_number) VALUES (?, ?, ?, ?, ?)",
+            [(f'bench{i}', USER_PASSWORD, f'bench{i}@example.com', f'9{i:09d}', f'KA01BM{i:04d}')
+             for i in range(users)]
+        )
+        cursor.execute("SELECT id FROM slots")
+        slot_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT id, username, vehicle_number FROM users")
+        user_rows = cursor.fetchall()
+
+        rows = []
+        for _ in range(history):
+            user_id, _, vehicle = rng.choice(user_rows)
+            package, cost, hours = rng.choice(PACKAGES)
+            start = now - timedelta(minutes=rng.randint(60, 60 * 24 * 365))
+            stay = timedelta(minutes=rng.randint(10, int(hours * 60 * 1.5)))
+            rows.append((user_id, rng.choice(slot_ids), vehicle,
+                         start.strftime("%Y-%m-%d %H:%M:%S"),
+                         (start + stay).strftime("%Y-%m-%d %H:%M:%S"),
+                         rng.choice(['Completed'] * 9 + ['Cancelled']),
+                         package, cost, hours, cost))
+        cursor.executemany("""
+            INSERT INTO bookings (user_id, slot_id, vehicle_number, booking_time, checkout_time,
+                                  status, package_type, package_cost, expected_duration, actual_cost)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+
+    return slot_ids, user_rows
+
+
+def seed_memory(storage, slots, users, history, floors=3, seed=0):
+    """seed_database for the in-memory backend: the same rows, written straight into its stores"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    store, users_store = storage.database(), storage.users_db
+
+    with store.lock, users_store.lock:
+        slot_ids = [store.insert_slot(f'P{i:05d}', rng.choice(SLOT_TYPES), 1 + i % floors)['id']
+                    for i in range(slots)]
+        user_rows = [
+            (user['id'], user['username'], user['vehicle_number'])
+            for user in (users_store.insert_user(f'bench{i}', USER_PASSWORD, f'bench{i}@example.com',
+                                                 f'9{i:09d}', f'KA01BM{i:04d}') for i in range(users))
+        ]
+
+        for _ in range(history):
+            user_id, _, vehicle = rng.choice(user_rows)
+            package, cost, hours = rng.choice(PACKAGES)
+            start = now - timedelta(minutes=rng.randint(60, 60 * 24 * 365))
+            stay = timedelta(minutes=rng.randint(10, int(hours * 60 * 1.5)))
+            booking_time = start.strftime("%Y-%m-%d %H:%M:%S")
+            checkout_time = (start + stay).strftime("%Y-%m-%d %H:%M:%S")
+            booking_ts = Helper.to_epoch(booking_time)
+            store.insert_booking(user_id=user_id, slot_id=rng.choice(slot_ids), vehicle_number=vehicle,
+                                 booking_time=booking_time, booking_ts=booking_ts, checkout_time=checkout_time,
+                                 checkout_ts=Helper.to_epoch(checkout_time),
+                                 status=rng.choice(['Completed'] * 9 + ['Cancelled']),
+                                 package_type=package, package_cost=cost, expected_duration=hours,
+                                 expected_end_ts=booking_ts + hours * 3600, actual_cost=cost)
+
+    return slot_ids, user_rows
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Report redirects as responses so each request times exactly one route"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class LatencyRecorder:
+    """Per-route latency samples and status counts, shared by all clients"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.statuses = {}
+        self.errors = {}
+
+    def record(self, route, seconds, status):
+        with self._lock:
+            self.samples.setdefault(route, []).append(seconds)
+            counts = self.statuses.setdefault(route, {})
+            counts[str(status)] = counts.get(str(status), 0) + 1
+            if status == 'error' or (isinstance(status, int) and status >= 500):
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+    @staticmethod
+    def percentile(ordered, pct):
+        """Nearest-rank percentile of an already sorted list"""
+        if not ordered:
+            return 0.0
+        rank = max(1, int(round(pct / 100.0 * len(ordered) + 0.5)))
+        return ordered[min(rank, len(ordered)) - 1]
+
+    def report(self, elapsed):
+        routes = {}
+        with self._lock:
+            for route, samples in sorted(self.samples.items()):
+                ordered = sorted(samples)
+                routes[route] = {
+                    'requests': len(ordered),
+                    'errors': self.errors.get(route, 0),
+                    'rps': round(len(ordered) / elapsed, 2),
+                    'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+                    'p50_ms': round(self.percentile(ordered, 50) * 1000, 3),
+                    'p95_ms': round(self.percentile(ordered, 95) * 1000, 3),
+                    'p99_ms': round(self.percentile(ordered, 99) * 1000, 3),
+                    'max_ms': round(ordered[-1] * 1000, 3),
+                    'status': self.statuses[route]
+                }
+        total = sum(route['requests'] for route in routes.values())
+        return {
+            'elapsed_s': round(elapsed, 3),
+            'total_requests': total,
+            'total_errors': sum(route['errors'] for route in routes.values()),
+            'rps': round(total / elapsed, 2) if elapsed else 0.0,
+            'routes': routes
+        }
+
+
+class SimulatedClient:
+    """One browser session: its own cookie jar, timing every request"""
+
+    def __init__(self, base_url, recorder, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect()
+        )
+
+    def request(self, route, path, form=None):
+        """Issue one request; returns (status, body) or (None, None) on a transport error"""
+        data = urllib.parse.urlencode(form).encode() if form is not None else None
+        started = time.perf_counter()
+        try:
+            with self.opener.open(self.base_url + path, data=data, timeout=self.timeout) as response:
+                body = response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            body = e.read()
+            status = e.code
+        except (urllib.error.URLError, OSError):
+            self.recorder.record(route, time.perf_counter() - started, 'error')
+            return None, None
+        self.recorder.record(route, time.perf_counter() - started, status)
+        return status, body
+
+    def login(self, username, password, role):
+        status, _ = self.request('/login', '/login',
+                                 {'username': username, 'password': password, 'role': role})
+        return status == 302
+
+
+def driver_session(client, username, vehicle, slot_ids, rng):
+    """A driver logs in, books a slot, polls their booking and checks out"""
+    if not client.login(username, USER_PASSWORD, 'user'):
+        return
+    client.request('/api/booking/active', '/api/booking/active')
+    client.request('/user/book-slot', '/user/book-slot', {
+        'slot_id': rng.choice(slot_ids),
+        'vehicle_number': vehicle,
+        'package': 'hourly',
+        'booking_time_option': 'now'
+    })
+    status, body = client.request('/api/booking/active', '/api/booking/active')
+    if status != 200:
+        return
+    booking = json.loads(body).get('booking') if body else None
+    if booking:
+        client.request('/user/cancel-booking', f"/user/cancel-booking/{booking['id']}", {})
+
+
+def admin_session(client):
+    """An admin watches the dashboard and its live statistics"""
+    if not client.login(ADMIN_USERNAME, ADMIN_PASSWORD, 'admin'):
+        return
+    client.request('/admin/dashboard', '/admin/dashboard')
+    for _ in range(3):
+        client.request('/api/stats', '/api/stats')
+
+
+def run_load(base_url, users, slot_ids, concurrency, admins, duration, iterations, seed=0):
+    """Run simulated sessions until the duration or per-worker iteration budget is spent"""
+    recorder = LatencyRecorder()
+    deadline = time.monotonic() + duration if duration else None
+    admins = min(admins, concurrency)
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        done = 0
+        while (deadline is None or time.monotonic() < deadline) and (not iterations or done < iterations):
+            client = SimulatedClient(base_url, recorder)
+            if index < admins:
+                admin_session(client)
+            else:
+                # Drivers are partitioned across workers so no two share a login
+                _, username, vehicle = users[(index - admins + done * (concurrency - admins)) % len(users)]
+                driver_session(client, username, vehicle, slot_ids, rng)
+            done += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.report(time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the Smart Parking web app')
+    parser.add_argument('--slots', type=int, default=200, help='parking slots to seed')
+    parser.add_argument('--users', type=int, default=100, help='registered drivers to seed')
+    parser.add_argument('--history', type=int, default=10000, help='historical bookings to seed')
+    parser.add_argument('--floors', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=16, help='simulated clients running at once')
+    parser.add_argument('--admins', type=int, default=2, help='how many of the clients are admins')
+    parser.add_argument('--duration', type=float, default=10, help='seconds to run (0 = use --iterations)')
+    parser.add_argument('--iterations', type=int, default=0, help='sessions per client (0 = unlimited)')
+    parser.add_argument('--port', type=int, default=0, help='port to serve on (0 = any free port)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for data and traffic')
+    parser.add_argument('--storage', choices=['sqlite', 'memory'], default='sqlite',
+                        help='storage backend to serve from')
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    if not args.duration and not args.iterations:
+        parser.error('set --duration or --iterations')
+    if args.users < 1 or args.slots < 1:
+        parser.error('--users and --slots must be at least 1')
+    if args.admins >= args.concurrency:
+        parser.error('--admins must leave at least one driver client')
+
+    started_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    tmpdir = tempfile.mkdtemp(prefix='smart_parking_bench_')
+    os.environ['SMART_PARKING_DB'] = os.path.join(tmpdir, 'bench.db')
+    os.environ['SMART_PARKING_SCHEDULER'] = '0'
+    os.environ['SMART_PARKING_STORAGE'] = args.storage
+
+    # The app prints request diagnostics; keep stdout for the JSON report
+    with redirect_stdout(sys.stderr):
+        from werkzeug.serving import make_server
+        import app as web
+
+        seed_started = time.perf_counter()
+        if web.storage.has_sql:
+            slot_ids, users = seed_database(web.db, args.slots, args.users, args.history,
+                                            floors=args.floors, seed=args.seed)
+        else:
+            slot_ids, users = seed_memory(web.storage, args.slots, args.users, args.history,
+                                          floors=args.floors, seed=args.seed)
+        seed_seconds = time.perf_counter() - seed_started
+
+        server = make_server('127.0.0.1', args.port, web.app, threaded=True)
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+        try:
+            report = run_load(f'http://127.0.0.1:{server.server_port}', users, slot_ids,
+                              args.concurrency, args.admins, args.duration, args.iterations,
+                              seed=args.seed)
+        finally:
+            server.shutdown()
+            web.db.close()
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+    report['config'] = {
+        'slots': args.slots,
+        'users': args.users,
+        'history': args.history,
+        'floors': args.floors,
+        'concurrency': args.concurrency,
+        'admins': args.admins,
+        'duration': args.duration,
+        'iterations': args.iterations,
+        'seed': args.seed,
+        'storage': args.storage,
+        'seed_seconds': round(seed_seconds, 3),
+        'started_at': started_at
+    }
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Configuration Module
+Central settings for the Smart Parking System
+"""
+
+import os
+
+
+class Config:
+    """Application settings (overridable through environment variables)"""
+
+    # Flask secret key
+    SECRET_KEY = os.environ.get('SMART_PARKING_SECRET_KEY', 'smart_parking_secret_key_2025')
+
+    # Database file (relative names are resolved next to the project root)
+    DATABASE_NAME = os.environ.get('SMART_PARKING_DB', 'smart_parking.db')
+
+    # Storage backend: 'sqlite' (the database files below) or 'memory' (pure-Python
+    # tables that live only as long as the process, for simulations and benchmarks)
+    STORAGE_BACKEND = os.environ.get('SMART_PARKING_STORAGE', 'sqlite').lower()
+
+    # Parking lots, each with its own database file: "north=north.db,south=south.db"
+    # (unset: one lot named 'main' in DATABASE_NAME). Users and admins live in
+    # USERS_DATABASE_NAME, shared by every lot (default: the default lot's file)
+    LOTS = os.environ.get('SMART_PARKING_LOTS', '')
+    DEFAULT_LOT = os.environ.get('SMART_PARKING_DEFAULT_LOT')
+    USERS_DATABASE_NAME = os.environ.get('SMART_PARKING_USERS_DB')
+
+    # Connection pool settings
+    DB_POOL_SIZE = int(os.environ.get('SMART_PARKING_DB_POOL_SIZE', 16))
+    DB_BUSY_TIMEOUT_MS = int(os.environ.get('SMART_PARKING_DB_BUSY_TIMEOUT_MS', 5000))
+    DB_CHECKOUT_TIMEOUT = float(os.environ.get('SMART_PARKING_DB_CHECKOUT_TIMEOUT', 10))
+    DB_JOURNAL_MODE = os.environ.get('SMART_PARKING_DB_JOURNAL_MODE', 'WAL')
+
+    # Seconds between checks for writes committed by other processes (such as
+    # the settle and archive CLIs); in-memory mirrors reload when one is seen
+    DB_SYNC_SECONDS = float(os.environ.get('SMART_PARKING_DB_SYNC_SECONDS', 1))
+
+    # Scheduled booking activation
+    SCHEDULER_ENABLED = os.environ.get('SMART_PARKING_SCHEDULER', '1') == '1'
+    NO_SHOW_GRACE_MINUTES = float(os.environ.get('SMART_PARKING_NO_SHOW_GRACE_MINUTES', 15))
+    SCHEDULER_RETRY_SECONDS = float(os.environ.get('SMART_PARKING_SCHEDULER_RETRY_SECONDS', 60))
+
+    # Seconds between sweeps for bookings that ran past their package (0 disables)
+    OVERSTAY_SWEEP_SECONDS = float(os.environ.get('SMART_PARKING_OVERSTAY_SWEEP_SECONDS', 60))
+
+    # Per-user profile / active booking cache
+    USER_CACHE_SIZE = int(os.environ.get('SMART_PARKING_USER_CACHE_SIZE', 10000))
+
+    # Admin dashboard / stats response cache (entries drop on every write,
+    # including other processes' writes; max age in seconds, 0 disables)
+    RESPONSE_CACHE_MAX_AGE = float(os.environ.get('SMART_PARKING_RESPONSE_CACHE_MAX_AGE', 5))
+    RESPONSE_CACHE_SIZE = int(os.environ.get('SMART_PARKING_RESPONSE_CACHE_SIZE', 64))
+
+    # Async serving mode (asgi.py): worker threads for SQLite calls, the most
+    # calls allowed to wait for one before requests get 503, and the threads
+    # that run the Flask (HTML) routes
+    ASYNC_DB_WORKERS = int(os.environ.get('SMART_PARKING_ASYNC_DB_WORKERS', 8))
+    ASYNC_MAX_PENDING = int(os.environ.get('SMART_PARKING_ASYNC_MAX_PENDING', 1000))
+    ASYNC_WSGI_WORKERS = int(os.environ.get('SMART_PARKING_ASYNC_WSGI_WORKERS', 32))
+
+    # Logging level for the web application (DEBUG shows per-request booking traces)
+    LOG_LEVEL = os.environ.get('SMART_PARKING_LOG_LEVEL', 'INFO').upper()
+
+    # Bearer token that lets a Prometheus scraper read /metrics without an admin session
+    METRICS_TOKEN = os.environ.get('SMART_PARKING_METRICS_TOKEN')
+
+    # Opt-in query profiler: per-statement timings, and a slow-query log
+    # (JSON lines with EXPLAIN QUERY PLAN) for statements above the threshold
+    QUERY_PROFILER = os.environ.get('SMART_PARKING_QUERY_PROFILER', '0') == '1'
+    SLOW_QUERY_MS = float(os.environ.get('SMART_PARKING_SLOW_QUERY_MS', 100))
+    SLOW_QUERY_LOG = os.environ.get('SMART_PARKING_SLOW_QUERY_LOG', 'slow_queries.log')
+
+    # Archival of finished bookings into an attached archive database
+    # (default: <database name>_archive.db next to the main database)
+    ARCHIVE_DATABASE_NAME = os.environ.get('SMART_PARKING_ARCHIVE_DB')
+    ARCHIVE_AFTER_DAYS = float(os.environ.get('SMART_PARKING_ARCHIVE_AFTER_DAYS', 90))
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('SMART_PARKING_ARCHIVE_BATCH_SIZE', 500))
@@ -0,0 +1,66 @@
+"""
+Async Database Module
+Awaitable access to the blocking SQLite managers for the asyncio server
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+
+
+class Overloaded(Exception):
+    """Raised when too many database calls are already waiting for a worker"""
+
+
+class AsyncDatabase:
+    """Runs blocking manager calls on a bounded thread pool.
+
+    SQLite work never runs on the event loop; at most `workers` calls run at
+    once and at most `max_pending` may be queued, beyond which call() raises
+    Overloaded so the server can shed load instead of letting latency grow
+    without bound. Concurrent calls with the same key share one execution,
+    so a thousand clients polling the same floor cost one query. All state is
+    touched only from the event loop thread, so no locking is needed.
+    """
+
+    def __init__(self, workers=None, max_pending=None):
+        self.workers = workers or Config.ASYNC_DB_WORKERS
+        self.max_pending = max_pending or Config.ASYNC_MAX_PENDING
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='async-db')
+        self._inflight = {}
+        self.pending = 0
+        self.shared = 0
+        self.rejected = 0
+
+    async def call(self, key, fn, *args):
+        """Await fn(*args) on the pool, joining an identical call already in flight"""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.shared += 1
+        else:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise Overloaded(f"{self.pending} database calls already queued")
+            self.pending += 1
+            future = asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._finished(key))
+        # A client that disconnects must not cancel the call other clients are waiting on
+        return await asyncio.shield(future)
+
+    def _finished(self, key):
+        self.pending -= 1
+        self._inflight.pop(key, None)
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'pending': self.pending,
+            'shared': self.shared,
+            'rejected': self.rejected
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,146 @@
+"""
+Connection Pool Module
+Thread-safe SQLite connection pool shared by all managers
+"""
+
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """Raised when no pooled connection becomes free in time"""
+
+
+class ConnectionPool:
+    """Checkout/return pool of SQLite connections for one database file"""
+
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, db_path, pool_size=16, busy_timeout=5000,
+                 checkout_timeout=10, journal_mode='WAL', attachments=None, readonly_attachments=None):
+        self.db_path = db_path
+        self.attachments = dict(attachments or {})  # schema alias -> database file
+        self.readonly_attachments = dict(readonly_attachments or {})
+        self.pool_size = pool_size
+        self.busy_timeout = busy_timeout
+        self.checkout_timeout = checkout_timeout
+        self.journal_mode = journal_mode
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._all = []
+
+    @classmethod
+    def for_path(cls, db_path, **settings):
+        """Return the process-wide pool for a database file, creating it on first use"""
+        with cls._pools_lock:
+            pool = cls._pools.get(db_path)
+            if pool is None:
+                pool = cls(db_path, **settings)
+                cls._pools[db_path] = pool
+            return pool
+
+    def _connect(self):
+        """Open and configure a new connection"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout / 1000.0,
+            check_same_thread=False,
+            uri=True
+        )
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        if self.journal_mode:
+            conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+            if self.journal_mode.upper() == 'WAL':
+                # WAL is durable across crashes with NORMAL; only power loss can drop the last commits
+                conn.execute("PRAGMA synchronous = NORMAL")
+        for alias, path in self.attachments.items():
+            # ATTACH is per connection, so every pooled connection sees the same schemas
+            conn.execute(f"ATTACH DATABASE ? AS {alias}", (path,))
+            if self.journal_mode:
+                conn.execute(f"PRAGMA {alias}.journal_mode = {self.journal_mode}")
+        for alias, path in self.readonly_attachments.items():
+            # Read-only, so BEGIN IMMEDIATE takes no lock on it and writers elsewhere never wait
+            conn.execute(f"ATTACH DATABASE ? AS {alias}", (f"file:{pathname2url(path)}?mode=ro",))
+        return conn
+
+    def _acquire(self):
+        """Take an idle connection, open a new one, or wait for a free one"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_create = self._created < self.pool_size
+            if can_create:
+                self._created += 1
+
+        if can_create:
+            try:
+                conn = self._connect()
+            except sqlite3.Error:
+                with self._lock:
+                    self._created -= 1
+                raise
+            with self._lock:
+                self._all.append(conn)
+            return conn
+
+        try:
+            return self._idle.get(timeout=self.checkout_timeout)
+        except queue.Empty:
+            raise PoolTimeoutError(
+                f"No database connection available after {self.checkout_timeout}s"
+            )
+
+    def _release(self, conn):
+        """Return a connection to the pool, discarding any open transaction"""
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of the block.
+
+        Nested use on the same thread reuses the connection already held,
+        so helpers called inside a transaction see its uncommitted writes.
+        """
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            yield held
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._release(conn)
+
+    def close_all(self):
+        """Close every connection opened by this pool"""
+        with self._lock:
+            connections, self._all = self._all, []
+            self._created = 0
+        self._idle = queue.LifoQueue()
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    @classmethod
+    def discard(cls, db_path):
+        """Close and forget the pool for a database file"""
+        with cls._pools_lock:
+            pool = cls._pools.pop(db_path, None)
+        if pool:
+            pool.close_all()
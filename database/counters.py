@@ -0,0 +1,46 @@
+"""
+Stats Counters Module
+In-process mirror of the trigger-maintained stats_counters table
+"""
+
+import threading
+
+
+class StatsCounters:
+    """Constant-time slot and booking counts.
+
+    The stats_counters table is kept current by triggers on slots and
+    bookings; this mirror re-reads that small table only when the database
+    write version has moved (by a commit here, or one from another process
+    found by db.sync()), so repeated dashboard reads cost no SQL at all.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._values = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_database(cls, db):
+        """Return the shared mirror for a database"""
+        return db.shared('stats_counters', cls)
+
+    def snapshot(self):
+        """Return a copy of all counters"""
+        version = self.db.data_version
+        with self._lock:
+            if self._version != version:
+                rows = self.db.fetch_all("SELECT name, value FROM stats_counters")
+                self._values = dict(rows)
+                self._version = version
+            return dict(self._values)
+
+    def get(self, name, default=0):
+        """Return a single counter value"""
+        return self.snapshot().get(name, default)
+
+    def invalidate(self):
+        """Force the next read to reload from the database"""
+        with self._lock:
+            self._version = None
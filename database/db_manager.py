@@ -4,27 +4,101 @@ Handles all database operations for the Smart Parking System
 """
 
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 import os
 
+from config import Config
+from database.connection_pool import ConnectionPool
+from database.migrations import SchemaMigrator
+from database.profiler import ProfilingCursor, QueryProfiler
+from utils.metrics import Metrics, query_label
+
+
+class _SharedState:
+    """Process-wide state for one database file, shared by every DatabaseManager on it"""
+
+    _states = {}
+    _states_lock = threading.Lock()
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.commit_lock = threading.RLock()
+        self.local = threading.local()
+        self.write_version = 0
+        self.epoch = None           # write_epoch value after the last commit this process saw
+        self.next_sync = 0.0
+        self.external_callbacks = []
+        self.objects = {}
+
+    @classmethod
+    def for_path(cls, db_path):
+        with cls._states_lock:
+            state = cls._states.get(db_path)
+            if state is None:
+                state = cls()
+                cls._states[db_path] = state
+            return state
+
 
 class DatabaseManager:
     """Manages all database operations for the parking system"""
     
-    def __init__(self, db_name="smart_parking.db"):
-        """Initialize database connection"""
-        self.db_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), db_name)
-        self.conn = None
-        self.cursor = None
+    # Schema alias of the attached archive database
+    ARCHIVE = 'archive'
+    
+    # Schema alias of the global users database, attached read-only to lot shards
+    USERS = 'users_db'
+    
+    def __init__(self, db_name=None, busy_timeout=None, pool_size=None, archive_name=None, users_name=None):
+        """Initialize database connection pool (users_name: global users database of a lot shard)"""
+        db_name = db_name or Config.DATABASE_NAME
+        self.db_path = self.resolve_path(db_name)
+        archive_name = archive_name or Config.ARCHIVE_DATABASE_NAME
+        if archive_name:
+            self.archive_path = self.resolve_path(archive_name)
+        else:
+            self.archive_path = f"{os.path.splitext(self.db_path)[0]}_archive.db"
+        self.users_path = self.resolve_path(users_name) if users_name else self.db_path
+        self.busy_timeout = busy_timeout if busy_timeout is not None else Config.DB_BUSY_TIMEOUT_MS
+        self.pool_size = pool_size or Config.DB_POOL_SIZE
+        self.pool = None
+        self.state = _SharedState.for_path(self.db_path)
+        self.metrics = Metrics.for_database(self)
+        self.profiler = QueryProfiler.for_database(self)
         self.connect()
         self.create_tables()
+        self.run_migrations()
+        self.create_archive_tables()
         self.create_default_admin()
+        self.sync()
+    
+    @staticmethod
+    def resolve_path(db_name):
+        """Absolute path of a database file (relative names live next to the project root)"""
+        return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), db_name)
+    
+    @property
+    def is_shard(self):
+        """True when users and admins live in the attached global database instead of this file"""
+        return self.users_path != self.db_path
     
     def connect(self):
-        """Establish database connection"""
+        """Attach to the shared connection pool for this database file"""
         try:
-            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-            self.cursor = self.conn.cursor()
+            self.pool = ConnectionPool.for_path(
+                self.db_path,
+                pool_size=self.pool_size,
+                busy_timeout=self.busy_timeout,
+                checkout_timeout=Config.DB_CHECKOUT_TIMEOUT,
+                journal_mode=Config.DB_JOURNAL_MODE,
+                attachments={self.ARCHIVE: self.archive_path},
+                readonly_attachments={self.USERS: self.users_path} if self.is_shard else None
+            )
+            with self.pool.connection():
+                pass
             return True
         except sqlite3.Error as e:
             print(f"Database connection error: {e}")
@@ -33,8 +107,21 @@ class DatabaseManager:
     def create_tables(self):
         """Create all necessary tables if they don't exist"""
         try:
+            with self.pool.connection() as conn:
+                self._create_tables(conn.cursor())
+                self._create_counters(conn.cursor())
+                conn.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"Error creating tables: {e}")
+            return False
+    
+    def _create_tables(self, cursor):
+        """Issue the CREATE TABLE statements on the given cursor"""
+        # A lot shard reads admin and users from the attached global database
+        if not self.is_shard:
             # Admin table
-            self.cursor.execute('''
+            cursor.execute('''
                 CREATE TABLE IF NOT EXISTS admin (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     username TEXT UNIQUE NOT NULL,
@@ -45,7 +132,7 @@ class DatabaseManager:
             ''')
             
             # Users table
-            self.cursor.execute('''
+            cursor.execute('''
                 CREATE TABLE IF NOT EXISTS users (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     username TEXT UNIQUE NOT NULL,
@@ -56,93 +143,358 @@ class DatabaseManager:
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
-            
-            # Parking slots table
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS slots (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    slot_number TEXT UNIQUE NOT NULL,
-                    slot_type TEXT DEFAULT 'Regular',
-                    status TEXT DEFAULT 'Available',
-                    floor INTEGER DEFAULT 1,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
+        
+        # Parking slots table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS slots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                slot_number TEXT UNIQUE NOT NULL,
+                slot_type TEXT DEFAULT 'Regular',
+                status TEXT DEFAULT 'Available',
+                floor INTEGER DEFAULT 1,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Bookings table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS bookings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                slot_id INTEGER NOT NULL,
+                vehicle_number TEXT NOT NULL,
+                booking_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                checkout_time TIMESTAMP,
+                status TEXT DEFAULT 'Active',
+                package_type TEXT DEFAULT 'Hourly',
+                package_cost REAL DEFAULT 50,
+                expected_duration REAL DEFAULT 1,
+                actual_cost REAL,
+                FOREIGN KEY (user_id) REFERENCES users(id),
+                FOREIGN KEY (slot_id) REFERENCES slots(id)
+            )
+        ''')
+    
+    def _create_counters(self, cursor):
+        """Create the stats_counters table and the triggers that keep it current"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stats_counters'")
+        exists = cursor.fetchone() is not None
+        
+        # One row per counter, e.g. 'slots:total', 'slots:Available', 'bookings:Active'
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS stats_counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        
+        for table in ('slots', 'bookings'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_count_insert AFTER INSERT ON {table}
+                BEGIN
+                    INSERT INTO stats_counters (name, value)
+                    VALUES ('{table}:total', 1), ('{table}:' || COALESCE(NEW.status, ''), 1)
+                    ON CONFLICT(name) DO UPDATE SET value = value + 1;
+                END
             ''')
-            
-            # Bookings table
-            self.cursor.execute('''
-                CREATE TABLE IF NOT EXISTS bookings (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    slot_id INTEGER NOT NULL,
-                    vehicle_number TEXT NOT NULL,
-                    booking_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    checkout_time TIMESTAMP,
-                    status TEXT DEFAULT 'Active',
-                    package_type TEXT DEFAULT 'Hourly',
-                    package_cost REAL DEFAULT 50,
-                    expected_duration REAL DEFAULT 1,
-                    actual_cost REAL,
-                    FOREIGN KEY (user_id) REFERENCES users(id),
-                    FOREIGN KEY (slot_id) REFERENCES slots(id)
-                )
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_count_delete AFTER DELETE ON {table}
+                BEGIN
+                    UPDATE stats_counters SET value = value - 1
+                    WHERE name IN ('{table}:total', '{table}:' || COALESCE(OLD.status, ''));
+                END
             ''')
-            
-            self.conn.commit()
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_count_status AFTER UPDATE OF status ON {table}
+                WHEN OLD.status IS NOT NEW.status
+                BEGIN
+                    UPDATE stats_counters SET value = value - 1
+                    WHERE name = '{table}:' || COALESCE(OLD.status, '');
+                    INSERT INTO stats_counters (name, value)
+                    VALUES ('{table}:' || COALESCE(NEW.status, ''), 1)
+                    ON CONFLICT(name) DO UPDATE SET value = value + 1;
+                END
+            ''')
+        
+        if not exists:
+            # First run on an existing database: seed the counters from one scan of each table
+            for table in ('slots', 'bookings'):
+                cursor.execute(f"""
+                    INSERT INTO stats_counters (name, value)
+                    SELECT '{table}:total', COUNT(*) FROM {table}
+                """)
+                cursor.execute(f"""
+                    INSERT INTO stats_counters (name, value)
+                    SELECT '{table}:' || COALESCE(status, ''), COUNT(*) FROM {table} GROUP BY status
+                """)
+    
+    def create_archive_tables(self):
+        """Create or widen archive.bookings so it mirrors the current bookings columns"""
+        try:
+            with self.pool.connection() as conn:
+                columns = [(row[1], row[2]) for row in conn.execute("PRAGMA main.table_info(bookings)")]
+                archived = {row[1] for row in conn.execute(f"PRAGMA {self.ARCHIVE}.table_info(bookings)")}
+                
+                if not archived:
+                    definitions = ', '.join(
+                        f"{name} {col_type} PRIMARY KEY" if name == 'id' else f"{name} {col_type}"
+                        for name, col_type in columns
+                    )
+                    conn.execute(f"CREATE TABLE {self.ARCHIVE}.bookings ({definitions}, archived_at INTEGER)")
+                else:
+                    for name, col_type in columns:
+                        if name not in archived:
+                            conn.execute(f"ALTER TABLE {self.ARCHIVE}.bookings ADD COLUMN {name} {col_type}")
+                
+                for name, definition in (
+                    ('idx_archive_user_ts', 'bookings (user_id, booking_ts)'),
+                    ('idx_archive_status_ts', 'bookings (status, booking_ts)'),
+                    ('idx_archive_ts', 'bookings (booking_ts)'),
+                ):
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS {self.ARCHIVE}.{name} ON {definition}")
+                conn.commit()
             return True
         except sqlite3.Error as e:
-            print(f"Error creating tables: {e}")
+            print(f"Error creating archive tables: {e}")
+            return False
+    
+    def run_migrations(self):
+        """Bring the schema up to the latest migration version"""
+        try:
+            with self.pool.connection() as conn:
+                applied = SchemaMigrator(conn).migrate()
+            for version in applied:
+                print(f"Applied schema migration {version}")
+            return True
+        except sqlite3.Error as e:
+            print(f"Error running migrations: {e}")
             return False
     
     def create_default_admin(self):
         """Create default admin account if none exists"""
+        if self.is_shard:
+            return
         try:
-            self.cursor.execute("SELECT COUNT(*) FROM admin")
-            count = self.cursor.fetchone()[0]
-            
-            if count == 0:
-                self.cursor.execute(
-                    "INSERT INTO admin (username, password, email) VALUES (?, ?, ?)",
-                    ("admin", "admin123", "admin@smartparking.com")
-                )
-                self.conn.commit()
-                print("Default admin created: username='admin', password='admin123'")
+            with self.pool.connection() as conn:
+                count = conn.execute("SELECT COUNT(*) FROM admin").fetchone()[0]
+                
+                if count == 0:
+                    conn.execute(
+                        "INSERT INTO admin (username, password, email) VALUES (?, ?, ?)",
+                        ("admin", "admin123", "admin@smartparking.com")
+                    )
+                    conn.commit()
+                    print("Default admin created: username='admin', password='admin123'")
         except sqlite3.Error as e:
             print(f"Error creating default admin: {e}")
     
-    def execute_query(self, query, params=()):
+    def _observe(self, name, query, started, rows=0, error=False, params=()):
+        """Record one query in the shared metrics (name defaults to its verb and table)
+        and, when profiling is on, in the query profiler"""
+        elapsed = time.perf_counter() - started
+        self.metrics.observe_query(name or query_label(query), elapsed, rows, error)
+        if self.profiler.enabled and not error:
+            self.profiler.record(query, params, elapsed, rows)
+    
+    def execute_query(self, query, params=(), name=None):
         """Execute a query and return results"""
+        started = time.perf_counter()
         try:
-            self.cursor.execute(query, params)
-            self.conn.commit()
+            with self.pool.connection() as conn:
+                cursor = conn.execute(query, params)
+                self._commit(conn)
+            self._observe(name, query, started, max(cursor.rowcount, 0), params=params)
             return True
         except sqlite3.Error as e:
+            self._observe(name, query, started, error=True)
             print(f"Query execution error: {e}")
             return False
     
-    def fetch_one(self, query, params=()):
+    def execute_insert(self, query, params=(), name=None):
+        """Execute an INSERT and return the new row id (None on failure)"""
+        started = time.perf_counter()
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.execute(query, params)
+                self._commit(conn)
+            self._observe(name, query, started, max(cursor.rowcount, 0), params=params)
+            return cursor.lastrowid
+        except sqlite3.Error as e:
+            self._observe(name, query, started, error=True)
+            print(f"Query execution error: {e}")
+            return None
+    
+    def fetch_one(self, query, params=(), name=None):
         """Fetch single record"""
+        started = time.perf_counter()
         try:
-            self.cursor.execute(query, params)
-            return self.cursor.fetchone()
+            with self.pool.connection() as conn:
+                row = conn.execute(query, params).fetchone()
+            self._observe(name, query, started, 0 if row is None else 1, params=params)
+            return row
         except sqlite3.Error as e:
+            self._observe(name, query, started, error=True)
             print(f"Fetch error: {e}")
             return None
     
-    def fetch_all(self, query, params=()):
+    def fetch_all(self, query, params=(), name=None):
         """Fetch all records"""
+        started = time.perf_counter()
         try:
-            self.cursor.execute(query, params)
-            return self.cursor.fetchall()
+            with self.pool.connection() as conn:
+                rows = conn.execute(query, params).fetchall()
+            self._observe(name, query, started, len(rows), params=params)
+            return rows
         except sqlite3.Error as e:
+            self._observe(name, query, started, error=True)
             print(f"Fetch error: {e}")
             return []
     
-    def close(self):
-        """Close database connection"""
-        if self.conn:
-            self.conn.close()
+    @contextmanager
+    def transaction(self, name='transaction'):
+        """Run the block as one BEGIN IMMEDIATE transaction and yield its cursor.
+
+        The write lock is taken up front, so reads inside the block cannot be
+        invalidated by another writer before the commit. Any exception rolls
+        the whole block back. A transaction opened inside another one on the
+        same thread joins the outer transaction. Callbacks registered with
+        on_commit() run right after the commit. The whole block, including the
+        wait for the write lock, is timed in the metrics under name.
+        """
+        with self.pool.connection() as conn:
+            if conn.in_transaction:
+                with self._cursor(conn) as cursor:
+                    yield cursor
+                return
+            
+            started = time.perf_counter()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.Error:
+                self.metrics.observe_query(name, time.perf_counter() - started, error=True)
+                raise
+            self.state.local.callbacks = callbacks = []
+            try:
+                with self._cursor(conn) as cursor:
+                    yield cursor
+                # Commit and its callbacks run as a unit, so in-memory mirrors
+                # are updated in the same order the database saw the writes
+                with self.state.commit_lock:
+                    self._commit(conn)
+                    self._run_callbacks(callbacks)
+                self.metrics.observe_query(name, time.perf_counter() - started)
+            except BaseException as e:
+                conn.rollback()
+                # BookingConflict and friends are expected rejections, not failures
+                self.metrics.observe_query(name, time.perf_counter() - started,
+                                           error=isinstance(e, sqlite3.Error))
+                raise
+            finally:
+                self.state.local.callbacks = None
+    
+    @contextmanager
+    def _cursor(self, conn):
+        """Cursor for a transaction block, reporting each statement while profiling is on"""
+        if not self.profiler.enabled:
+            yield conn.cursor()
+            return
+        cursor = ProfilingCursor(conn.cursor(), self.profiler)
+        yield cursor
+        cursor.flush()
     
-    def __del__(self):
-        """Destructor to ensure connection is closed"""
-        self.close()
+    def on_commit(self, callback):
+        """Run callback after the current transaction commits (at once if none is open)"""
+        callbacks = getattr(self.state.local, 'callbacks', None)
+        if callbacks is None:
+            self._run_callbacks([callback])
+        else:
+            callbacks.append(callback)
+    
+    def _run_callbacks(self, callbacks):
+        """Invoke post-commit callbacks; a failing callback must not undo the commit"""
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Post-commit callback error: {e}")
+    
+    @property
+    def data_version(self):
+        """Counter that moves forward after every write committed by this process,
+        and when sync() finds one committed by another process"""
+        self.sync()
+        return self.state.write_version
+    
+    def bump_version(self):
+        """Record that a write was committed"""
+        with self.state.lock:
+            self.state.write_version += 1
+    
+    def _commit(self, conn):
+        """Commit the open write transaction, stamping it with the next write epoch.
+
+        Every process advances the same write_epoch row, so a stamp that skips
+        past the last epoch this process saw means another process committed
+        in between.
+        """
+        epoch = None
+        if conn.in_transaction:
+            epoch = conn.execute("UPDATE write_epoch SET epoch = epoch + 1 WHERE id = 1 RETURNING epoch").fetchall()[0][0]
+        with self.state.commit_lock:
+            conn.commit()
+            external = epoch is not None and self._saw_epoch(epoch, own=True)
+            self.bump_version()
+            if external:
+                self._run_callbacks(list(self.state.external_callbacks))
+    
+    def _saw_epoch(self, epoch, own=False):
+        """Track the newest write epoch; True when it shows a commit by another process"""
+        with self.state.lock:
+            last = self.state.epoch
+            if last is None or epoch > last:
+                self.state.epoch = epoch
+            return last is not None and epoch > last + (1 if own else 0)
+    
+    def sync(self):
+        """Notice writes committed by other processes, such as the settle and archive CLIs.
+
+        Reads the write epoch at most every DB_SYNC_SECONDS. When it moved past
+        this process's own commits, data_version moves and the callbacks given
+        to on_external_write() run, so in-memory mirrors reload. No lock is
+        held across the read: a commit of this process caught between its
+        COMMIT and its bookkeeping only costs one needless reload.
+        """
+        now = time.monotonic()
+        if now < self.state.next_sync or self.pool is None:
+            return
+        self.state.next_sync = now + Config.DB_SYNC_SECONDS
+        try:
+            with self.pool.connection() as conn:
+                row = conn.execute("SELECT epoch FROM write_epoch WHERE id = 1").fetchone()
+        except sqlite3.Error as e:
+            print(f"Write epoch check error: {e}")
+            return
+        if row is not None and self._saw_epoch(row[0]):
+            self.bump_version()
+            self._run_callbacks(list(self.state.external_callbacks))
+    
+    def on_external_write(self, callback):
+        """Run callback whenever sync() finds a write committed by another process"""
+        with self.state.lock:
+            self.state.external_callbacks.append(callback)
+    
+    def shared(self, key, factory):
+        """Return a process-wide helper bound to this database file, building it on first use"""
+        with self.state.lock:
+            obj = self.state.objects.get(key)
+        if obj is None:
+            created = factory(self)
+            with self.state.lock:
+                obj = self.state.objects.setdefault(key, created)
+        return obj
+    
+    def close(self):
+        """Close every pooled connection for this database"""
+        if self.pool:
+            ConnectionPool.discard(self.db_path)
+            self.pool = None
@@ -0,0 +1,104 @@
+"""
+Lot Router Module
+Maps each parking lot to its own database file (one SQLite writer per lot)
+"""
+
+import os
+import re
+import threading
+
+from config import Config
+from database.db_manager import DatabaseManager
+
+LOT_ID = re.compile(r'^[a-z0-9_-]{1,32}$')
+
+
+class UnknownLot(KeyError):
+    """Raised for a lot id that is not configured"""
+
+
+def parse_lots(spec):
+    """Parse "north=north.db,south=south.db" into an ordered {lot_id: database name} dict"""
+    lots = {}
+    for entry in filter(None, (part.strip() for part in (spec or '').split(','))):
+        lot_id, sep, db_name = entry.partition('=')
+        lot_id, db_name = lot_id.strip().lower(), db_name.strip()
+        if not sep or not db_name or not LOT_ID.match(lot_id):
+            raise ValueError(f"Invalid lot entry {entry!r}; expected <lot_id>=<database file>")
+        if lot_id in lots:
+            raise ValueError(f"Lot {lot_id!r} is configured twice")
+        lots[lot_id] = db_name
+    return lots
+
+
+class LotRouter:
+    """Routes every lot to its shard database.
+
+    Each lot keeps its slots, bookings, counters, rollups and archive in its
+    own SQLite file, so a busy garage only ever waits on its own write lock.
+    Users and admins live in one global database (by default the default
+    lot's file). Every other shard attaches it read-only as `users_db`, where
+    the existing `JOIN users` queries find it; a read-only attachment takes
+    no lock, so shard transactions never serialise on it. Query metrics and
+    the profiler of every shard report into the global database's.
+    """
+
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, lots=None, default_lot=None, users_name=None):
+        self.lots, self.default_lot = self.configured(lots, default_lot)
+        self.users_name = users_name or Config.USERS_DATABASE_NAME or self.lots[self.default_lot]
+        self._lock = threading.Lock()
+        self._databases = {}
+        self.users_db = self._open(self.users_name)
+
+    @staticmethod
+    def configured(lots=None, default_lot=None):
+        """({lot_id: database name}, default lot id) from the arguments, else from Config"""
+        lots = dict(lots or parse_lots(Config.LOTS) or {'main': Config.DATABASE_NAME})
+        default_lot = default_lot or Config.DEFAULT_LOT or next(iter(lots))
+        if default_lot not in lots:
+            raise UnknownLot(default_lot)
+        return lots, default_lot
+
+    @classmethod
+    def default(cls):
+        """Return the process-wide router built from Config"""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def _open(self, db_name, users_name=None):
+        # One archive per shard; a configured archive file only fits a single lot
+        archive_name = None
+        if users_name and len(self.lots) > 1:
+            archive_name = f"{os.path.splitext(db_name)[0]}_archive.db"
+        return DatabaseManager(db_name, archive_name=archive_name, users_name=users_name)
+
+    def lot_ids(self):
+        """Configured lot ids, default lot first"""
+        return [self.default_lot] + [lot for lot in self.lots if lot != self.default_lot]
+
+    def resolve(self, lot=None):
+        """The lot id to use for `lot` (None means the default lot)"""
+        lot = lot or self.default_lot
+        if lot not in self.lots:
+            raise UnknownLot(lot)
+        return lot
+
+    def database(self, lot=None):
+        """The DatabaseManager of a lot's shard, opened on first use"""
+        lot = self.resolve(lot)
+        with self._lock:
+            db = self._databases.get(lot)
+            if db is None:
+                if DatabaseManager.resolve_path(self.lots[lot]) == self.users_db.db_path:
+                    db = self.users_db
+                else:
+                    db = self._open(self.lots[lot], users_name=self.users_name)
+                    db.metrics = self.users_db.metrics
+                    db.profiler = self.users_db.profiler
+                self._databases[lot] = db
+            return db
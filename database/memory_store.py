@@ -0,0 +1,223 @@
+"""
+Memory Store Module
+Pure-Python tables and indexes for the in-memory storage backend
+"""
+
+import bisect
+import itertools
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+
+
+class MemoryCounters(Counter):
+    """The 'slots:*' / 'bookings:*' counters, read like StatsCounters"""
+
+    def snapshot(self):
+        """Return a copy of all counters"""
+        return dict(self)
+
+    def get(self, name, default=0):
+        """Return a single counter value"""
+        return super().get(name, default)
+
+
+class MemoryStore:
+    """Users, admins, slots and bookings held in dicts, with the secondary
+    indexes the hot paths need: slot number lookup, available slots per
+    (floor, slot_type) in listing and assignment order, bookings per user and
+    status, and (booking_ts, id) timelines, overall and per status, for
+    keyset-paged listings.
+
+    Stands in for a DatabaseManager: repositories take `lock` around every
+    read-modify-write (the memory analogue of BEGIN IMMEDIATE), `shared()`
+    hosts the per-store event bus and caches, and `data_version` moves on
+    every write. Nothing touches the disk, so data lasts as long as the
+    process.
+    """
+
+    def __init__(self, name='memory'):
+        self.name = name
+        self.lock = threading.RLock()
+        self.write_version = 0
+        self.counters = MemoryCounters()
+        self._objects = {}
+        self._objects_lock = threading.Lock()
+        self._ids = {}
+
+        self.users = {}             # id -> user dict
+        self.user_names = {}        # username -> id
+        self.user_emails = {}       # email -> id
+        self.admins = {}            # id -> admin dict
+        self.admin_names = {}       # username -> id
+
+        self.slots = {}             # id -> slot dict
+        self.slot_numbers = {}      # slot_number -> id
+        self.available = {}         # (floor, slot_type) -> sorted [(slot_number, id)]
+        self.ranked = {}            # (floor, slot_type) -> sorted [(priority, slot_number, id)]
+
+        self.bookings = {}          # id -> booking dict
+        self.user_bookings = {}     # user_id -> {booking id}
+        self.by_status = {}         # status -> {booking id}
+        self.timeline = []          # sorted [(booking_ts, id)]
+        self.status_timelines = {}  # status -> sorted [(booking_ts, id)]
+
+    # DatabaseManager interface used by the shared helpers
+
+    @property
+    def data_version(self):
+        """Counter that moves forward after every write"""
+        return self.write_version
+
+    def bump_version(self):
+        """Record that a write was made (lock held)"""
+        self.write_version += 1
+
+    def shared(self, key, factory):
+        """Return a helper bound to this store, building it on first use"""
+        with self._objects_lock:
+            obj = self._objects.get(key)
+        if obj is None:
+            created = factory(self)
+            with self._objects_lock:
+                obj = self._objects.setdefault(key, created)
+        return obj
+
+    def close(self):
+        """Nothing to release; present so callers can treat every store alike"""
+
+    # Rows (every method below expects `lock` to be held)
+
+    def next_id(self, table):
+        ids = self._ids.get(table)
+        if ids is None:
+            ids = self._ids[table] = itertools.count(1)
+        return next(ids)
+
+    @staticmethod
+    def timestamp():
+        """CURRENT_TIMESTAMP as SQLite writes it (UTC)"""
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+    def insert_user(self, username, password, email, phone, vehicle_number):
+        user = {'id': self.next_id('users'), 'username': username, 'password': password, 'email': email,
+                'phone': phone, 'vehicle_number': vehicle_number, 'created_at': self.timestamp()}
+        self.users[user['id']] = user
+        self.user_names[username] = user['id']
+        self.user_emails[email] = user['id']
+        self.bump_version()
+        return user
+
+    def insert_admin(self, username, password, email):
+        admin = {'id': self.next_id('admin'), 'username': username, 'password': password, 'email': email,
+                 'created_at': self.timestamp()}
+        self.admins[admin['id']] = admin
+        self.admin_names[username] = admin['id']
+        self.bump_version()
+        return admin
+
+    def _index_slot(self, slot):
+        if slot['status'] == 'Available':
+            key = (slot['floor'], slot['slot_type'])
+            bisect.insort(self.available.setdefault(key, []), (slot['slot_number'], slot['id']))
+            bisect.insort(self.ranked.setdefault(key, []), (slot['priority'], slot['slot_number'], slot['id']))
+
+    def _unindex_slot(self, slot):
+        if slot['status'] != 'Available':
+            return
+        key = (slot['floor'], slot['slot_type'])
+        for bucket, entry in ((self.available, (slot['slot_number'], slot['id'])),
+                              (self.ranked, (slot['priority'], slot['slot_number'], slot['id']))):
+            entries = bucket.get(key, [])
+            position = bisect.bisect_left(entries, entry)
+            if position < len(entries) and entries[position] == entry:
+                del entries[position]
+            if not entries:
+                bucket.pop(key, None)
+
+    def insert_slot(self, slot_number, slot_type, floor, priority=0):
+        slot = {'id': self.next_id('slots'), 'slot_number': slot_number, 'slot_type': slot_type,
+                'status': 'Available', 'floor': floor, 'priority': priority, 'created_at': self.timestamp()}
+        self.slots[slot['id']] = slot
+        self.slot_numbers[slot_number] = slot['id']
+        self._index_slot(slot)
+        self.counters.update(['slots:total', 'slots:Available'])
+        self.bump_version()
+        return slot
+
+    def update_slot(self, slot, **changes):
+        """Change slot columns, keeping the number lookup, availability buckets and counters current"""
+        self._unindex_slot(slot)
+        if 'slot_number' in changes:
+            del self.slot_numbers[slot['slot_number']]
+            self.slot_numbers[changes['slot_number']] = slot['id']
+        if 'status' in changes:
+            self.counters[f"slots:{slot['status']}"] -= 1
+            self.counters[f"slots:{changes['status']}"] += 1
+        slot.update(changes)
+        self._index_slot(slot)
+        self.bump_version()
+
+    def delete_slot(self, slot):
+        self._unindex_slot(slot)
+        del self.slots[slot['id']]
+        del self.slot_numbers[slot['slot_number']]
+        self.counters['slots:total'] -= 1
+        self.counters[f"slots:{slot['status']}"] -= 1
+        self.bump_version()
+
+    def available_slots(self, floor=None, slot_type=None):
+        """Available slot dicts matching the filter, ordered by slot_number"""
+        buckets = [
+            entries for (bucket_floor, bucket_type), entries in self.available.items()
+            if (floor is None or bucket_floor == floor) and (slot_type is None or bucket_type == slot_type)
+        ]
+        entries = buckets[0] if len(buckets) == 1 else sorted(itertools.chain.from_iterable(buckets))
+        return [self.slots[slot_id] for _, slot_id in entries]
+
+    def best_slot(self, slot_type, floor=None):
+        """The available slot an auto-assigned booking gets, as SlotAllocator.reserve picks it:
+        the preferred floor first, then the lowest priority on any floor, nearer floors breaking ties"""
+        if floor is not None and self.ranked.get((floor, slot_type)):
+            return self.slots[self.ranked[(floor, slot_type)][0][2]]
+        ranked = [
+            (entries[0][0], abs(bucket_floor - floor) if floor is not None else 0, entries[0][1], bucket_floor,
+             entries[0][2])
+            for (bucket_floor, bucket_type), entries in self.ranked.items()
+            if bucket_type == slot_type and entries
+        ]
+        return self.slots[min(ranked)[4]] if ranked else None
+
+    def insert_booking(self, **fields):
+        booking = dict({'checkout_time': None, 'checkout_ts': None, 'actual_cost': None}, **fields)
+        booking['id'] = self.next_id('bookings')
+        self.bookings[booking['id']] = booking
+        self.user_bookings.setdefault(booking['user_id'], set()).add(booking['id'])
+        self.by_status.setdefault(booking['status'], set()).add(booking['id'])
+        key = (booking['booking_ts'] or 0, booking['id'])
+        bisect.insort(self.timeline, key)
+        bisect.insort(self.status_timelines.setdefault(booking['status'], []), key)
+        self.counters.update(['bookings:total', f"bookings:{booking['status']}"])
+        self.bump_version()
+        return booking
+
+    def update_booking(self, booking, **changes):
+        """Change booking columns, keeping the status indexes and counters current"""
+        if 'status' in changes and changes['status'] != booking['status']:
+            self.by_status[booking['status']].discard(booking['id'])
+            self.by_status.setdefault(changes['status'], set()).add(booking['id'])
+            key = (booking['booking_ts'] or 0, booking['id'])
+            entries = self.status_timelines[booking['status']]
+            del entries[bisect.bisect_left(entries, key)]
+            bisect.insort(self.status_timelines.setdefault(changes['status'], []), key)
+            self.counters[f"bookings:{booking['status']}"] -= 1
+            self.counters[f"bookings:{changes['status']}"] += 1
+        booking.update(changes)
+        self.bump_version()
+
+    def bookings_with_status(self, status, user_id=None):
+        """Booking dicts with a status, optionally of one user"""
+        ids = self.by_status.get(status, set())
+        if user_id is not None:
+            ids = self.user_bookings.get(user_id, set()) & ids
+        return [self.bookings[booking_id] for booking_id in ids]
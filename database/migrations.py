@@ -0,0 +1,207 @@
+"""
+Schema Migrations Module
+Versioned, ordered up-migrations applied at startup
+"""
+
+import sqlite3
+
+from database import rollups
+
+
+class SchemaMigrator:
+    """Applies pending schema migrations and records them in schema_version"""
+
+    # Ordered list of migrations. Each step is either an SQL string or a
+    # callable taking a cursor (for data backfills). Never edit a released
+    # migration; append a new one instead.
+    MIGRATIONS = [
+        {
+            'version': 1,
+            'description': 'Indexes for booking and slot hot paths',
+            'steps': [
+                "CREATE INDEX IF NOT EXISTS idx_bookings_user_status ON bookings (user_id, status)",
+                "CREATE INDEX IF NOT EXISTS idx_bookings_status_time ON bookings (status, booking_time)",
+                "CREATE INDEX IF NOT EXISTS idx_bookings_slot_status ON bookings (slot_id, status)",
+                "CREATE INDEX IF NOT EXISTS idx_bookings_time ON bookings (booking_time)",
+                "CREATE INDEX IF NOT EXISTS idx_slots_status_floor_number ON slots (status, floor, slot_number)",
+            ]
+        },
+        {
+            'version': 2,
+            'description': 'Integer epoch columns for booking and checkout times',
+            'steps': [
+                lambda cursor: SchemaMigrator._add_columns(cursor, 'bookings', {
+                    'booking_ts': 'INTEGER',
+                    'checkout_ts': 'INTEGER'
+                }),
+                # Wall-clock seconds: the stored local time read as if it were UTC,
+                # so differences and ordering match the string columns exactly
+                """
+                UPDATE bookings SET
+                    booking_ts = CAST(strftime('%s', booking_time) AS INTEGER),
+                    checkout_ts = CAST(strftime('%s', checkout_time) AS INTEGER)
+                """,
+                # Keep the integer columns in step for writers that only set the strings
+                """
+                CREATE TRIGGER IF NOT EXISTS trg_bookings_ts_insert AFTER INSERT ON bookings
+                WHEN NEW.booking_ts IS NOT CAST(strftime('%s', NEW.booking_time) AS INTEGER)
+                  OR NEW.checkout_ts IS NOT CAST(strftime('%s', NEW.checkout_time) AS INTEGER)
+                BEGIN
+                    UPDATE bookings SET
+                        booking_ts = CAST(strftime('%s', NEW.booking_time) AS INTEGER),
+                        checkout_ts = CAST(strftime('%s', NEW.checkout_time) AS INTEGER)
+                    WHERE id = NEW.id;
+                END
+                """,
+                """
+                CREATE TRIGGER IF NOT EXISTS trg_bookings_ts_update
+                AFTER UPDATE OF booking_time, checkout_time ON bookings
+                WHEN NEW.booking_ts IS NOT CAST(strftime('%s', NEW.booking_time) AS INTEGER)
+                  OR NEW.checkout_ts IS NOT CAST(strftime('%s', NEW.checkout_time) AS INTEGER)
+                BEGIN
+                    UPDATE bookings SET
+                        booking_ts = CAST(strftime('%s', NEW.booking_time) AS INTEGER),
+                        checkout_ts = CAST(strftime('%s', NEW.checkout_time) AS INTEGER)
+                    WHERE id = NEW.id;
+                END
+                """,
+                "DROP INDEX IF EXISTS idx_bookings_status_time",
+                "DROP INDEX IF EXISTS idx_bookings_time",
+                "CREATE INDEX IF NOT EXISTS idx_bookings_status_ts ON bookings (status, booking_ts)",
+                "CREATE INDEX IF NOT EXISTS idx_bookings_ts ON bookings (booking_ts)",
+            ]
+        },
+        {
+            'version': 3,
+            'description': 'Hourly and daily revenue / occupancy rollups',
+            'steps': [
+                rollups.CREATE_TABLE,
+                rollups.backfill,
+            ]
+        },
+        {
+            'version': 4,
+            'description': 'Per-slot allocation priority (distance to the entrance)',
+            'steps': [
+                lambda cursor: SchemaMigrator._add_columns(cursor, 'slots', {
+                    'priority': 'INTEGER NOT NULL DEFAULT 0'
+                }),
+            ]
+        },
+        {
+            'version': 5,
+            'description': 'Stored, indexed expected end time for overstay detection',
+            'steps': [
+                lambda cursor: SchemaMigrator._add_columns(cursor, 'bookings', {
+                    'expected_end_ts': 'INTEGER'
+                }),
+                """
+                UPDATE bookings SET
+                    expected_end_ts = booking_ts + CAST(COALESCE(expected_duration, 1.0) * 3600 AS INTEGER)
+                """,
+                # Derived from booking_ts, which the epoch triggers may only fill in after the insert
+                """
+                CREATE TRIGGER IF NOT EXISTS trg_bookings_end_insert AFTER INSERT ON bookings
+                WHEN NEW.expected_end_ts IS NOT NEW.booking_ts + CAST(COALESCE(NEW.expected_duration, 1.0) * 3600 AS INTEGER)
+                BEGIN
+                    UPDATE bookings SET
+                        expected_end_ts = booking_ts + CAST(COALESCE(expected_duration, 1.0) * 3600 AS INTEGER)
+                    WHERE id = NEW.id;
+                END
+                """,
+                """
+                CREATE TRIGGER IF NOT EXISTS trg_bookings_end_update
+                AFTER UPDATE OF booking_ts, expected_duration ON bookings
+                WHEN NEW.expected_end_ts IS NOT NEW.booking_ts + CAST(COALESCE(NEW.expected_duration, 1.0) * 3600 AS INTEGER)
+                BEGIN
+                    UPDATE bookings SET
+                        expected_end_ts = booking_ts + CAST(COALESCE(expected_duration, 1.0) * 3600 AS INTEGER)
+                    WHERE id = NEW.id;
+                END
+                """,
+                "CREATE INDEX IF NOT EXISTS idx_bookings_status_end ON bookings (status, expected_end_ts)",
+            ]
+        },
+        {
+            'version': 6,
+            'description': 'Write epoch, so each process notices commits made by the others',
+            'steps': [
+                """
+                CREATE TABLE IF NOT EXISTS write_epoch (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    epoch INTEGER NOT NULL
+                )
+                """,
+                "INSERT OR IGNORE INTO write_epoch (id, epoch) VALUES (1, 0)",
+            ]
+        },
+    ]
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    @staticmethod
+    def _add_columns(cursor, table, columns):
+        """ALTER TABLE ADD COLUMN for each column the table does not have yet"""
+        existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+        for name, definition in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+    def ensure_version_table(self):
+        """Create the schema_version table if needed"""
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        self.conn.commit()
+
+    def current_version(self):
+        """Return the highest applied migration version (0 for a fresh schema)"""
+        row = self.conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+        return row[0] or 0
+
+    def pending(self):
+        """Return migrations newer than the current schema version"""
+        current = self.current_version()
+        return [m for m in self.MIGRATIONS if m['version'] > current]
+
+    def migrate(self):
+        """Apply every pending migration, each in its own transaction.
+
+        BEGIN IMMEDIATE takes the write lock before re-checking the version,
+        so two processes starting at once cannot apply the same step twice.
+        """
+        self.ensure_version_table()
+        applied = []
+
+        for migration in sorted(self.pending(), key=lambda m: m['version']):
+            if self.conn.in_transaction:
+                self.conn.commit()
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if migration['version'] <= self.current_version():
+                    self.conn.rollback()
+                    continue
+
+                cursor = self.conn.cursor()
+                for step in migration['steps']:
+                    if callable(step):
+                        step(cursor)
+                    else:
+                        cursor.execute(step)
+
+                cursor.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                    (migration['version'], migration['description'])
+                )
+                self.conn.commit()
+                applied.append(migration['version'])
+            except sqlite3.Error:
+                self.conn.rollback()
+                raise
+
+        return applied
@@ -0,0 +1,235 @@
+"""
+Query Profiler Module
+Opt-in per-statement timing, slow-query log and EXPLAIN capture
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+
+from config import Config
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)+\s*\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+# Statements EXPLAIN QUERY PLAN can describe
+_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(query):
+    """Collapse whitespace and replace literals with ?, so statements differing only in values group together"""
+    query = _STRING.sub('?', query)
+    query = _NUMBER.sub('?', query)
+    query = _SPACE.sub(' ', query).strip()
+    return _IN_LIST.sub('IN (?, ...)', query)
+
+
+def param_shape(params):
+    """Types of the bound parameters (never their values), e.g. '(int, str)'"""
+    if isinstance(params, dict):
+        return '{' + ', '.join(f"{key}: {type(value).__name__}" for key, value in params.items()) + '}'
+    return '(' + ', '.join(type(value).__name__ for value in params) + ')'
+
+
+class QueryProfiler:
+    """Aggregates statement timings per normalized SQL text.
+
+    Disabled unless Config.QUERY_PROFILER is set or enable() is called, in
+    which case DatabaseManager reports every statement it runs, including
+    those issued through transaction() cursors. Statements slower than
+    slow_ms are appended to the slow-query log (JSON lines) together with
+    their EXPLAIN QUERY PLAN; parameter values are used for the EXPLAIN but
+    only their types are recorded.
+    """
+
+    # Distinct statements tracked before new ones are folded into one bucket
+    MAX_STATEMENTS = 1000
+    OVERFLOW = '(other statements)'
+
+    def __init__(self, db, enabled=None, slow_ms=None, log_path=None, recent_size=50):
+        self.db = db
+        self.enabled = Config.QUERY_PROFILER if enabled is None else enabled
+        self.slow_ms = Config.SLOW_QUERY_MS if slow_ms is None else slow_ms
+        log_path = log_path if log_path is not None else Config.SLOW_QUERY_LOG
+        # Relative names are resolved next to the project root, like the database; '' disables the file
+        self.log_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), log_path) if log_path else None
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self._stats = {}
+        self._recent_slow = deque(maxlen=recent_size)
+
+    @classmethod
+    def for_database(cls, db):
+        """Return the shared profiler for a database"""
+        return db.shared('query_profiler', cls)
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        """Forget all collected timings"""
+        with self._lock:
+            self._stats.clear()
+            self._recent_slow.clear()
+
+    def record(self, query, params, seconds, rows):
+        """Account one executed statement"""
+        sql = normalize_sql(query)
+        shape = param_shape(params)
+        with self._lock:
+            entry = self._stats.get(sql)
+            if entry is None:
+                if len(self._stats) >= self.MAX_STATEMENTS:
+                    sql = self.OVERFLOW
+                    entry = self._stats.get(sql)
+                if entry is None:
+                    entry = self._stats[sql] = {'calls': 0, 'total': 0.0, 'max': 0.0, 'rows': 0, 'shapes': set()}
+            entry['calls'] += 1
+            entry['total'] += seconds
+            entry['max'] = max(entry['max'], seconds)
+            entry['rows'] += rows
+            if len(entry['shapes']) < 5:
+                entry['shapes'].add(shape)
+
+        if seconds * 1000 >= self.slow_ms:
+            self._log_slow(query, sql, shape, params, seconds, rows)
+
+    def explain(self, query, params=()):
+        """EXPLAIN QUERY PLAN details for a statement (empty for statements it cannot describe)"""
+        if not query.lstrip().upper().startswith(_EXPLAINABLE):
+            return []
+        try:
+            # Reuses the connection (and transaction) this thread already holds
+            with self.db.pool.connection() as conn:
+                return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+        except Exception as e:
+            return [f"EXPLAIN failed: {e}"]
+
+    def _log_slow(self, query, sql, shape, params, seconds, rows):
+        entry = {
+            'time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'duration_ms': round(seconds * 1000, 3),
+            'rows': rows,
+            'sql': sql,
+            'params': shape,
+            'plan': self.explain(query, params)
+        }
+        with self._lock:
+            self._recent_slow.append(entry)
+        if not self.log_path:
+            return
+        try:
+            with self._log_lock, open(self.log_path, 'a', encoding='utf-8') as log:
+                log.write(json.dumps(entry) + '\n')
+        except OSError as e:
+            print(f"Slow query log error: {e}")
+
+    def top(self, limit=20):
+        """The statements with the most total time, heaviest first"""
+        with self._lock:
+            entries = sorted(self._stats.items(), key=lambda item: item[1]['total'], reverse=True)[:limit]
+            return [
+                {
+                    'sql': sql,
+                    'calls': entry['calls'],
+                    'total_ms': round(entry['total'] * 1000, 3),
+                    'avg_ms': round(entry['total'] * 1000 / entry['calls'], 3),
+                    'max_ms': round(entry['max'] * 1000, 3),
+                    'rows': entry['rows'],
+                    'param_shapes': sorted(entry['shapes'])
+                }
+                for sql, entry in entries
+            ]
+
+    def summary(self, limit=20):
+        """Top statements plus the most recent slow ones, for the admin API"""
+        with self._lock:
+            recent = list(self._recent_slow)
+            statements = len(self._stats)
+        return {
+            'enabled': self.enabled,
+            'slow_ms': self.slow_ms,
+            'statements': statements,
+            'top': self.top(limit),
+            'recent_slow': recent[::-1]
+        }
+
+
+class ProfilingCursor:
+    """sqlite3 cursor wrapper that reports each statement to a QueryProfiler.
+
+    A statement's time includes the fetches made before the next execute (or
+    flush()), since SQLite produces result rows lazily while they are fetched.
+    """
+
+    def __init__(self, cursor, profiler):
+        self._cursor = cursor
+        self._profiler = profiler
+        self._pending = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def _timed(self, call, *args):
+        started = time.perf_counter()
+        try:
+            return call(*args)
+        finally:
+            if self._pending is not None:
+                self._pending[2] += time.perf_counter() - started
+
+    def flush(self):
+        """Report the statement still being fetched, if any"""
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            query, params, seconds, rows = pending
+            self._profiler.record(query, params, seconds, rows)
+
+    def execute(self, query, params=()):
+        self.flush()
+        started = time.perf_counter()
+        self._cursor.execute(query, params)
+        self._pending = [query, params, time.perf_counter() - started, max(self._cursor.rowcount, 0)]
+        return self
+
+    def executemany(self, query, seq_of_params):
+        self.flush()
+        seq_of_params = list(seq_of_params)
+        started = time.perf_counter()
+        self._cursor.executemany(query, seq_of_params)
+        # Timed as one statement; the first row's parameters stand in for the batch
+        self._pending = [query, seq_of_params[0] if seq_of_params else (),
+                         time.perf_counter() - started, max(self._cursor.rowcount, 0)]
+        return self
+
+    def fetchone(self):
+        row = self._timed(self._cursor.fetchone)
+        if row is not None and self._pending is not None:
+            self._pending[3] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(self._cursor.fetchmany, *(() if size is None else (size,)))
+        if self._pending is not None:
+            self._pending[3] += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(self._cursor.fetchall)
+        if self._pending is not None:
+            self._pending[3] += len(rows)
+        return rows
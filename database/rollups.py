@@ -0,0 +1,88 @@
+"""
+Rollups Module
+Hourly and daily revenue / occupancy aggregates maintained at checkout
+"""
+
+HOUR = 3600
+DAY = 86400
+BUCKETS = {'hour': HOUR, 'day': DAY}
+
+CREATE_TABLE = '''
+    CREATE TABLE IF NOT EXISTS booking_rollups (
+        bucket TEXT NOT NULL,
+        period_start INTEGER NOT NULL,
+        floor INTEGER NOT NULL,
+        slot_type TEXT NOT NULL,
+        package_type TEXT NOT NULL,
+        bookings INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        stay_seconds INTEGER NOT NULL DEFAULT 0,
+        occupied_seconds INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (bucket, period_start, floor, slot_type, package_type)
+    ) WITHOUT ROWID
+'''
+
+UPSERT = '''
+    INSERT INTO booking_rollups (bucket, period_start, floor, slot_type, package_type,
+                                 bookings, revenue, stay_seconds, occupied_seconds)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (bucket, period_start, floor, slot_type, package_type) DO UPDATE SET
+        bookings = bookings + excluded.bookings,
+        revenue = revenue + excluded.revenue,
+        stay_seconds = stay_seconds + excluded.stay_seconds,
+        occupied_seconds = occupied_seconds + excluded.occupied_seconds
+'''
+
+
+def rollup_rows(start_ts, end_ts, floor, slot_type, package_type, revenue):
+    """UPSERT parameter rows for one completed booking.
+
+    The booking, its revenue and its whole stay are counted in the hour and
+    day of checkout; occupied seconds are spread over every hour and day the
+    stay overlaps, so occupancy reflects when the slot was actually in use.
+    """
+    floor = floor if floor is not None else 0
+    slot_type = slot_type or ''
+    package_type = package_type or ''
+    end_ts = max(end_ts, start_ts)
+    rows = []
+
+    for bucket, size in BUCKETS.items():
+        checkout_period = end_ts - end_ts % size
+        occupied = {}
+        period = start_ts - start_ts % size
+        while period < end_ts:
+            overlap = min(end_ts, period + size) - max(start_ts, period)
+            if overlap > 0:
+                occupied[period] = overlap
+            period += size
+
+        for period in sorted(set(occupied) | {checkout_period}):
+            is_checkout = period == checkout_period
+            rows.append((
+                bucket, period, floor, slot_type, package_type,
+                1 if is_checkout else 0,
+                revenue if is_checkout else 0,
+                end_ts - start_ts if is_checkout else 0,
+                occupied.get(period, 0)
+            ))
+    return rows
+
+
+def record_checkout(cursor, start_ts, end_ts, floor, slot_type, package_type, revenue):
+    """Fold one completed booking into the rollups (call inside the checkout transaction)"""
+    if start_ts is None or end_ts is None:
+        return
+    cursor.executemany(UPSERT, rollup_rows(start_ts, end_ts, floor, slot_type, package_type, revenue or 0))
+
+
+def backfill(cursor):
+    """Build the rollups from every completed booking already in the table"""
+    cursor.execute('''
+        SELECT b.booking_ts, b.checkout_ts, s.floor, s.slot_type, b.package_type, b.actual_cost
+        FROM bookings b
+        JOIN slots s ON b.slot_id = s.id
+        WHERE b.status = 'Completed' AND b.booking_ts IS NOT NULL AND b.checkout_ts IS NOT NULL
+    ''')
+    for start_ts, end_ts, floor, slot_type, package_type, revenue in cursor.fetchall():
+        record_checkout(cursor, start_ts, end_ts, floor, slot_type, package_type, revenue)
@@ -3,20 +3,23 @@ Authentication Module
 Handles user and admin login/registration
 """
 
-from database.db_manager import DatabaseManager
-from utils.validators import Validator
+from database.lot_router import LotRouter
+from modules.repositories import UserRepository
+from modules.user_cache import UserCache
 
 
-class Authentication:
-    """Authentication class for login and registration"""
+class Authentication(UserRepository):
+    """Authentication class for login and registration (the SQLite user repository)"""
     
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db=None):
+        # Users and admins are global, whichever lot they park in
+        self.db = db or LotRouter.default().users_db
+        self.cache = UserCache.for_database(self.db)
     
     def admin_login(self, username, password):
         """Admin login verification"""
         query = "SELECT id, username, email FROM admin WHERE username = ? AND password = ?"
-        result = self.db.fetch_one(query, (username, password))
+        result = self.db.fetch_one(query, (username, password), name='admin_login')
         
         if result:
             return {
@@ -31,9 +34,11 @@ class Authentication:
     def user_login(self, username, password):
         """User login verification"""
         query = "SELECT id, username, email, phone, vehicle_number FROM users WHERE username = ? AND password = ?"
-        result = self.db.fetch_one(query, (username, password))
+        result = self.db.fetch_one(query, (username, password), name='user_login')
         
         if result:
+            # Warm the profile cache; the next page load will need it
+            self.cache.put(('profile', result[0]), self._profile_from_row(result))
             return {
                 'success': True,
                 'user_id': result[0],
@@ -45,23 +50,22 @@ class Authentication:
             }
         return {'success': False, 'message': 'Invalid user credentials'}
     
+    def get_user_profile(self, user_id):
+        """Get a user's profile (cached)"""
+        def load():
+            query = "SELECT id, username, email, phone, vehicle_number FROM users WHERE id = ?"
+            row = self.db.fetch_one(query, (user_id,), name='user_profile')
+            return self._profile_from_row(row) if row else None
+        
+        profile = self.cache.get_or_load(('profile', user_id), load)
+        return dict(profile) if profile else None
+    
     def register_user(self, username, password, email, phone, vehicle_number):
         """Register new user"""
         # Validate inputs
-        if not Validator.validate_username(username):
-            return {'success': False, 'message': 'Invalid username. Use 3-20 alphanumeric characters.'}
-        
-        if not Validator.validate_password(password):
-            return {'success': False, 'message': 'Password must be at least 6 characters long.'}
-        
-        if not Validator.validate_email(email):
-            return {'success': False, 'message': 'Invalid email format.'}
-        
-        if not Validator.validate_phone(phone):
-            return {'success': False, 'message': 'Invalid phone number. Use 10 digits.'}
-        
-        if not Validator.validate_vehicle_number(vehicle_number):
-            return {'success': False, 'message': 'Invalid vehicle number format.'}
+        error = self._registration_error(username, password, email, phone, vehicle_number)
+        if error:
+            return {'success': False, 'message': error}
         
         # Check if username already exists
         check_query = "SELECT id FROM users WHERE username = ? OR email = ?"
@@ -75,25 +79,21 @@ class Authentication:
             INSERT INTO users (username, password, email, phone, vehicle_number)
             VALUES (?, ?, ?, ?, ?)
         """
-        success = self.db.execute_query(
+        user_id = self.db.execute_insert(
             insert_query,
             (username, password, email, phone, vehicle_number.upper())
         )
         
-        if success:
+        if user_id:
+            self.cache.invalidate_user(user_id)
             return {'success': True, 'message': 'Registration successful! You can now login.'}
         return {'success': False, 'message': 'Registration failed. Please try again.'}
     
     def add_admin(self, username, password, email):
         """Add new admin account (admin only)"""
-        if not Validator.validate_username(username):
-            return {'success': False, 'message': 'Invalid username.'}
-        
-        if not Validator.validate_password(password):
-            return {'success': False, 'message': 'Password must be at least 6 characters long.'}
-        
-        if email and not Validator.validate_email(email):
-            return {'success': False, 'message': 'Invalid email format.'}
+        error = self._admin_error(username, password, email)
+        if error:
+            return {'success': False, 'message': error}
         
         # Check if username already exists
         check_query = "SELECT id FROM admin WHERE username = ?"
@@ -0,0 +1,104 @@
+"""
+Booking Archiver Module
+Moves old finished bookings from the hot table into the attached archive database
+"""
+
+import json
+import time
+from datetime import datetime
+
+from config import Config
+from database.db_manager import DatabaseManager
+from database.lot_router import LotRouter
+from modules.event_bus import EventBus
+from utils.helpers import Helper
+
+
+class BookingArchiver:
+    """Moves Completed/Cancelled bookings older than a cut-off into archive.bookings.
+
+    Each batch is two short transactions: copy the rows into the archive,
+    then delete them from the hot table and add them back to stats_counters
+    (the delete triggers decrement them), so dashboard totals still count
+    history. Archive rows are written with INSERT OR REPLACE, so a batch
+    interrupted between the two steps is simply completed by the next run.
+    """
+
+    def __init__(self, db=None, older_than_days=None, batch_size=None, lot=None):
+        self.db = db or LotRouter.default().database(lot)
+        self.older_than_days = older_than_days if older_than_days is not None else Config.ARCHIVE_AFTER_DAYS
+        self.batch_size = batch_size or Config.ARCHIVE_BATCH_SIZE
+        self.events = EventBus.for_database(self.db)
+
+    def _columns(self, cursor):
+        cursor.execute("PRAGMA main.table_info(bookings)")
+        return [row[1] for row in cursor.fetchall()]
+
+    def archive_batch(self, cutoff_ts):
+        """Move up to batch_size finished bookings that ended before cutoff_ts; returns rows moved"""
+        archive = DatabaseManager.ARCHIVE
+
+        # Commits are atomic per database file, not across attached files, so the
+        # copy is committed first and the hot rows are only deleted once it is durable
+        with self.db.transaction('archive_copy') as cursor:
+            # One (status, booking_ts) index range per finished status; a booking
+            # that ended before the cut-off also started before it
+            cursor.execute("""
+                SELECT id FROM bookings
+                WHERE status IN ('Completed', 'Cancelled') AND booking_ts < ?
+                  AND (checkout_ts IS NULL OR checkout_ts < ?)
+                ORDER BY booking_ts
+                LIMIT ?
+            """, (cutoff_ts, cutoff_ts, self.batch_size))
+            ids = json.dumps([row[0] for row in cursor.fetchall()])
+            if ids == '[]':
+                return 0
+
+            columns = ', '.join(self._columns(cursor))
+            cursor.execute(f"""
+                INSERT OR REPLACE INTO {archive}.bookings ({columns}, archived_at)
+                SELECT {columns}, ? FROM main.bookings
+                WHERE id IN (SELECT value FROM json_each(?))
+            """, (int(time.time()), ids))
+
+        with self.db.transaction('archive_delete') as cursor:
+            moved_ids = f"""
+                SELECT b.id FROM main.bookings b
+                JOIN {archive}.bookings a ON a.id = b.id
+                WHERE b.id IN (SELECT value FROM json_each(?))
+                  AND b.status IN ('Completed', 'Cancelled')
+            """
+            cursor.execute(f"""
+                SELECT status, COUNT(*) FROM main.bookings
+                WHERE id IN ({moved_ids}) GROUP BY status
+            """, (ids,))
+            moved = cursor.fetchall()
+            cursor.execute(f"DELETE FROM main.bookings WHERE id IN ({moved_ids})", (ids,))
+
+            # The delete triggers decremented the counters; archived bookings still count
+            total = sum(count for _, count in moved)
+            cursor.executemany("""
+                INSERT INTO stats_counters (name, value) VALUES (?, ?)
+                ON CONFLICT(name) DO UPDATE SET value = value + excluded.value
+            """, [('bookings:total', total)] + [(f'bookings:{status}', count) for status, count in moved])
+
+        return total
+
+    def run(self, max_batches=None, now=None):
+        """Archive every eligible booking, one batch per transaction"""
+        now = now or datetime.now()
+        now_ts = Helper.to_epoch(now.strftime("%Y-%m-%d %H:%M:%S"))
+        cutoff_ts = now_ts - int(self.older_than_days * 86400)
+
+        archived = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            moved = self.archive_batch(cutoff_ts)
+            if not moved:
+                break
+            archived += moved
+            batches += 1
+
+        if archived:
+            self.events.publish('bookings.archived', {'archived': archived, 'cutoff': Helper.from_epoch(cutoff_ts)})
+        return {'archived': archived, 'batches': batches, 'cutoff': Helper.from_epoch(cutoff_ts)}
@@ -3,80 +3,76 @@ Booking Management Module
 Handles all booking operations for users
 """
 
+import heapq
+import itertools
+import json
+import sqlite3
+
 from database.db_manager import DatabaseManager
+from database.lot_router import LotRouter
+from database.counters import StatsCounters
+from database import rollups
+from modules.repositories import BookingRepository
+from modules.slot_index import SlotAvailabilityIndex
+from modules.slot_allocator import SlotAllocator
+from modules.event_bus import EventBus
+from modules.user_cache import UserCache
 from utils.helpers import Helper
+from utils.billing import BillingEngine
 from utils.validators import Validator
-from datetime import datetime, timedelta
+from datetime import datetime
+
+
+class BookingConflict(Exception):
+    """Raised inside a booking transaction to roll it back with a user-facing message"""
+
+
+class SlotUnavailable(BookingConflict):
+    """The chosen slot is gone or taken; auto-assigned bookings retry with another one"""
 
 
-class BookingManager:
-    """Manages parking booking operations"""
+class BookingManager(BookingRepository):
+    """Manages parking booking operations (the SQLite booking repository)"""
     
-    # Booking packages with rates
-    PACKAGES = {
-        'hourly': {'name': 'Hourly', 'rate': 50, 'duration_hours': 1},
-        'half_day': {'name': 'Half Day (6 hours)', 'rate': 250, 'duration_hours': 6},
-        'full_day': {'name': 'Full Day (24 hours)', 'rate': 400, 'duration_hours': 24},
-        'weekly': {'name': 'Weekly (7 days)', 'rate': 2500, 'duration_hours': 168},
-        'monthly': {'name': 'Monthly (30 days)', 'rate': 8000, 'duration_hours': 720}
-    }
+    # Statuses that are never archived, so history reads can skip the archive
+    HOT_ONLY_STATUSES = ('Active', 'Scheduled')
     
-    def __init__(self):
-        self.db = DatabaseManager()
+    # Slots an auto-assigned booking tries before giving up
+    AUTO_ASSIGN_ATTEMPTS = 5
     
-    def book_slot(self, user_id, slot_id, vehicle_number, booking_date=None, booking_time=None, package='hourly'):
-        """Book a parking slot with date, time and package"""
+    # Columns of the rows passed to _bill_checkouts / _complete_bookings (see BookingRepository)
+    CHECKOUT_COLUMNS = """
+        b.id, b.slot_id, s.slot_number, b.vehicle_number, b.booking_time, b.booking_ts,
+        b.package_type, b.package_cost, b.expected_duration, s.floor, s.slot_type, b.user_id
+    """
+    
+    def __init__(self, db=None, lot=None):
+        self.lot = lot
+        self.db = db or LotRouter.default().database(lot)
+        self.counters = StatsCounters.for_database(self.db)
+        self.slot_index = SlotAvailabilityIndex.for_database(self.db)
+        self.allocator = SlotAllocator.for_database(self.db)
+        self.events = EventBus.for_database(self.db)
+        self.cache = UserCache.for_database(self.db)
+    
+    def book_slot(self, user_id, slot_id, vehicle_number, booking_date=None, booking_time=None, package='hourly',
+                  slot_type=None, floor=None):
+        """Book a parking slot with date, time and package.
+        
+        With slot_id=None the best free slot of slot_type (default Regular) is
+        assigned automatically, on the preferred floor when one is free there.
+        """
         # Validate vehicle number
         if not Validator.validate_vehicle_number(vehicle_number):
             return {'success': False, 'message': 'Invalid vehicle number format.'}
         
         vehicle_number = vehicle_number.upper()
         
-        # Check if slot is available
-        slot_query = "SELECT status, slot_number FROM slots WHERE id = ?"
-        slot = self.db.fetch_one(slot_query, (slot_id,))
-        
-        if not slot:
-            return {'success': False, 'message': 'Slot not found.'}
-        
-        if slot[0] != 'Available':
-            return {'success': False, 'message': 'Slot is not available.'}
-        
-        # Check if user has active bookings
-        active_query = "SELECT COUNT(*) FROM bookings WHERE user_id = ? AND status = 'Active'"
-        active_count = self.db.fetch_one(active_query, (user_id,))[0]
-        
-        if active_count > 0:
-            return {'success': False, 'message': 'You already have an active booking. Please cancel it first.'}
-        
-        # Check if user has scheduled bookings
-        scheduled_query = "SELECT COUNT(*) FROM bookings WHERE user_id = ? AND status = 'Scheduled'"
-        scheduled_count = self.db.fetch_one(scheduled_query, (user_id,))[0]
-        
         # Determine booking status and parse datetime
-        is_scheduled = False
-        if booking_date and booking_time:
-            try:
-                booking_datetime = datetime.strptime(f"{booking_date} {booking_time}", "%Y-%m-%d %H:%M")
-                
-                # Validate booking time is not in the past
-                current_time = datetime.now()
-                if booking_datetime < current_time:
-                    return {'success': False, 'message': 'Booking time cannot be in the past.'}
-                
-                # Check if booking is for future (more than 5 minutes ahead)
-                time_diff = (booking_datetime - current_time).total_seconds()
-                if time_diff > 300:  # 5 minutes
-                    is_scheduled = True
-                    if scheduled_count > 0:
-                        return {'success': False, 'message': 'You already have a scheduled booking. Please cancel it first.'}
-                
-                booking_time_str = booking_datetime.strftime("%Y-%m-%d %H:%M:%S")
-            except ValueError:
-                return {'success': False, 'message': 'Invalid date or time format.'}
-        else:
-            # Use current time if not specified
-            booking_time_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            booking_time_str, is_scheduled = self.booking_start(booking_date, booking_time)
+        except ValueError as e:
+            return {'success': False, 'message': str(e)}
         
         # Get package details
         package_info = self.PACKAGES.get(package, self.PACKAGES['hourly'])
@@ -84,116 +80,477 @@ class BookingManager:
         # Determine status based on booking time
         booking_status = 'Scheduled' if is_scheduled else 'Active'
         
-        # Create booking with package info
-        insert_query = """
-            INSERT INTO bookings (user_id, slot_id, vehicle_number, booking_time, status, package_type, package_cost, expected_duration)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """
-        success = self.db.execute_query(insert_query, (
-            user_id, slot_id, vehicle_number, booking_time_str, 
-            booking_status, package_info['name'], package_info['rate'], package_info['duration_hours']
-        ))
-        
-        if success:
-            # Update slot status to Occupied only for immediate bookings
-            if not is_scheduled:
-                update_query = "UPDATE slots SET status = 'Occupied' WHERE id = ?"
-                self.db.execute_query(update_query, (slot_id,))
+        # Auto-assign reserves the best free slot and retries with the next one if it is lost
+        auto_assign = slot_id is None
+        for _ in range(self.AUTO_ASSIGN_ATTEMPTS if auto_assign else 1):
+            if auto_assign:
+                slot_id = self.allocator.reserve(slot_type or 'Regular', floor)
+                if slot_id is None:
+                    return {'success': False, 'message': f"No {slot_type or 'Regular'} slot is available right now."}
             
-            status_msg = "scheduled" if is_scheduled else "booked"
-            return {
-                'success': True,
-                'message': f'Slot {slot[1]} {status_msg} successfully!',
-                'slot_number': slot[1],
-                'package': package_info['name'],
-                'cost': package_info['rate'],
-                'is_scheduled': is_scheduled,
-                'booking_time': booking_time_str
-            }
+            try:
+                # All checks and writes commit together or not at all
+                with self.db.transaction('book_slot') as cursor:
+                    cursor.execute("SELECT status, slot_number, floor FROM slots WHERE id = ?", (slot_id,))
+                    slot = cursor.fetchone()
+                    
+                    if not slot:
+                        raise SlotUnavailable('Slot not found.')
+                    
+                    if slot[0] != 'Available':
+                        raise SlotUnavailable('Slot is not available.')
+                    
+                    # Check if user has active bookings
+                    cursor.execute(
+                        "SELECT 1 FROM bookings WHERE user_id = ? AND status = 'Active' LIMIT 1",
+                        (user_id,)
+                    )
+                    if cursor.fetchone():
+                        raise BookingConflict('You already have an active booking. Please cancel it first.')
+                    
+                    # Check if user has scheduled bookings
+                    if is_scheduled:
+                        cursor.execute(
+                            "SELECT 1 FROM bookings WHERE user_id = ? AND status = 'Scheduled' LIMIT 1",
+                            (user_id,)
+                        )
+                        if cursor.fetchone():
+                            raise BookingConflict('You already have a scheduled booking. Please cancel it first.')
+                    
+                    # Claim the slot only for immediate bookings; the status guard makes a lost race visible
+                    if not is_scheduled:
+                        cursor.execute(
+                            "UPDATE slots SET status = 'Occupied' WHERE id = ? AND status = 'Available'",
+                            (slot_id,)
+                        )
+                        if cursor.rowcount != 1:
+                            raise SlotUnavailable('Slot was just taken by another booking. Please choose another slot.')
+                        self.db.on_commit(lambda: self.slot_index.set_status(slot_id, 'Occupied'))
+                        self.db.on_commit(lambda: self._publish_slot_status(slot_id, slot[1], slot[2], 'Occupied'))
+                    
+                    # Create booking with package info
+                    booking_ts = Helper.to_epoch(booking_time_str)
+                    cursor.execute("""
+                        INSERT INTO bookings (user_id, slot_id, vehicle_number, booking_time, booking_ts, status, package_type, package_cost, expected_duration, expected_end_ts)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """, (
+                        user_id, slot_id, vehicle_number, booking_time_str, booking_ts,
+                        booking_status, package_info['name'], package_info['rate'], package_info['duration_hours'],
+                        self.expected_end(booking_ts, package_info['duration_hours'])
+                    ))
+                    booking_id = cursor.lastrowid
+                    self.db.on_commit(lambda: self.cache.invalidate_bookings(user_id))
+                    self.db.on_commit(lambda: self.events.publish('booking.' + booking_status.lower(), {
+                        'booking_id': booking_id,
+                        'user_id': user_id,
+                        'slot_id': slot_id,
+                        'slot_number': slot[1],
+                        'vehicle_number': vehicle_number,
+                        'booking_time': booking_time_str,
+                        'package': package_info['name']
+                    }))
+                    if auto_assign:
+                        # After the index has seen the slot occupied; a scheduled booking leaves it free
+                        self.db.on_commit(lambda: self.allocator.release(slot_id, requeue=is_scheduled))
+                break
+            except SlotUnavailable as e:
+                if not auto_assign:
+                    return {'success': False, 'message': str(e)}
+                self.allocator.release(slot_id)
+            except BookingConflict as e:
+                if auto_assign:
+                    self.allocator.release(slot_id, requeue=True)
+                return {'success': False, 'message': str(e)}
+            except sqlite3.Error as e:
+                if auto_assign:
+                    self.allocator.release(slot_id, requeue=True)
+                print(f"Booking transaction error: {e}")
+                return {'success': False, 'message': 'Booking failed. Please try again.'}
+        else:
+            return {'success': False, 'message': 'Every matching slot was just taken. Please try again.'}
         
-        return {'success': False, 'message': 'Booking failed. Please try again.'}
+        status_msg = "scheduled" if is_scheduled else "booked"
+        return {
+            'success': True,
+            'message': f'Slot {slot[1]} {status_msg} successfully!',
+            'slot_id': slot_id,
+            'slot_number': slot[1],
+            'floor': slot[2],
+            'package': package_info['name'],
+            'cost': package_info['rate'],
+            'is_scheduled': is_scheduled,
+            'booking_time': booking_time_str
+        }
     
     def cancel_booking(self, booking_id, user_id):
         """Cancel an active booking with actual cost calculation"""
-        # Get booking details
-        booking_query = """
-            SELECT b.id, b.slot_id, b.user_id, s.slot_number, b.booking_time, b.package_type, b.package_cost, b.expected_duration
-            FROM bookings b
-            JOIN slots s ON b.slot_id = s.id
-            WHERE b.id = ? AND b.user_id = ? AND b.status = 'Active'
+        try:
+            with self.db.transaction('cancel_booking') as cursor:
+                # Get booking details
+                cursor.execute("""
+                    SELECT b.id, b.slot_id, b.user_id, s.slot_number, b.booking_time, b.package_type, b.package_cost, b.expected_duration, s.floor, b.booking_ts, s.slot_type
+                    FROM bookings b
+                    JOIN slots s ON b.slot_id = s.id
+                    WHERE b.id = ? AND b.user_id = ? AND b.status = 'Active'
+                """, (booking_id, user_id))
+                booking = cursor.fetchone()
+                
+                if not booking:
+                    raise BookingConflict('Booking not found or already cancelled.')
+                
+                slot_id = booking[1]
+                slot_number = booking[3]
+                booking_time = booking[4]
+                package_type = booking[5]
+                package_cost = booking[6] if booking[6] else 50.0
+                expected_duration = booking[7] if booking[7] else 1.0
+                
+                # Calculate duration and cost using system time
+                checkout_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                checkout_ts = Helper.to_epoch(checkout_time)
+                if booking[9] is not None:
+                    duration = round((checkout_ts - booking[9]) / 3600, 2)
+                else:
+                    duration = Helper.calculate_duration(booking_time, checkout_time)
+                
+                # Calculate actual cost (either package cost or hourly rate, whichever is higher for fairness)
+                actual_cost = BillingEngine.checkout_cost(duration, package_cost, expected_duration)
+                duration = round(duration, 2)
+                
+                # Complete the booking and free its slot in the same commit
+                cursor.execute("""
+                    UPDATE bookings 
+                    SET status = 'Completed', checkout_time = ?, checkout_ts = ?, actual_cost = ?
+                    WHERE id = ? AND status = 'Active'
+                """, (checkout_time, checkout_ts, actual_cost, booking_id))
+                if cursor.rowcount != 1:
+                    raise BookingConflict('Booking not found or already cancelled.')
+                
+                # Fold the completed stay into the reporting rollups in the same commit
+                rollups.record_checkout(cursor, booking[9], checkout_ts, booking[8], booking[10],
+                                        package_type, actual_cost)
+                
+                cursor.execute("UPDATE slots SET status = 'Available' WHERE id = ?", (slot_id,))
+                self.db.on_commit(lambda: self.slot_index.set_status(slot_id, 'Available'))
+                self.db.on_commit(lambda: self._publish_slot_status(slot_id, slot_number, booking[8], 'Available'))
+                self.db.on_commit(lambda: self.cache.invalidate_bookings(user_id))
+                self.db.on_commit(lambda: self.events.publish('booking.completed', {
+                    'booking_id': booking_id,
+                    'user_id': user_id,
+                    'slot_id': slot_id,
+                    'slot_number': slot_number,
+                    'checkout_time': checkout_time,
+                    'duration': duration,
+                    'actual_cost': actual_cost
+                }))
+        except BookingConflict as e:
+            return {'success': False, 'message': str(e)}
+        except sqlite3.Error as e:
+            print(f"Checkout transaction error: {e}")
+            return {'success': False, 'message': 'Failed to cancel booking.'}
+        
+        return {
+            'success': True,
+            'message': f'Checkout successful!',
+            'slot_number': slot_number,
+            'duration': duration,
+            'package': package_type,
+            'package_cost': package_cost,
+            'actual_cost': actual_cost,
+            'checkout_time': datetime.now().strftime("%d-%b-%Y %I:%M %p")
+        }
+    
+    def book_fleet(self, user_id, vehicle_numbers, slot_type='Regular', floor=None, package='hourly', atomic=True):
+        """Book a slot for every vehicle of a fleet in one transaction.
+        
+        Slots are auto-assigned as in book_slot (lowest priority first, the
+        preferred floor when it has room) and every booking starts now. One
+        account may hold many fleet bookings, but a vehicle that is already
+        parked is rejected. Returns a per-vehicle error report; with
+        atomic=True nothing is booked unless every vehicle gets a slot.
         """
-        booking = self.db.fetch_one(booking_query, (booking_id, user_id))
+        vehicle_numbers = list(vehicle_numbers or [])
+        if len(vehicle_numbers) > self.MAX_FLEET_SIZE:
+            return {'success': False, 'message': f'A fleet booking covers at most {self.MAX_FLEET_SIZE} vehicles.',
+                    'booked': [], 'errors': []}
         
-        if not booking:
-            return {'success': False, 'message': 'Booking not found or already cancelled.'}
+        vehicles, errors = self._fleet_vehicles(vehicle_numbers)
         
-        slot_id = booking[1]
-        slot_number = booking[3]
-        booking_time = booking[4]
-        package_type = booking[5]
-        package_cost = booking[6] if booking[6] else 50.0
-        expected_duration = booking[7] if booking[7] else 1.0
+        package_info = self.PACKAGES.get(package, self.PACKAGES['hourly'])
+        booking_time_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        booking_ts = Helper.to_epoch(booking_time_str)
+        reserved = []
+        booked = []
         
-        # Calculate duration and cost using system time
-        checkout_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        duration = Helper.calculate_duration(booking_time, checkout_time)
+        if vehicles and not (atomic and errors):
+            try:
+                with self.db.transaction('book_fleet') as cursor:
+                    # One set-based lookup for every vehicle that is already parked
+                    cursor.execute(
+                        "SELECT vehicle_number FROM bookings "
+                        "WHERE status = 'Active' AND vehicle_number IN (SELECT value FROM json_each(?))",
+                        (json.dumps([vehicle_number for _, vehicle_number in vehicles]),)
+                    )
+                    parked = {row[0] for row in cursor.fetchall()}
+                    
+                    claimed = []
+                    for row_number, vehicle_number in vehicles:
+                        if vehicle_number in parked:
+                            errors.append({'row': row_number, 'vehicle_number': vehicle_number,
+                                           'message': 'Vehicle already has an active booking.'})
+                        else:
+                            slot = self._claim_best_slot(cursor, slot_type, floor, reserved)
+                            if slot is None:
+                                errors.append({'row': row_number, 'vehicle_number': vehicle_number,
+                                               'message': f'No {slot_type} slot is available.'})
+                            else:
+                                claimed.append((row_number, vehicle_number) + slot)
+                        if atomic and errors:
+                            raise BookingConflict(errors[-1]['message'])
+                    
+                    if claimed:
+                        cursor.executemany("""
+                            INSERT INTO bookings (user_id, slot_id, vehicle_number, booking_time, booking_ts, status, package_type, package_cost, expected_duration, expected_end_ts)
+                            VALUES (?, ?, ?, ?, ?, 'Active', ?, ?, ?, ?)
+                        """, [
+                            (user_id, slot_id, vehicle_number, booking_time_str, booking_ts,
+                             package_info['name'], package_info['rate'], package_info['duration_hours'],
+                             self.expected_end(booking_ts, package_info['duration_hours']))
+                            for _, vehicle_number, slot_id, _, _ in claimed
+                        ])
+                        cursor.execute(
+                            "SELECT vehicle_number, id FROM bookings WHERE user_id = ? AND status = 'Active' "
+                            "AND vehicle_number IN (SELECT value FROM json_each(?))",
+                            (user_id, json.dumps([row[1] for row in claimed]))
+                        )
+                        booking_ids = dict(cursor.fetchall())
+                        booked = [
+                            {'booking_id': booking_ids[vehicle_number], 'vehicle_number': vehicle_number,
+                             'slot_id': slot_id, 'slot_number': slot_number, 'floor': slot_floor}
+                            for _, vehicle_number, slot_id, slot_number, slot_floor in claimed
+                        ]
+                        self.db.on_commit(lambda: self._announce_fleet(user_id, booked, booking_time_str, package_info))
+                    # After the index has seen the slots occupied
+                    self.db.on_commit(lambda: self._release_all(reserved, requeue=False))
+            except BookingConflict:
+                self._release_all(reserved)
+                booked = []
+            except sqlite3.Error as e:
+                self._release_all(reserved)
+                print(f"Fleet booking transaction error: {e}")
+                return {'success': False, 'message': 'Fleet booking failed. Please try again.',
+                        'booked': [], 'errors': sorted(errors, key=lambda error: error['row'])}
         
-        # Calculate actual cost (either package cost or hourly rate, whichever is higher for fairness)
-        hourly_cost = Helper.calculate_cost(duration)
-        actual_cost = max(package_cost, hourly_cost) if duration > expected_duration else package_cost
+        return self._fleet_result(booked, errors, atomic, package_info, booking_time_str)
+    
+    def _claim_best_slot(self, cursor, slot_type, floor, reserved):
+        """Reserve and claim the best free slot inside an open transaction.
         
-        # Round to 2 decimal places
-        actual_cost = round(actual_cost, 2)
-        duration = round(duration, 2)
+        Returns (slot_id, slot_number, floor) or None; every slot reserved is
+        appended to `reserved` so the caller can release them afterwards.
+        """
+        for _ in range(self.AUTO_ASSIGN_ATTEMPTS):
+            slot_id = self.allocator.reserve(slot_type, floor)
+            if slot_id is None:
+                return None
+            reserved.append(slot_id)
+            cursor.execute(
+                "UPDATE slots SET status = 'Occupied' WHERE id = ? AND status = 'Available'",
+                (slot_id,)
+            )
+            if cursor.rowcount == 1:
+                cursor.execute("SELECT slot_number, floor FROM slots WHERE id = ?", (slot_id,))
+                return (slot_id,) + tuple(cursor.fetchone())
+        return None
+    
+    def _release_all(self, reserved, requeue=True):
+        """End a fleet booking's reservations; requeue the slots when it rolled back"""
+        for slot_id in reserved:
+            self.allocator.release(slot_id, requeue=requeue)
+    
+    def _announce_fleet(self, user_id, booked, booking_time_str, package_info):
+        """Update the index, caches and event bus for a committed fleet booking"""
+        self.cache.invalidate_bookings(user_id)
+        for booking in booked:
+            self.slot_index.set_status(booking['slot_id'], 'Occupied')
+            self._publish_slot_status(booking['slot_id'], booking['slot_number'], booking['floor'], 'Occupied')
+            self.events.publish('booking.active', {
+                'booking_id': booking['booking_id'],
+                'user_id': user_id,
+                'slot_id': booking['slot_id'],
+                'slot_number': booking['slot_number'],
+                'vehicle_number': booking['vehicle_number'],
+                'booking_time': booking_time_str,
+                'package': package_info['name']
+            })
+    
+    def checkout_fleet(self, user_id, booking_ids=None):
+        """Check out many active bookings of one account in one transaction.
         
-        # Update booking status with actual cost
-        update_booking = """
-            UPDATE bookings 
-            SET status = 'Completed', checkout_time = ?, actual_cost = ?
-            WHERE id = ?
+        Costs are computed in one batch with BillingEngine, using the same
+        rule as cancel_booking. With booking_ids=None every active booking of
+        the account is checked out; ids that are not active bookings of the
+        account are reported and skipped.
         """
-        success = self.db.execute_query(update_booking, (checkout_time, actual_cost, booking_id))
+        if booking_ids is not None:
+            booking_ids = list(dict.fromkeys(booking_ids))
+            if len(booking_ids) > self.MAX_FLEET_SIZE:
+                return {'success': False, 'message': f'A fleet checkout covers at most {self.MAX_FLEET_SIZE} bookings.',
+                        'checked_out': [], 'total_cost': 0, 'errors': []}
         
-        if success:
-            # Update slot status to Available
-            update_slot = "UPDATE slots SET status = 'Available' WHERE id = ?"
-            self.db.execute_query(update_slot, (slot_id,))
-            
-            return {
-                'success': True,
-                'message': f'Checkout successful!',
-                'slot_number': slot_number,
-                'duration': duration,
-                'package': package_type,
-                'package_cost': package_cost,
-                'actual_cost': actual_cost,
-                'checkout_time': datetime.now().strftime("%d-%b-%Y %I:%M %p")
-            }
+        checked_out = []
+        errors = []
+        try:
+            with self.db.transaction('checkout_fleet') as cursor:
+                if booking_ids is None:
+                    cursor.execute(f"""
+                        SELECT {self.CHECKOUT_COLUMNS}
+                        FROM bookings b
+                        JOIN slots s ON b.slot_id = s.id
+                        WHERE b.user_id = ? AND b.status = 'Active'
+                    """, (user_id,))
+                else:
+                    cursor.execute(f"""
+                        SELECT {self.CHECKOUT_COLUMNS}
+                        FROM bookings b
+                        JOIN slots s ON b.slot_id = s.id
+                        WHERE b.id IN (SELECT value FROM json_each(?)) AND b.user_id = ? AND b.status = 'Active'
+                    """, (json.dumps(booking_ids), user_id))
+                rows = cursor.fetchall()
+                
+                if booking_ids is not None:
+                    found = {row[0] for row in rows}
+                    errors = [
+                        {'booking_id': booking_id, 'message': 'Booking not found or already cancelled.'}
+                        for booking_id in booking_ids if booking_id not in found
+                    ]
+                
+                checked_out = self._complete_bookings(cursor, rows, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        except sqlite3.Error as e:
+            print(f"Fleet checkout transaction error: {e}")
+            return {'success': False, 'message': 'Fleet checkout failed.', 'checked_out': [], 'total_cost': 0,
+                    'errors': errors}
         
-        return {'success': False, 'message': 'Failed to cancel booking.'}
+        return self._checkout_fleet_result(checked_out, errors)
     
-    def get_user_bookings(self, user_id, status=None):
-        """Get all bookings for a user"""
-        if status:
-            query = """
-                SELECT b.id, s.slot_number, s.slot_type, b.vehicle_number, 
-                       b.booking_time, b.checkout_time, b.status, b.package_type, b.package_cost, b.actual_cost
-                FROM bookings b
-                JOIN slots s ON b.slot_id = s.id
-                WHERE b.user_id = ? AND b.status = ?
-                ORDER BY b.booking_time DESC
-            """
-            return self.db.fetch_all(query, (user_id, status))
+    def settle_bookings(self, floor=None, overstayed=False, older_than_hours=None, dry_run=False, now=None):
+        """Complete every active booking matching the filters in one transaction (Admin).
+        
+        Used to close out a lot, e.g. at the end of the day. Filters combine:
+        floor, overstayed (ran past the package duration) and
+        older_than_hours (started at least that long ago). Costs are computed
+        in one batch as in checkout_fleet. With dry_run=True the report is
+        built without completing anything.
+        """
+        now = now or datetime.now()
+        checkout_time = now.strftime("%Y-%m-%d %H:%M:%S")
+        checkout_ts = Helper.to_epoch(checkout_time)
+        
+        conditions = ["b.status = 'Active'"]
+        params = []
+        if older_than_hours is not None:
+            conditions.append("b.booking_ts <= ?")
+            params.append(checkout_ts - int(older_than_hours * 3600))
+        if overstayed:
+            conditions.append("b.expected_end_ts < ?")
+            params.append(checkout_ts)
+        if floor is not None:
+            conditions.append("s.floor = ?")
+            params.append(floor)
+        
+        query = f"""
+            SELECT {self.CHECKOUT_COLUMNS}
+            FROM bookings b
+            JOIN slots s ON b.slot_id = s.id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY b.booking_ts
+        """
+        if dry_run:
+            settled = self._bill_checkouts(self.db.fetch_all(query, tuple(params), name='settle_preview'),
+                                           checkout_ts)
         else:
-            query = """
-                SELECT b.id, s.slot_number, s.slot_type, b.vehicle_number, 
-                       b.booking_time, b.checkout_time, b.status, b.package_type, b.package_cost, b.actual_cost
-                FROM bookings b
-                JOIN slots s ON b.slot_id = s.id
-                WHERE b.user_id = ?
-                ORDER BY b.booking_time DESC
-            """
-            return self.db.fetch_all(query, (user_id,))
+            try:
+                with self.db.transaction('settle_bookings') as cursor:
+                    cursor.execute(query, tuple(params))
+                    settled = self._complete_bookings(cursor, cursor.fetchall(), checkout_time)
+            except sqlite3.Error as e:
+                print(f"Settlement transaction error: {e}")
+                return {'success': False, 'message': 'Settlement failed.'}
+        
+        return self._settle_report(settled, dry_run, checkout_time)
+    
+    def _complete_bookings(self, cursor, rows, checkout_time):
+        """Complete CHECKOUT_COLUMNS rows and free their slots inside an open transaction"""
+        if not rows:
+            return []
+        checkout_ts = Helper.to_epoch(checkout_time)
+        completed = self._bill_checkouts(rows, checkout_ts)
+        
+        cursor.executemany("""
+            UPDATE bookings 
+            SET status = 'Completed', checkout_time = ?, checkout_ts = ?, actual_cost = ?
+            WHERE id = ? AND status = 'Active'
+        """, [(checkout_time, checkout_ts, booking['actual_cost'], booking['booking_id']) for booking in completed])
+        cursor.executemany("UPDATE slots SET status = 'Available' WHERE id = ?",
+                           [(booking['slot_id'],) for booking in completed])
+        for row, booking in zip(rows, completed):
+            rollups.record_checkout(cursor, booking['start_ts'], checkout_ts, row[9], row[10], row[6],
+                                    booking['actual_cost'])
+            del booking['start_ts']
+        
+        self.db.on_commit(lambda: self._announce_checkouts(completed, checkout_time))
+        return completed
+    
+    def _announce_checkouts(self, completed, checkout_time):
+        """Update the index, caches and event bus for committed batch checkouts"""
+        for user_id in {booking['user_id'] for booking in completed}:
+            self.cache.invalidate_bookings(user_id)
+        for booking in completed:
+            self.slot_index.set_status(booking['slot_id'], 'Available')
+            self._publish_slot_status(booking['slot_id'], booking['slot_number'], booking['floor'], 'Available')
+            self.events.publish('booking.completed', {
+                'booking_id': booking['booking_id'],
+                'user_id': booking['user_id'],
+                'slot_id': booking['slot_id'],
+                'slot_number': booking['slot_number'],
+                'checkout_time': checkout_time,
+                'duration': booking['duration'],
+                'actual_cost': booking['actual_cost']
+            })
+    
+    def get_user_bookings(self, user_id, status=None, include_history=False):
+        """Get all bookings for a user, newest first (with archived ones when include_history)"""
+        rows = self._fetch_user_bookings('main', user_id, status)
+        if include_history and status not in self.HOT_ONLY_STATUSES:
+            rows = self._merge_history(rows, self._fetch_user_bookings(DatabaseManager.ARCHIVE, user_id, status))
+        return rows
+    
+    def _fetch_user_bookings(self, schema, user_id, status):
+        conditions = "b.user_id = ?"
+        params = [user_id]
+        if status:
+            conditions += " AND b.status = ?"
+            params.append(status)
+        
+        query = f"""
+            SELECT b.id, s.slot_number, s.slot_type, b.vehicle_number, 
+                   b.booking_time, b.checkout_time, b.status, b.package_type, b.package_cost, b.actual_cost,
+                   b.booking_ts
+            FROM {schema}.bookings b
+            JOIN slots s ON b.slot_id = s.id
+            WHERE {conditions}
+            ORDER BY b.booking_ts DESC, b.id DESC
+        """
+        return self.db.fetch_all(query, tuple(params))
+    
+    @staticmethod
+    def _merge_history(hot_rows, archived_rows, limit=None):
+        """Merge two newest-first row lists ending in booking_ts; a row present in both
+        (mid-archival) is taken from the hot table"""
+        hot_ids = {row[0] for row in hot_rows}
+        archived_rows = [row for row in archived_rows if row[0] not in hot_ids]
+        merged = heapq.merge(hot_rows, archived_rows, key=lambda row: (row[-1] or 0, row[0]), reverse=True)
+        return list(itertools.islice(merged, limit))
     
     def get_active_booking(self, user_id):
         """Get active booking for a user"""
@@ -204,54 +561,158 @@ class BookingManager:
             JOIN slots s ON b.slot_id = s.id
             WHERE b.user_id = ? AND b.status = 'Active'
         """
-        return self.db.fetch_one(query, (user_id,))
+        return self.cache.get_or_load(('active', user_id),
+                                      lambda: self.db.fetch_one(query, (user_id,), name='active_booking'))
     
-    def get_all_bookings(self):
-        """Get all bookings (Admin view)"""
-        query = """
-            SELECT b.id, u.username, s.slot_number, b.vehicle_number, 
-                   b.booking_time, b.checkout_time, b.status
-            FROM bookings b
+    def get_all_bookings(self, limit=None, cursor=None, status=None, date_from=None, date_to=None, floor=None,
+                         include_history=False):
+        """Get bookings newest first (Admin view), optionally one keyset page at a time"""
+        columns = """
+            b.id, u.username, s.slot_number, b.vehicle_number, 
+            b.booking_time, b.checkout_time, b.status, b.booking_ts
+        """
+        rows = self._fetch_booking_listing(columns, limit, cursor, status, date_from, date_to, floor)
+        if include_history and status not in self.HOT_ONLY_STATUSES:
+            # Both sides are bounded keyset reads; the page is the newest `limit` of the two
+            archived = self._fetch_booking_listing(columns, limit, cursor, status, date_from, date_to, floor,
+                                                   schema=DatabaseManager.ARCHIVE)
+            rows = self._merge_history(rows, archived, limit)
+        return rows
+    
+    def get_active_bookings(self, limit=None, cursor=None, date_from=None, date_to=None, floor=None,
+                            include_history=False):
+        """Get active bookings newest first (Admin view), optionally one keyset page at a time"""
+        # include_history is accepted for uniform filters; active bookings are never archived
+        columns = """
+            b.id, u.username, u.phone, s.slot_number, b.vehicle_number, 
+            b.booking_time, b.booking_ts
+        """
+        return self._fetch_booking_listing(columns, limit, cursor, 'Active', date_from, date_to, floor)
+    
+    def _fetch_booking_listing(self, columns, limit, cursor, status, date_from, date_to, floor, schema='main'):
+        """Run an admin listing query; each page is one bounded range read of a booking_ts index
+        (two on the page where the rows without a booking_ts begin)"""
+        conditions = []
+        params = []
+        
+        if status:
+            conditions.append("b.status = ?")
+            params.append(status)
+        
+        if date_from:
+            conditions.append("b.booking_ts >= ?")
+            params.append(Helper.to_epoch(f"{date_from} 00:00:00"))
+        
+        if date_to:
+            conditions.append("b.booking_ts < ?")
+            params.append(Helper.to_epoch(f"{date_to} 00:00:00") + 86400)
+        
+        if floor is not None:
+            conditions.append("s.floor = ?")
+            params.append(floor)
+        
+        position = self.decode_cursor(cursor)
+        if position and position[0] is None:
+            # Rows without a booking_ts sort last; only older ids among them remain
+            return self._run_booking_listing(columns, schema, conditions + ["b.booking_ts IS NULL AND b.id < ?"],
+                                             params + [position[1]], limit)
+        if not position:
+            return self._run_booking_listing(columns, schema, conditions, params, limit)
+        
+        # Keyset: continue strictly after the last (booking_ts, id) already shown. A row
+        # comparison never matches NULL, so a short page goes on into the rows without a
+        # booking_ts with a second bounded read (an OR here would sort every older row)
+        rows = self._run_booking_listing(columns, schema, conditions + ["(b.booking_ts, b.id) < (?, ?)"],
+                                         params + list(position), limit)
+        if limit and len(rows) >= limit:
+            return rows
+        return rows + self._run_booking_listing(columns, schema, conditions + ["b.booking_ts IS NULL"], params,
+                                                limit - len(rows) if limit else None)
+    
+    def _run_booking_listing(self, columns, schema, conditions, params, limit):
+        """One newest-first listing query over the given conditions"""
+        params = list(params)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"""
+            SELECT {columns}
+            FROM {schema}.bookings b
             JOIN users u ON b.user_id = u.id
             JOIN slots s ON b.slot_id = s.id
-            ORDER BY b.booking_time DESC
+            {where}
+            ORDER BY b.booking_ts DESC, b.id DESC
         """
-        return self.db.fetch_all(query)
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        
+        return self.db.fetch_all(query, tuple(params))
     
-    def get_active_bookings(self):
-        """Get all active bookings (Admin view)"""
+    def reconcile_billing(self, date_from, date_to, mismatch_limit=100):
+        """Recompute checkout costs for completed bookings started in [date_from, date_to]
+        in one batch and compare them with the amounts billed"""
         query = """
-            SELECT b.id, u.username, u.phone, s.slot_number, b.vehicle_number, 
-                   b.booking_time
+            SELECT id, booking_ts, checkout_ts, package_cost, expected_duration, actual_cost
+            FROM bookings
+            WHERE status = 'Completed' AND booking_ts >= ? AND booking_ts < ?
+        """
+        rows = self.db.fetch_all(query, (
+            Helper.to_epoch(f"{date_from} 00:00:00"),
+            Helper.to_epoch(f"{date_to} 00:00:00") + 86400
+        ))
+        
+        durations = BillingEngine.epoch_durations([row[1] for row in rows], [row[2] for row in rows])
+        costs = BillingEngine.checkout_costs(durations, [row[3] for row in rows], [row[4] for row in rows])
+        bill = {'costs': costs, 'total': round(sum(costs), 2)}
+        billed = [row[5] or 0 for row in rows]
+        mismatches = [
+            {'booking_id': row[0], 'billed': billed_cost, 'computed': cost}
+            for row, billed_cost, cost in zip(rows, billed, bill['costs'])
+            if abs(billed_cost - cost) >= 0.005
+        ]
+        billed_total = round(sum(billed), 2)
+        
+        return {
+            'bookings': len(rows),
+            'billed_total': billed_total,
+            'computed_total': bill['total'],
+            'difference': round(bill['total'] - billed_total, 2),
+            'mismatch_count': len(mismatches),
+            'mismatches': mismatches[:mismatch_limit]
+        }
+    
+    def get_overstays(self, floor=None, limit=None, ended_after=None, now=None):
+        """Active bookings that ran past their package, longest overdue first (Admin).
+        
+        One range read of the (status, expected_end_ts) index however many
+        bookings are active. Each row carries a live estimate of what checking
+        out now would cost over the package price. ended_after (an epoch)
+        keeps only bookings that ran out since then.
+        """
+        now_ts = Helper.to_epoch((now or datetime.now()).strftime("%Y-%m-%d %H:%M:%S"))
+        conditions = ["b.status = 'Active'", "b.expected_end_ts < ?"]
+        params = [now_ts]
+        if ended_after is not None:
+            conditions.append("b.expected_end_ts >= ?")
+            params.append(ended_after)
+        if floor is not None:
+            conditions.append("s.floor = ?")
+            params.append(floor)
+        
+        query = f"""
+            SELECT b.id, b.user_id, u.username, u.phone, s.slot_number, s.floor, b.vehicle_number,
+                   b.booking_time, b.booking_ts, b.expected_end_ts, b.package_type, b.package_cost, b.expected_duration
             FROM bookings b
             JOIN users u ON b.user_id = u.id
             JOIN slots s ON b.slot_id = s.id
-            WHERE b.status = 'Active'
-            ORDER BY b.booking_time DESC
+            WHERE {' AND '.join(conditions)}
+            ORDER BY b.expected_end_ts
         """
-        return self.db.fetch_all(query)
-    
-    def get_booking_statistics(self):
-        """Get booking statistics (Admin)"""
-        total_query = "SELECT COUNT(*) FROM bookings"
-        active_query = "SELECT COUNT(*) FROM bookings WHERE status = 'Active'"
-        completed_query = "SELECT COUNT(*) FROM bookings WHERE status = 'Completed'"
-        scheduled_query = "SELECT COUNT(*) FROM bookings WHERE status = 'Scheduled'"
-        cancelled_query = "SELECT COUNT(*) FROM bookings WHERE status = 'Cancelled'"
-        
-        total = self.db.fetch_one(total_query)[0]
-        active = self.db.fetch_one(active_query)[0]
-        completed = self.db.fetch_one(completed_query)[0]
-        scheduled = self.db.fetch_one(scheduled_query)[0]
-        cancelled = self.db.fetch_one(cancelled_query)[0]
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        rows = self.db.fetch_all(query, tuple(params), name='overstays')
         
-        return {
-            'total': total,
-            'active': active,
-            'completed': completed,
-            'scheduled': scheduled,
-            'cancelled': cancelled
-        }
+        return self._overstay_report(rows, now_ts)
     
     def get_scheduled_bookings(self, user_id=None):
         """Get scheduled bookings for a user or all users (admin)"""
@@ -262,9 +723,11 @@ class BookingManager:
                 FROM bookings b
                 JOIN slots s ON b.slot_id = s.id
                 WHERE b.user_id = ? AND b.status = 'Scheduled'
-                ORDER BY b.booking_time ASC
+                ORDER BY b.booking_ts ASC
             """
-            return self.db.fetch_all(query, (user_id,))
+            rows = self.cache.get_or_load(('scheduled', user_id),
+                                          lambda: tuple(self.db.fetch_all(query, (user_id,))))
+            return list(rows)
         else:
             # Admin view
             query = """
@@ -274,7 +737,7 @@ class BookingManager:
                 JOIN users u ON b.user_id = u.id
                 JOIN slots s ON b.slot_id = s.id
                 WHERE b.status = 'Scheduled'
-                ORDER BY b.booking_time ASC
+                ORDER BY b.booking_ts ASC
             """
             return self.db.fetch_all(query)
     
@@ -282,7 +745,7 @@ class BookingManager:
         """Cancel a scheduled booking"""
         # Get booking details
         booking_query = """
-            SELECT b.id, b.user_id, s.slot_number, b.booking_time, b.status
+            SELECT b.id, b.user_id, s.slot_number, b.booking_time, b.status, s.floor
             FROM bookings b
             JOIN slots s ON b.slot_id = s.id
             WHERE b.id = ? AND b.user_id = ? AND b.status = 'Scheduled'
@@ -299,12 +762,19 @@ class BookingManager:
         cancel_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         update_query = """
             UPDATE bookings 
-            SET status = 'Cancelled', checkout_time = ? 
-            WHERE id = ?
+            SET status = 'Cancelled', checkout_time = ?, checkout_ts = ?
+            WHERE id = ? AND status = 'Scheduled'
         """
-        success = self.db.execute_query(update_query, (cancel_time, booking_id))
+        success = self.db.execute_query(update_query, (cancel_time, Helper.to_epoch(cancel_time), booking_id))
         
         if success:
+            self.cache.invalidate_bookings(user_id)
+            self.events.publish('booking.cancelled', {
+                'booking_id': booking_id,
+                'user_id': user_id,
+                'slot_number': slot_number,
+                'booking_time': booking_time
+            })
             return {
                 'success': True,
                 'message': f'Scheduled booking for slot {slot_number} cancelled successfully!',
@@ -312,4 +782,88 @@ class BookingManager:
             }
         
         return {'success': False, 'message': 'Failed to cancel scheduled booking.'}
-
+    
+    def get_pending_schedule(self):
+        """Get (booking_id, booking_time) for every scheduled booking, soonest first"""
+        query = """
+            SELECT id, booking_time
+            FROM bookings
+            WHERE status = 'Scheduled'
+            ORDER BY booking_ts ASC
+        """
+        return self.db.fetch_all(query)
+    
+    def activate_due_bookings(self, booking_ids, grace_minutes=15, now=None):
+        """Activate due scheduled bookings in one transaction and expire no-shows.
+        
+        A due booking is activated when its slot can be claimed and its user has
+        no other active booking. If that is still impossible once the grace
+        period after its start time has passed, it is cancelled as a no-show.
+        """
+        now = now or datetime.now()
+        now_str = now.strftime("%Y-%m-%d %H:%M:%S")
+        now_ts = Helper.to_epoch(now_str)
+        deadline_ts = now_ts - int(grace_minutes * 60)
+        result = {'activated': [], 'waiting': [], 'expired': []}
+        
+        if not booking_ids:
+            return result
+        
+        placeholders = ', '.join('?' for _ in booking_ids)
+        with self.db.transaction('activate_due_bookings') as cursor:
+            cursor.execute(f"""
+                SELECT b.id, b.user_id, b.slot_id, b.booking_time, b.booking_ts, b.vehicle_number, s.slot_number, s.floor
+                FROM bookings b
+                JOIN slots s ON b.slot_id = s.id
+                WHERE b.id IN ({placeholders}) AND b.status = 'Scheduled'
+                ORDER BY b.booking_ts ASC
+            """, tuple(booking_ids))
+            
+            for booking_id, user_id, slot_id, booking_time, booking_ts, vehicle_number, slot_number, floor in cursor.fetchall():
+                if booking_ts is None:
+                    booking_ts = Helper.to_epoch(booking_time) or now_ts
+                if booking_ts > now_ts:
+                    result['waiting'].append((booking_id, booking_time))
+                    continue
+                
+                cursor.execute(
+                    "SELECT 1 FROM bookings WHERE user_id = ? AND status = 'Active' LIMIT 1",
+                    (user_id,)
+                )
+                claimed = False
+                if not cursor.fetchone():
+                    cursor.execute(
+                        "UPDATE slots SET status = 'Occupied' WHERE id = ? AND status = 'Available'",
+                        (slot_id,)
+                    )
+                    claimed = cursor.rowcount == 1
+                
+                event = {
+                    'booking_id': booking_id,
+                    'user_id': user_id,
+                    'slot_id': slot_id,
+                    'slot_number': slot_number,
+                    'vehicle_number': vehicle_number,
+                    'booking_time': booking_time
+                }
+                
+                self.db.on_commit(lambda user_id=user_id: self.cache.invalidate_bookings(user_id))
+                
+                if claimed:
+                    cursor.execute("UPDATE bookings SET status = 'Active' WHERE id = ?", (booking_id,))
+                    result['activated'].append(booking_id)
+                    self.db.on_commit(lambda slot_id=slot_id: self.slot_index.set_status(slot_id, 'Occupied'))
+                    self.db.on_commit(lambda slot_id=slot_id, slot_number=slot_number, floor=floor:
+                                      self._publish_slot_status(slot_id, slot_number, floor, 'Occupied'))
+                    self.db.on_commit(lambda event=event: self.events.publish('booking.active', event))
+                elif booking_ts <= deadline_ts:
+                    cursor.execute("""
+                        UPDATE bookings SET status = 'Cancelled', checkout_time = ?, checkout_ts = ?
+                        WHERE id = ?
+                    """, (now_str, now_ts, booking_id))
+                    result['expired'].append(booking_id)
+                    self.db.on_commit(lambda event=event: self.events.publish('booking.expired', event))
+                else:
+                    result['waiting'].append((booking_id, booking_time))
+        
+        return result
@@ -0,0 +1,127 @@
+"""
+Booking Scheduler Module
+Background timer that activates scheduled bookings when they fall due
+"""
+
+import heapq
+import threading
+import time
+from datetime import datetime
+
+from config import Config
+from modules.event_bus import EventBus
+
+
+class BookingScheduler:
+    """Min-heap of upcoming scheduled bookings keyed by start time.
+
+    The heap is filled once from the (status, booking_time) index at start-up
+    and then fed by 'booking.scheduled' events, so the bookings table is never
+    rescanned. The worker thread sleeps until the earliest start time, hands
+    every due booking to BookingManager.activate_due_bookings in one batch and
+    re-queues the ones that have to wait (slot still occupied) until they are
+    activated or expire as no-shows.
+    """
+
+    def __init__(self, booking_manager, grace_minutes=None, retry_seconds=None):
+        self.booking_manager = booking_manager
+        self.grace_minutes = grace_minutes if grace_minutes is not None else Config.NO_SHOW_GRACE_MINUTES
+        self.retry_seconds = retry_seconds if retry_seconds is not None else Config.SCHEDULER_RETRY_SECONDS
+        self._heap = []            # (due_epoch, booking_id, booking_time)
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+        self.events = EventBus.for_database(booking_manager.db)
+
+    def start(self):
+        """Load pending bookings and start the worker thread"""
+        if self._running:
+            return
+        self._running = True
+
+        # Everything still pending is reloaded, so a restart drops what the last run queued
+        pending = self.booking_manager.get_pending_schedule()
+        with self._condition:
+            self._heap = [(self._epoch(booking_time), booking_id, booking_time) for booking_id, booking_time in pending]
+            heapq.heapify(self._heap)
+        self.events.listen(['booking.scheduled'], self._on_scheduled)
+
+        self._thread = threading.Thread(target=self._run, name='booking-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the worker thread"""
+        self.events.remove_listener(self._on_scheduled)
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _on_scheduled(self, event):
+        self.schedule(event['data']['booking_id'], event['data']['booking_time'])
+
+    @staticmethod
+    def _epoch(booking_time):
+        return datetime.strptime(booking_time, "%Y-%m-%d %H:%M:%S").timestamp()
+
+    def schedule(self, booking_id, booking_time, due=None):
+        """Queue a booking to be activated at its start time (or at `due`, an epoch)"""
+        due = due if due is not None else self._epoch(booking_time)
+        with self._condition:
+            heapq.heappush(self._heap, (due, booking_id, booking_time))
+            # Wake the worker if this is now the earliest entry
+            if self._heap[0][1] == booking_id:
+                self._condition.notify()
+
+    def pending_count(self):
+        with self._condition:
+            return len(self._heap)
+
+    def _take_due(self):
+        """Block until at least one entry is due; return all due entries"""
+        with self._condition:
+            while self._running:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                delay = self._heap[0][0] - time.time()
+                if delay > 0:
+                    self._condition.wait(timeout=delay)
+                    continue
+                due = []
+                now = time.time()
+                while self._heap and self._heap[0][0] <= now:
+                    due.append(heapq.heappop(self._heap))
+                return due
+        return []
+
+    def _run(self):
+        while self._running:
+            due = self._take_due()
+            if not due:
+                continue
+            self.run_batch(due)
+
+    def run_batch(self, entries, now=None):
+        """Activate one batch of due entries and re-queue the ones still waiting"""
+        now = now or datetime.now()
+        try:
+            result = self.booking_manager.activate_due_bookings(
+                [booking_id for _, booking_id, _ in entries],
+                grace_minutes=self.grace_minutes,
+                now=now
+            )
+        except Exception as e:
+            print(f"Scheduler activation error: {e}")
+            # Back off a full retry interval so a persistent error cannot spin the worker
+            for _, booking_id, booking_time in entries:
+                self.schedule(booking_id, booking_time, due=now.timestamp() + self.retry_seconds)
+            return None
+
+        for booking_id, booking_time in result['waiting']:
+            start = self._epoch(booking_time)
+            expiry = start + self.grace_minutes * 60
+            retry_at = max(start, min(now.timestamp() + self.retry_seconds, expiry))
+            self.schedule(booking_id, booking_time, due=retry_at)
+        return result
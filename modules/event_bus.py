@@ -0,0 +1,132 @@
+"""
+Event Bus Module
+In-process fan-out of slot and booking changes to live subscribers
+"""
+
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+
+
+class Subscription:
+    """A subscriber's bounded event queue"""
+
+    def __init__(self, bus, channels, max_queue, on_event=None):
+        self.bus = bus
+        self.channels = set(channels)
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.on_event = on_event   # called (on the publishing thread) after each queued event
+
+    def deliver(self, event):
+        """Queue an event; a slow subscriber loses its oldest events rather than blocking writers"""
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                if self.on_event:
+                    self.on_event()
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """Wait for the next event; None on timeout"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """Publishes change events to per-floor and admin-wide channels.
+
+    Every event goes to the 'admin' channel; slot events also go to
+    'floor:<n>', which any signed-in user may watch. Booking events carry
+    user ids and vehicle numbers, so they are published without a floor and
+    reach admins only. Managers publish from post-commit hooks, so
+    subscribers only ever see changes that are durable.
+    """
+
+    ADMIN_CHANNEL = 'admin'
+
+    def __init__(self, db=None, max_queue=1000, history=256):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+        self._listeners = []
+        self._ids = itertools.count(1)
+        self._history = deque(maxlen=history)
+
+    @classmethod
+    def for_database(cls, db):
+        """Return the shared bus for a database"""
+        return db.shared('event_bus', cls)
+
+    @staticmethod
+    def floor_channel(floor):
+        return f'floor:{floor}'
+
+    def subscribe(self, channels, last_event_id=None, on_event=None):
+        """Register a subscriber; replays buffered events newer than last_event_id.
+        on_event lets a non-blocking reader (the async event stream) be woken instead of waiting in get()"""
+        subscription = Subscription(self, channels, self.max_queue, on_event)
+        with self._lock:
+            self._subscriptions.add(subscription)
+            if last_event_id is not None:
+                for event in self._history:
+                    if event['id'] > last_event_id and event['channels'] & subscription.channels:
+                        subscription.deliver(event)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def listen(self, event_types, callback):
+        """Call callback(event) synchronously for each published event of the given types"""
+        with self._lock:
+            self._listeners.append((set(event_types), callback))
+
+    def remove_listener(self, callback):
+        with self._lock:
+            self._listeners = [(types, cb) for types, cb in self._listeners if cb is not callback]
+
+    def publish(self, event_type, data, floor=None):
+        """Send an event to the admin channel and, when given, its floor channel"""
+        channels = {self.ADMIN_CHANNEL}
+        if floor is not None:
+            channels.add(self.floor_channel(floor))
+
+        with self._lock:
+            event = {
+                'id': next(self._ids),
+                'type': event_type,
+                'time': time.time(),
+                'channels': channels,
+                'data': data
+            }
+            self._history.append(event)
+            subscribers = [s for s in self._subscriptions if s.channels & channels]
+            listeners = [cb for types, cb in self._listeners if event_type in types]
+
+        for subscription in subscribers:
+            subscription.deliver(event)
+        for callback in listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Event listener error: {e}")
+        return event
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscriptions)
@@ -0,0 +1,744 @@
+"""
+Memory Repositories Module
+Pure-Python user, slot and booking repositories over a MemoryStore
+"""
+
+import bisect
+from datetime import datetime
+
+from database.memory_store import MemoryStore
+from modules.event_bus import EventBus
+from modules.repositories import UserRepository, SlotRepository, BookingRepository
+from utils.billing import BillingEngine
+from utils.helpers import Helper
+from utils.validators import Validator
+
+
+class MemoryUserRepository(UserRepository):
+    """Users and admins in a MemoryStore (lookups are dict reads, so no cache)"""
+
+    def __init__(self, store=None):
+        self.db = store or MemoryStore('users')
+        # Same default account as DatabaseManager.create_default_admin
+        with self.db.lock:
+            if not self.db.admins:
+                self.db.insert_admin('admin', 'admin123', 'admin@smartparking.com')
+
+    def admin_login(self, username, password):
+        """Admin login verification"""
+        with self.db.lock:
+            admin = self.db.admins.get(self.db.admin_names.get(username))
+        if admin and admin['password'] == password:
+            return {
+                'success': True,
+                'user_id': admin['id'],
+                'username': admin['username'],
+                'email': admin['email'],
+                'role': 'admin'
+            }
+        return {'success': False, 'message': 'Invalid admin credentials'}
+
+    def user_login(self, username, password):
+        """User login verification"""
+        with self.db.lock:
+            user = self.db.users.get(self.db.user_names.get(username))
+        if user and user['password'] == password:
+            return {
+                'success': True,
+                'user_id': user['id'],
+                'username': user['username'],
+                'email': user['email'],
+                'phone': user['phone'],
+                'vehicle_number': user['vehicle_number'],
+                'role': 'user'
+            }
+        return {'success': False, 'message': 'Invalid user credentials'}
+
+    def get_user_profile(self, user_id):
+        """Get a user's profile"""
+        with self.db.lock:
+            user = self.db.users.get(user_id)
+            if not user:
+                return None
+            return self._profile_from_row((user['id'], user['username'], user['email'], user['phone'],
+                                           user['vehicle_number']))
+
+    def register_user(self, username, password, email, phone, vehicle_number):
+        """Register new user"""
+        error = self._registration_error(username, password, email, phone, vehicle_number)
+        if error:
+            return {'success': False, 'message': error}
+
+        with self.db.lock:
+            if username in self.db.user_names or email in self.db.user_emails:
+                return {'success': False, 'message': 'Username or email already exists.'}
+            self.db.insert_user(username, password, email, phone, vehicle_number.upper())
+        return {'success': True, 'message': 'Registration successful! You can now login.'}
+
+    def add_admin(self, username, password, email):
+        """Add new admin account (admin only)"""
+        error = self._admin_error(username, password, email)
+        if error:
+            return {'success': False, 'message': error}
+
+        with self.db.lock:
+            if username in self.db.admin_names:
+                return {'success': False, 'message': 'Admin username already exists.'}
+            self.db.insert_admin(username, password, email)
+        return {'success': True, 'message': 'Admin account created successfully.'}
+
+
+class MemorySlotRepository(SlotRepository):
+    """Parking slots of one lot in a MemoryStore"""
+
+    def __init__(self, store=None, lot=None):
+        self.lot = lot
+        self.db = store or MemoryStore(lot or 'main')
+        self.counters = self.db.counters
+        self.events = EventBus.for_database(self.db)
+
+    @staticmethod
+    def _row(slot):
+        """(id, slot_number, slot_type, status, floor), as get_slot_by_id returns it"""
+        return slot['id'], slot['slot_number'], slot['slot_type'], slot['status'], slot['floor']
+
+    def add_slot(self, slot_number, slot_type='Regular', floor=1, priority=0):
+        """Add new parking slot (lower priority = nearer the entrance, assigned first)"""
+        if not Validator.validate_slot_number(slot_number):
+            return {'success': False, 'message': 'Invalid slot number format.'}
+
+        slot_number = slot_number.upper()
+        with self.db.lock:
+            if slot_number in self.db.slot_numbers:
+                return {'success': False, 'message': 'Slot number already exists.'}
+            slot = self.db.insert_slot(slot_number, slot_type, floor, priority)
+
+        self.events.publish('slot.added', {
+            'slot_id': slot['id'],
+            'slot_number': slot_number,
+            'slot_type': slot_type,
+            'floor': floor,
+            'priority': priority,
+            'status': 'Available'
+        }, floor=floor)
+        return {'success': True, 'message': f'Slot {slot_number} added successfully.'}
+
+    def add_slots_bulk(self, slots, atomic=False):
+        """Add many parking slots at once; same rules and report as SlotManager.add_slots_bulk"""
+        valid, errors = self._validate_slot_rows(slots)
+
+        added = []
+        if valid and not (atomic and errors):
+            with self.db.lock:
+                new_rows = []
+                for row_number, slot_number, slot_type, floor, priority in valid:
+                    if slot_number in self.db.slot_numbers:
+                        errors.append({'row': row_number, 'slot_number': slot_number, 'message': 'Slot number already exists.'})
+                    else:
+                        new_rows.append((slot_number, slot_type, floor, priority))
+
+                if new_rows and not (atomic and errors):
+                    added = [self.db.insert_slot(*row) for row in new_rows]
+
+        per_floor = {}
+        for slot in added:
+            per_floor[slot['floor']] = per_floor.get(slot['floor'], 0) + 1
+        for floor, count in sorted(per_floor.items()):
+            self.events.publish('slot.imported', {'floor': floor, 'count': count}, floor=floor)
+
+        return self._bulk_result(len(added), errors, atomic)
+
+    def update_slot(self, slot_id, slot_number=None, slot_type=None, floor=None, priority=None):
+        """Update existing slot"""
+        changes = {}
+
+        if slot_number:
+            if not Validator.validate_slot_number(slot_number):
+                return {'success': False, 'message': 'Invalid slot number format.'}
+            changes['slot_number'] = slot_number.upper()
+
+        if slot_type:
+            changes['slot_type'] = slot_type
+
+        if floor:
+            changes['floor'] = floor
+
+        if priority is not None:
+            changes['priority'] = priority
+
+        if not changes:
+            return {'success': False, 'message': 'No updates provided.'}
+
+        with self.db.lock:
+            slot = self.db.slots.get(slot_id)
+            if slot is None:
+                # Like an UPDATE that matched no row
+                return {'success': True, 'message': 'Slot updated successfully.'}
+            if self.db.slot_numbers.get(changes.get('slot_number'), slot_id) != slot_id:
+                return {'success': False, 'message': 'Failed to update slot.'}
+            self.db.update_slot(slot, **changes)
+            row = self._row(slot)
+
+        self.events.publish('slot.updated', {
+            'slot_id': row[0],
+            'slot_number': row[1],
+            'slot_type': row[2],
+            'status': row[3],
+            'floor': row[4]
+        }, floor=row[4])
+        return {'success': True, 'message': 'Slot updated successfully.'}
+
+    def delete_slot(self, slot_id):
+        """Delete parking slot"""
+        with self.db.lock:
+            if any(booking['slot_id'] == slot_id for booking in self.db.bookings_with_status('Active')):
+                return {'success': False, 'message': 'Cannot delete slot with active bookings.'}
+            slot = self.db.slots.get(slot_id)
+            if slot:
+                self.db.delete_slot(slot)
+
+        if slot:
+            self.events.publish('slot.deleted', {
+                'slot_id': slot_id,
+                'slot_number': slot['slot_number'],
+                'floor': slot['floor']
+            }, floor=slot['floor'])
+        return {'success': True, 'message': 'Slot deleted successfully.'}
+
+    def get_all_slots(self):
+        """Get all parking slots"""
+        with self.db.lock:
+            return [
+                (slot['id'], slot['slot_number'], slot['slot_type'], slot['status'], slot['floor'],
+                 slot['created_at'], slot['priority'])
+                for slot in sorted(self.db.slots.values(), key=lambda slot: slot['slot_number'])
+            ]
+
+    def get_available_slots(self, floor=None, slot_type=None):
+        """Get available parking slots, optionally for one floor and/or slot type"""
+        with self.db.lock:
+            return [
+                (slot['id'], slot['slot_number'], slot['slot_type'], slot['floor'])
+                for slot in self.db.available_slots(floor, slot_type)
+            ]
+
+    def get_available_floors(self):
+        """Get floors that have at least one available slot"""
+        with self.db.lock:
+            return sorted({floor for floor, _ in self.db.available})
+
+    def get_slot_by_id(self, slot_id):
+        """Get slot details by ID"""
+        with self.db.lock:
+            slot = self.db.slots.get(slot_id)
+            return self._row(slot) if slot else None
+
+    def update_slot_status(self, slot_id, status):
+        """Update slot status (Available/Occupied)"""
+        with self.db.lock:
+            slot = self.db.slots.get(slot_id)
+            if slot:
+                self.db.update_slot(slot, status=status)
+        if slot:
+            self.events.publish('slot.status', {
+                'slot_id': slot_id,
+                'slot_number': slot['slot_number'],
+                'floor': slot['floor'],
+                'status': status
+            }, floor=slot['floor'])
+        return True
+
+
+class MemoryBookingRepository(BookingRepository):
+    """Bookings of one lot in a MemoryStore.
+
+    Each operation runs under the store lock, so its checks and writes are
+    as atomic as the SQLite transactions; events go out after the lock is
+    released, as the SQLite repository publishes them after commit. Users
+    are read from `users` (the store of the lot's MemoryUserRepository).
+    """
+
+    def __init__(self, store=None, lot=None, users=None):
+        self.lot = lot
+        self.db = store or MemoryStore(lot or 'main')
+        self.users = users or self.db
+        self.counters = self.db.counters
+        self.events = EventBus.for_database(self.db)
+
+    @staticmethod
+    def _now_string(now=None):
+        return (now or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+
+    def _publish(self, announcements):
+        """Send (event type, data, floor) tuples collected under the lock (floor is None
+        for booking events: they name drivers, so they stay on the admin channel)"""
+        for event_type, data, floor in announcements:
+            if event_type == 'slot.status':
+                self._publish_slot_status(data['slot_id'], data['slot_number'], floor, data['status'])
+            else:
+                self.events.publish(event_type, data, floor=floor)
+
+    @staticmethod
+    def _slot_status(slot, status):
+        return 'slot.status', {'slot_id': slot['id'], 'slot_number': slot['slot_number'], 'status': status}, slot['floor']
+
+    def _joined(self, bookings, with_user=False):
+        """(booking, slot[, user]) for bookings whose slot (and user) still exist, as the SQL joins do"""
+        joined = []
+        for booking in bookings:
+            slot = self.db.slots.get(booking['slot_id'])
+            user = self.users.users.get(booking['user_id']) if with_user else None
+            if slot and (user or not with_user):
+                joined.append((booking, slot, user) if with_user else (booking, slot))
+        return joined
+
+    @staticmethod
+    def _newest_first(bookings):
+        return sorted(bookings, key=lambda booking: (booking['booking_ts'] or 0, booking['id']), reverse=True)
+
+    def book_slot(self, user_id, slot_id, vehicle_number, booking_date=None, booking_time=None, package='hourly',
+                  slot_type=None, floor=None):
+        """Book a parking slot with date, time and package (slot_id=None auto-assigns one)"""
+        if not Validator.validate_vehicle_number(vehicle_number):
+            return {'success': False, 'message': 'Invalid vehicle number format.'}
+
+        vehicle_number = vehicle_number.upper()
+
+        try:
+            booking_time_str, is_scheduled = self.booking_start(booking_date, booking_time)
+        except ValueError as e:
+            return {'success': False, 'message': str(e)}
+
+        package_info = self.PACKAGES.get(package, self.PACKAGES['hourly'])
+        booking_status = 'Scheduled' if is_scheduled else 'Active'
+        announcements = []
+
+        with self.db.lock:
+            if slot_id is None:
+                slot = self.db.best_slot(slot_type or 'Regular', floor)
+                if slot is None:
+                    return {'success': False, 'message': f"No {slot_type or 'Regular'} slot is available right now."}
+            else:
+                slot = self.db.slots.get(slot_id)
+                if not slot:
+                    return {'success': False, 'message': 'Slot not found.'}
+                if slot['status'] != 'Available':
+                    return {'success': False, 'message': 'Slot is not available.'}
+
+            if self.db.bookings_with_status('Active', user_id):
+                return {'success': False, 'message': 'You already have an active booking. Please cancel it first.'}
+
+            if is_scheduled and self.db.bookings_with_status('Scheduled', user_id):
+                return {'success': False, 'message': 'You already have a scheduled booking. Please cancel it first.'}
+
+            if not is_scheduled:
+                self.db.update_slot(slot, status='Occupied')
+                announcements.append(self._slot_status(slot, 'Occupied'))
+
+            booking_ts = Helper.to_epoch(booking_time_str)
+            booking = self.db.insert_booking(
+                user_id=user_id, slot_id=slot['id'], vehicle_number=vehicle_number,
+                booking_time=booking_time_str, booking_ts=booking_ts, status=booking_status,
+                package_type=package_info['name'], package_cost=package_info['rate'],
+                expected_duration=package_info['duration_hours'],
+                expected_end_ts=self.expected_end(booking_ts, package_info['duration_hours'])
+            )
+            announcements.append(('booking.' + booking_status.lower(), {
+                'booking_id': booking['id'],
+                'user_id': user_id,
+                'slot_id': slot['id'],
+                'slot_number': slot['slot_number'],
+                'vehicle_number': vehicle_number,
+                'booking_time': booking_time_str,
+                'package': package_info['name']
+            }, None))
+
+        self._publish(announcements)
+        status_msg = "scheduled" if is_scheduled else "booked"
+        return {
+            'success': True,
+            'message': f"Slot {slot['slot_number']} {status_msg} successfully!",
+            'slot_id': slot['id'],
+            'slot_number': slot['slot_number'],
+            'floor': slot['floor'],
+            'package': package_info['name'],
+            'cost': package_info['rate'],
+            'is_scheduled': is_scheduled,
+            'booking_time': booking_time_str
+        }
+
+    def cancel_booking(self, booking_id, user_id):
+        """Cancel an active booking with actual cost calculation"""
+        with self.db.lock:
+            booking = self.db.bookings.get(booking_id)
+            slot = self.db.slots.get(booking['slot_id']) if booking else None
+            if not slot or booking['user_id'] != user_id or booking['status'] != 'Active':
+                return {'success': False, 'message': 'Booking not found or already cancelled.'}
+
+            package_cost = booking['package_cost'] or 50.0
+            expected_duration = booking['expected_duration'] or 1.0
+
+            checkout_time = self._now_string()
+            checkout_ts = Helper.to_epoch(checkout_time)
+            duration = round((checkout_ts - booking['booking_ts']) / 3600, 2)
+            actual_cost = BillingEngine.checkout_cost(duration, package_cost, expected_duration)
+
+            self.db.update_booking(booking, status='Completed', checkout_time=checkout_time,
+                                   checkout_ts=checkout_ts, actual_cost=actual_cost)
+            self.db.update_slot(slot, status='Available')
+            announcements = [self._slot_status(slot, 'Available'), ('booking.completed', {
+                'booking_id': booking_id,
+                'user_id': user_id,
+                'slot_id': slot['id'],
+                'slot_number': slot['slot_number'],
+                'checkout_time': checkout_time,
+                'duration': duration,
+                'actual_cost': actual_cost
+            }, None)]
+
+        self._publish(announcements)
+        return {
+            'success': True,
+            'message': f'Checkout successful!',
+            'slot_number': slot['slot_number'],
+            'duration': duration,
+            'package': booking['package_type'],
+            'package_cost': package_cost,
+            'actual_cost': actual_cost,
+            'checkout_time': datetime.now().strftime("%d-%b-%Y %I:%M %p")
+        }
+
+    def book_fleet(self, user_id, vehicle_numbers, slot_type='Regular', floor=None, package='hourly', atomic=True):
+        """Book a slot for every vehicle of a fleet at once; same rules and report as BookingManager.book_fleet"""
+        vehicle_numbers = list(vehicle_numbers or [])
+        if len(vehicle_numbers) > self.MAX_FLEET_SIZE:
+            return {'success': False, 'message': f'A fleet booking covers at most {self.MAX_FLEET_SIZE} vehicles.',
+                    'booked': [], 'errors': []}
+
+        vehicles, errors = self._fleet_vehicles(vehicle_numbers)
+
+        package_info = self.PACKAGES.get(package, self.PACKAGES['hourly'])
+        booking_time_str = self._now_string()
+        booking_ts = Helper.to_epoch(booking_time_str)
+        booked = []
+        announcements = []
+
+        if vehicles and not (atomic and errors):
+            with self.db.lock:
+                parked = {booking['vehicle_number'] for booking in self.db.bookings_with_status('Active')}
+                claimed = []
+                for row_number, vehicle_number in vehicles:
+                    if vehicle_number in parked:
+                        errors.append({'row': row_number, 'vehicle_number': vehicle_number,
+                                       'message': 'Vehicle already has an active booking.'})
+                    else:
+                        slot = self.db.best_slot(slot_type, floor)
+                        if slot is None:
+                            errors.append({'row': row_number, 'vehicle_number': vehicle_number,
+                                           'message': f'No {slot_type} slot is available.'})
+                        else:
+                            self.db.update_slot(slot, status='Occupied')
+                            claimed.append((vehicle_number, slot))
+                    if atomic and errors:
+                        # Roll back the slots claimed so far
+                        for _, slot in claimed:
+                            self.db.update_slot(slot, status='Available')
+                        claimed = []
+                        break
+
+                for vehicle_number, slot in claimed:
+                    booking = self.db.insert_booking(
+                        user_id=user_id, slot_id=slot['id'], vehicle_number=vehicle_number,
+                        booking_time=booking_time_str, booking_ts=booking_ts, status='Active',
+                        package_type=package_info['name'], package_cost=package_info['rate'],
+                        expected_duration=package_info['duration_hours'],
+                        expected_end_ts=self.expected_end(booking_ts, package_info['duration_hours'])
+                    )
+                    booked.append({'booking_id': booking['id'], 'vehicle_number': vehicle_number,
+                                   'slot_id': slot['id'], 'slot_number': slot['slot_number'], 'floor': slot['floor']})
+                    announcements.append(self._slot_status(slot, 'Occupied'))
+                    announcements.append(('booking.active', {
+                        'booking_id': booking['id'],
+                        'user_id': user_id,
+                        'slot_id': slot['id'],
+                        'slot_number': slot['slot_number'],
+                        'vehicle_number': vehicle_number,
+                        'booking_time': booking_time_str,
+                        'package': package_info['name']
+                    }, None))
+
+        self._publish(announcements)
+        return self._fleet_result(booked, errors, atomic, package_info, booking_time_str)
+
+    def _checkout_row(self, booking, slot):
+        """A booking in the row layout _bill_checkouts reads"""
+        return (booking['id'], slot['id'], slot['slot_number'], booking['vehicle_number'], booking['booking_time'],
+                booking['booking_ts'], booking['package_type'], booking['package_cost'],
+                booking['expected_duration'], slot['floor'], slot['slot_type'], booking['user_id'])
+
+    def _complete_bookings(self, joined, checkout_time, announcements):
+        """Complete (booking, slot) pairs and free their slots (lock held)"""
+        checkout_ts = Helper.to_epoch(checkout_time)
+        completed = self._bill_checkouts([self._checkout_row(*pair) for pair in joined], checkout_ts)
+        for (booking, slot), billed in zip(joined, completed):
+            self.db.update_booking(booking, status='Completed', checkout_time=checkout_time,
+                                   checkout_ts=checkout_ts, actual_cost=billed['actual_cost'])
+            self.db.update_slot(slot, status='Available')
+            del billed['start_ts']
+            announcements.append(self._slot_status(slot, 'Available'))
+            announcements.append(('booking.completed', {
+                'booking_id': billed['booking_id'],
+                'user_id': billed['user_id'],
+                'slot_id': billed['slot_id'],
+                'slot_number': billed['slot_number'],
+                'checkout_time': checkout_time,
+                'duration': billed['duration'],
+                'actual_cost': billed['actual_cost']
+            }, None))
+        return completed
+
+    def checkout_fleet(self, user_id, booking_ids=None):
+        """Check out many active bookings of one account at once; same rules and report as BookingManager.checkout_fleet"""
+        if booking_ids is not None:
+            booking_ids = list(dict.fromkeys(booking_ids))
+            if len(booking_ids) > self.MAX_FLEET_SIZE:
+                return {'success': False, 'message': f'A fleet checkout covers at most {self.MAX_FLEET_SIZE} bookings.',
+                        'checked_out': [], 'total_cost': 0, 'errors': []}
+
+        errors = []
+        announcements = []
+        with self.db.lock:
+            active = self._joined(sorted(self.db.bookings_with_status('Active', user_id),
+                                         key=lambda booking: booking['id']))
+            if booking_ids is not None:
+                wanted = set(booking_ids)
+                active = [pair for pair in active if pair[0]['id'] in wanted]
+                found = {booking['id'] for booking, _ in active}
+                errors = [
+                    {'booking_id': booking_id, 'message': 'Booking not found or already cancelled.'}
+                    for booking_id in booking_ids if booking_id not in found
+                ]
+            checked_out = self._complete_bookings(active, self._now_string(), announcements)
+
+        self._publish(announcements)
+        return self._checkout_fleet_result(checked_out, errors)
+
+    def settle_bookings(self, floor=None, overstayed=False, older_than_hours=None, dry_run=False, now=None):
+        """Complete every active booking matching the filters at once (Admin); see BookingManager.settle_bookings"""
+        checkout_time = self._now_string(now)
+        checkout_ts = Helper.to_epoch(checkout_time)
+        announcements = []
+
+        with self.db.lock:
+            matching = [
+                (booking, slot) for booking, slot in self._joined(self.db.bookings_with_status('Active'))
+                if (older_than_hours is None or booking['booking_ts'] <= checkout_ts - int(older_than_hours * 3600))
+                and (not overstayed or booking['expected_end_ts'] < checkout_ts)
+                and (floor is None or slot['floor'] == floor)
+            ]
+            matching.sort(key=lambda pair: (pair[0]['booking_ts'], pair[0]['id']))
+            if dry_run:
+                settled = self._bill_checkouts([self._checkout_row(*pair) for pair in matching], checkout_ts)
+            else:
+                settled = self._complete_bookings(matching, checkout_time, announcements)
+
+        self._publish(announcements)
+        return self._settle_report(settled, dry_run, checkout_time)
+
+    def get_user_bookings(self, user_id, status=None, include_history=False):
+        """Get all bookings for a user, newest first (nothing is ever archived here)"""
+        with self.db.lock:
+            ids = self.db.user_bookings.get(user_id, ())
+            bookings = [self.db.bookings[booking_id] for booking_id in ids]
+            if status:
+                bookings = [booking for booking in bookings if booking['status'] == status]
+            return [
+                (booking['id'], slot['slot_number'], slot['slot_type'], booking['vehicle_number'],
+                 booking['booking_time'], booking['checkout_time'], booking['status'], booking['package_type'],
+                 booking['package_cost'], booking['actual_cost'], booking['booking_ts'])
+                for booking, slot in self._joined(self._newest_first(bookings))
+            ]
+
+    def get_active_booking(self, user_id):
+        """Get active booking for a user"""
+        with self.db.lock:
+            joined = self._joined(sorted(self.db.bookings_with_status('Active', user_id),
+                                         key=lambda booking: booking['id']))
+            if not joined:
+                return None
+            booking, slot = joined[0]
+            return (booking['id'], slot['slot_number'], slot['slot_type'], booking['vehicle_number'],
+                    booking['booking_time'], slot['floor'], booking['package_type'], booking['package_cost'],
+                    booking['expected_duration'])
+
+    def _listing(self, limit, cursor, status, date_from, date_to, floor):
+        """(booking, slot, user) newest first for an admin listing page.
+
+        Walks the (booking_ts, id) timeline, or the status's own timeline when
+        filtered, down from the cursor (or the end of date_to), so a page costs
+        about `limit` steps however many bookings there are (more when a floor
+        filter skips bookings of other floors).
+        """
+        lower = Helper.to_epoch(f"{date_from} 00:00:00") if date_from else None
+        upper = (Helper.to_epoch(f"{date_to} 00:00:00") + 86400, 0) if date_to else None
+        position = self.decode_cursor(cursor)
+        if position:
+            # Timelines key a missing booking_ts as 0, below every real one, as SQLite sorts NULL
+            position = (position[0] or 0, position[1])
+        if position and (upper is None or position < upper):
+            upper = position
+
+        keys = self.db.status_timelines.get(status, []) if status else self.db.timeline
+        end = bisect.bisect_left(keys, upper) if upper else len(keys)
+
+        rows = []
+        for index in range(end - 1, -1, -1):
+            booking_ts, booking_id = keys[index]
+            if lower is not None and booking_ts < lower:
+                break
+            booking = self.db.bookings[booking_id]
+            if date_to and booking['booking_ts'] is None:
+                continue
+            joined = self._joined([booking], with_user=True)
+            if joined and (floor is None or joined[0][1]['floor'] == floor):
+                rows.append(joined[0])
+                if limit and len(rows) >= limit:
+                    break
+        return rows
+
+    def get_all_bookings(self, limit=None, cursor=None, status=None, date_from=None, date_to=None, floor=None,
+                         include_history=False):
+        """Get bookings newest first (Admin view), optionally one keyset page at a time"""
+        with self.db.lock:
+            return [
+                (booking['id'], user['username'], slot['slot_number'], booking['vehicle_number'],
+                 booking['booking_time'], booking['checkout_time'], booking['status'], booking['booking_ts'])
+                for booking, slot, user in self._listing(limit, cursor, status, date_from, date_to, floor)
+            ]
+
+    def get_active_bookings(self, limit=None, cursor=None, date_from=None, date_to=None, floor=None,
+                            include_history=False):
+        """Get active bookings newest first (Admin view), optionally one keyset page at a time"""
+        with self.db.lock:
+            return [
+                (booking['id'], user['username'], user['phone'], slot['slot_number'], booking['vehicle_number'],
+                 booking['booking_time'], booking['booking_ts'])
+                for booking, slot, user in self._listing(limit, cursor, 'Active', date_from, date_to, floor)
+            ]
+
+    def get_overstays(self, floor=None, limit=None, ended_after=None, now=None):
+        """Active bookings that ran past their package, longest overdue first (Admin)"""
+        now_ts = Helper.to_epoch(self._now_string(now))
+        with self.db.lock:
+            overdue = sorted(
+                (booking for booking in self.db.bookings_with_status('Active')
+                 if booking['expected_end_ts'] < now_ts
+                 and (ended_after is None or booking['expected_end_ts'] >= ended_after)),
+                key=lambda booking: (booking['expected_end_ts'], booking['id'])
+            )
+            rows = [
+                (booking['id'], booking['user_id'], user['username'], user['phone'], slot['slot_number'],
+                 slot['floor'], booking['vehicle_number'], booking['booking_time'], booking['booking_ts'],
+                 booking['expected_end_ts'], booking['package_type'], booking['package_cost'],
+                 booking['expected_duration'])
+                for booking, slot, user in self._joined(overdue, with_user=True)
+                if floor is None or slot['floor'] == floor
+            ]
+        return self._overstay_report(rows[:limit] if limit else rows, now_ts)
+
+    def get_scheduled_bookings(self, user_id=None):
+        """Get scheduled bookings for a user or all users (admin)"""
+        with self.db.lock:
+            if user_id:
+                scheduled = sorted(self.db.bookings_with_status('Scheduled', user_id),
+                                   key=lambda booking: (booking['booking_ts'], booking['id']))
+                return [
+                    (booking['id'], slot['slot_number'], slot['slot_type'], booking['vehicle_number'],
+                     booking['booking_time'], booking['package_type'], booking['package_cost'], slot['floor'])
+                    for booking, slot in self._joined(scheduled)
+                ]
+            scheduled = sorted(self.db.bookings_with_status('Scheduled'),
+                               key=lambda booking: (booking['booking_ts'], booking['id']))
+            return [
+                (booking['id'], user['username'], slot['slot_number'], booking['vehicle_number'],
+                 booking['booking_time'], booking['package_type'])
+                for booking, slot, user in self._joined(scheduled, with_user=True)
+            ]
+
+    def cancel_scheduled_booking(self, booking_id, user_id):
+        """Cancel a scheduled booking"""
+        with self.db.lock:
+            booking = self.db.bookings.get(booking_id)
+            slot = self.db.slots.get(booking['slot_id']) if booking else None
+            if not slot or booking['user_id'] != user_id or booking['status'] != 'Scheduled':
+                return {'success': False, 'message': 'Scheduled booking not found or already cancelled.'}
+
+            cancel_time = self._now_string()
+            self.db.update_booking(booking, status='Cancelled', checkout_time=cancel_time,
+                                   checkout_ts=Helper.to_epoch(cancel_time))
+
+        self.events.publish('booking.cancelled', {
+            'booking_id': booking_id,
+            'user_id': user_id,
+            'slot_number': slot['slot_number'],
+            'booking_time': booking['booking_time']
+        })
+        return {
+            'success': True,
+            'message': f"Scheduled booking for slot {slot['slot_number']} cancelled successfully!",
+            'slot_number': slot['slot_number']
+        }
+
+    def get_pending_schedule(self):
+        """Get (booking_id, booking_time) for every scheduled booking, soonest first"""
+        with self.db.lock:
+            return [
+                (booking['id'], booking['booking_time'])
+                for booking in sorted(self.db.bookings_with_status('Scheduled'),
+                                      key=lambda booking: (booking['booking_ts'], booking['id']))
+            ]
+
+    def activate_due_bookings(self, booking_ids, grace_minutes=15, now=None):
+        """Activate due scheduled bookings and expire no-shows; see BookingManager.activate_due_bookings"""
+        now_str = self._now_string(now)
+        now_ts = Helper.to_epoch(now_str)
+        deadline_ts = now_ts - int(grace_minutes * 60)
+        result = {'activated': [], 'waiting': [], 'expired': []}
+        announcements = []
+
+        with self.db.lock:
+            due = [self.db.bookings[booking_id] for booking_id in set(booking_ids)
+                   if booking_id in self.db.bookings and self.db.bookings[booking_id]['status'] == 'Scheduled']
+            due.sort(key=lambda booking: (booking['booking_ts'], booking['id']))
+
+            for booking, slot in self._joined(due):
+                if booking['booking_ts'] > now_ts:
+                    result['waiting'].append((booking['id'], booking['booking_time']))
+                    continue
+
+                claimed = not self.db.bookings_with_status('Active', booking['user_id']) \
+                    and slot['status'] == 'Available'
+                event = {
+                    'booking_id': booking['id'],
+                    'user_id': booking['user_id'],
+                    'slot_id': slot['id'],
+                    'slot_number': slot['slot_number'],
+                    'vehicle_number': booking['vehicle_number'],
+                    'booking_time': booking['booking_time']
+                }
+
+                if claimed:
+                    self.db.update_slot(slot, status='Occupied')
+                    self.db.update_booking(booking, status='Active')
+                    result['activated'].append(booking['id'])
+                    announcements.append(self._slot_status(slot, 'Occupied'))
+                    announcements.append(('booking.active', event, None))
+                elif booking['booking_ts'] <= deadline_ts:
+                    self.db.update_booking(booking, status='Cancelled', checkout_time=now_str, checkout_ts=now_ts)
+                    result['expired'].append(booking['id'])
+                    announcements.append(('booking.expired', event, None))
+                else:
+                    result['waiting'].append((booking['id'], booking['booking_time']))
+
+        self._publish(announcements)
+        return result
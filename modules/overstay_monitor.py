@@ -0,0 +1,70 @@
+"""
+Overstay Monitor Module
+Background sweep that announces bookings running past their package duration
+"""
+
+import threading
+from datetime import datetime
+
+from config import Config
+from modules.event_bus import EventBus
+from utils.helpers import Helper
+
+
+class OverstayMonitor:
+    """Periodic sweep for active bookings that ran past their expected end.
+
+    Each sweep is one range read of the (status, expected_end_ts) index,
+    limited to bookings whose package ran out since the previous sweep, so
+    every overstay is announced exactly once as a 'booking.overstayed' event
+    on the admin channel without re-reading the other active bookings.
+    """
+
+    def __init__(self, booking_manager, interval_seconds=None):
+        self.booking_manager = booking_manager
+        self.interval_seconds = interval_seconds if interval_seconds is not None else Config.OVERSTAY_SWEEP_SECONDS
+        self.events = EventBus.for_database(booking_manager.db)
+        self.last_sweep_ts = None
+        self.alerted = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the sweep thread (a no-op when the interval is 0)"""
+        if self._thread or self.interval_seconds <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='overstay-monitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the sweep thread"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            self.sweep()
+            if self._stop.wait(self.interval_seconds):
+                return
+
+    def sweep(self, now=None):
+        """Announce bookings that ran out since the last sweep; returns them (None on error)"""
+        now = now or datetime.now()
+        try:
+            overstays = self.booking_manager.get_overstays(ended_after=self.last_sweep_ts, now=now)
+        except Exception as e:
+            print(f"Overstay sweep error: {e}")
+            return None
+
+        # The next sweep starts where this one's half-open range ended
+        self.last_sweep_ts = Helper.to_epoch(now.strftime("%Y-%m-%d %H:%M:%S"))
+        for overstay in overstays:
+            self.events.publish('booking.overstayed', {
+                key: overstay[key] for key in ('booking_id', 'user_id', 'slot_number', 'floor', 'vehicle_number',
+                                               'expected_end', 'overdue_minutes', 'overage')
+            })
+        self.alerted += len(overstays)
+        return overstays
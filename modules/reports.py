@@ -0,0 +1,90 @@
+"""
+Reports Module
+Revenue and occupancy reports answered from the booking_rollups table
+"""
+
+from database.lot_router import LotRouter
+from database.rollups import BUCKETS, HOUR
+from utils.helpers import Helper
+
+
+class ReportManager:
+    """Reads the incrementally maintained rollups (Admin).
+
+    Each report is a primary-key range read of booking_rollups, so its cost
+    depends on the period and grouping asked for, not on booking history.
+    """
+
+    GROUP_COLUMNS = ('floor', 'slot_type', 'package_type')
+
+    # Longest range per granularity, to keep responses bounded
+    MAX_DAYS = {'hour': 31, 'day': 366}
+
+    def __init__(self, db=None, lot=None):
+        self.lot = lot
+        self.db = db or LotRouter.default().database(lot)
+
+    def get_report(self, date_from, date_to, granularity='day', group_by=(), floor=None):
+        """Bookings, revenue, average stay and occupied slot-hours per period.
+
+        date_from/date_to are inclusive YYYY-MM-DD days; group_by is any of
+        GROUP_COLUMNS. Raises ValueError for an invalid request.
+        """
+        if granularity not in BUCKETS:
+            raise ValueError("Granularity must be 'hour' or 'day'.")
+        unknown = [column for column in group_by if column not in self.GROUP_COLUMNS]
+        if unknown:
+            raise ValueError(f"Cannot group by {', '.join(unknown)}.")
+
+        start = Helper.to_epoch(f"{date_from} 00:00:00")
+        end = Helper.to_epoch(f"{date_to} 00:00:00")
+        if start is None or end is None or end < start:
+            raise ValueError('Invalid date range.')
+        end += 86400
+        if (end - start) // 86400 > self.MAX_DAYS[granularity]:
+            raise ValueError(f"{granularity.title()} reports cover at most {self.MAX_DAYS[granularity]} days.")
+
+        group_by = [column for column in self.GROUP_COLUMNS if column in group_by]
+        select_groups = ''.join(f', {column}' for column in group_by)
+        conditions = "bucket = ? AND period_start >= ? AND period_start < ?"
+        params = [granularity, start, end]
+        if floor is not None:
+            conditions += " AND floor = ?"
+            params.append(floor)
+
+        query = f"""
+            SELECT period_start{select_groups},
+                   SUM(bookings), SUM(revenue), SUM(stay_seconds), SUM(occupied_seconds)
+            FROM booking_rollups
+            WHERE {conditions}
+            GROUP BY period_start{select_groups}
+            ORDER BY period_start{select_groups}
+        """
+        period_length = BUCKETS[granularity]
+        rows = []
+        for row in self.db.fetch_all(query, tuple(params)):
+            bookings, revenue, stay_seconds, occupied_seconds = row[-4:]
+            entry = {'period': Helper.from_epoch(row[0])}
+            entry.update(zip(group_by, row[1:1 + len(group_by)]))
+            entry.update({
+                'bookings': bookings,
+                'revenue': round(revenue, 2),
+                'avg_stay_hours': round(stay_seconds / bookings / HOUR, 2) if bookings else 0,
+                'occupied_slot_hours': round(occupied_seconds / HOUR, 2),
+                # Mean number of slots in use across the period
+                'avg_occupied_slots': round(occupied_seconds / period_length, 2)
+            })
+            rows.append(entry)
+
+        return {
+            'granularity': granularity,
+            'from': date_from,
+            'to': date_to,
+            'group_by': group_by,
+            'rows': rows,
+            'totals': {
+                'bookings': sum(r['bookings'] for r in rows),
+                'revenue': round(sum(r['revenue'] for r in rows), 2),
+                'occupied_slot_hours': round(sum(r['occupied_slot_hours'] for r in rows), 2)
+            }
+        }
@@ -0,0 +1,505 @@
+"""
+Repositories Module
+Storage-independent interfaces for users, slots and bookings
+"""
+
+import base64
+import csv
+import io
+import json
+from datetime import datetime
+
+from utils.billing import BillingEngine, DEFAULT_PACKAGE_COST
+from utils.helpers import Helper
+from utils.validators import Validator
+
+
+class UserRepository:
+    """Users and admins: logins, profiles and registration.
+
+    Implemented by Authentication (SQLite) and MemoryUserRepository. Methods
+    return the same dicts in both, so callers never know which one they hold.
+    """
+
+    # Read-through cache of profiles, when the backend needs one
+    cache = None
+
+    def admin_login(self, username, password):
+        raise NotImplementedError
+
+    def user_login(self, username, password):
+        raise NotImplementedError
+
+    def get_user_profile(self, user_id):
+        raise NotImplementedError
+
+    def register_user(self, username, password, email, phone, vehicle_number):
+        raise NotImplementedError
+
+    def add_admin(self, username, password, email):
+        raise NotImplementedError
+
+    @staticmethod
+    def _registration_error(username, password, email, phone, vehicle_number):
+        """Message for the first invalid registration field, or None"""
+        if not Validator.validate_username(username):
+            return 'Invalid username. Use 3-20 alphanumeric characters.'
+        if not Validator.validate_password(password):
+            return 'Password must be at least 6 characters long.'
+        if not Validator.validate_email(email):
+            return 'Invalid email format.'
+        if not Validator.validate_phone(phone):
+            return 'Invalid phone number. Use 10 digits.'
+        if not Validator.validate_vehicle_number(vehicle_number):
+            return 'Invalid vehicle number format.'
+        return None
+
+    @staticmethod
+    def _admin_error(username, password, email):
+        """Message for the first invalid admin field, or None"""
+        if not Validator.validate_username(username):
+            return 'Invalid username.'
+        if not Validator.validate_password(password):
+            return 'Password must be at least 6 characters long.'
+        if email and not Validator.validate_email(email):
+            return 'Invalid email format.'
+        return None
+
+    @staticmethod
+    def _profile_from_row(row):
+        return {
+            'id': row[0],
+            'username': row[1],
+            'email': row[2],
+            'phone': row[3],
+            'vehicle_number': row[4]
+        }
+
+
+class SlotRepository:
+    """Parking slots of one lot.
+
+    Implemented by SlotManager (SQLite) and MemorySlotRepository. Both keep
+    `counters` (an object with get() and snapshot() over the 'slots:*'
+    counters) and publish the same events on the lot's bus.
+    """
+
+    SLOT_TYPES = ('Regular', 'VIP', 'Handicapped', 'EV Charging')
+
+    def add_slot(self, slot_number, slot_type='Regular', floor=1, priority=0):
+        raise NotImplementedError
+
+    def add_slots_bulk(self, slots, atomic=False):
+        raise NotImplementedError
+
+    def update_slot(self, slot_id, slot_number=None, slot_type=None, floor=None, priority=None):
+        raise NotImplementedError
+
+    def delete_slot(self, slot_id):
+        raise NotImplementedError
+
+    def get_all_slots(self):
+        raise NotImplementedError
+
+    def get_available_slots(self, floor=None, slot_type=None):
+        raise NotImplementedError
+
+    def get_available_floors(self):
+        raise NotImplementedError
+
+    def get_slot_by_id(self, slot_id):
+        raise NotImplementedError
+
+    def update_slot_status(self, slot_id, status):
+        raise NotImplementedError
+
+    def count_available_slots(self):
+        """Get number of available parking slots"""
+        return self.counters.get('slots:Available')
+
+    def get_slot_statistics(self):
+        """Get parking slot statistics"""
+        counters = self.counters.snapshot()
+        total = counters.get('slots:total', 0)
+        available = counters.get('slots:Available', 0)
+        occupied = counters.get('slots:Occupied', 0)
+
+        return {
+            'total': total,
+            'available': available,
+            'occupied': occupied,
+            'occupancy_rate': round((occupied / total * 100) if total > 0 else 0, 2)
+        }
+
+    def _validate_slot_rows(self, slots):
+        """Check bulk import rows; returns ([(row, slot_number, slot_type, floor, priority)], errors)"""
+        errors = []
+        valid = []
+        seen = set()
+
+        for row_number, slot in enumerate(slots, start=1):
+            if not isinstance(slot, dict):
+                errors.append({'row': row_number, 'slot_number': None, 'message': 'Row is not an object.'})
+                continue
+
+            slot_number = str(slot.get('slot_number') or '').strip()
+            slot_type = str(slot.get('slot_type') or 'Regular').strip()
+            floor = slot.get('floor') or 1
+            priority = slot.get('priority') or 0
+
+            if not slot_number or not Validator.validate_slot_number(slot_number):
+                errors.append({'row': row_number, 'slot_number': slot_number, 'message': 'Invalid slot number format.'})
+                continue
+            slot_number = slot_number.upper()
+
+            if slot_type not in self.SLOT_TYPES:
+                errors.append({'row': row_number, 'slot_number': slot_number, 'message': f'Unknown slot type {slot_type}.'})
+                continue
+
+            try:
+                floor = int(floor)
+            except (TypeError, ValueError):
+                floor = 0
+            if floor < 1:
+                errors.append({'row': row_number, 'slot_number': slot_number, 'message': 'Floor must be a positive number.'})
+                continue
+
+            try:
+                priority = int(priority)
+            except (TypeError, ValueError):
+                errors.append({'row': row_number, 'slot_number': slot_number, 'message': 'Priority must be a whole number.'})
+                continue
+
+            if slot_number in seen:
+                errors.append({'row': row_number, 'slot_number': slot_number, 'message': 'Duplicate slot number in import.'})
+                continue
+            seen.add(slot_number)
+            valid.append((row_number, slot_number, slot_type, floor, priority))
+
+        return valid, errors
+
+    @staticmethod
+    def _bulk_result(added, errors, atomic):
+        """add_slots_bulk report for `added` new slots"""
+        errors.sort(key=lambda error: error['row'])
+        message = f'{added} slot(s) added'
+        if errors:
+            message += f', {len(errors)} row(s) rejected'
+            if atomic:
+                message += ' (nothing was imported)'
+
+        return {
+            'success': bool(added) or not errors,
+            'message': message + '.',
+            'added': added,
+            'errors': errors
+        }
+
+    @staticmethod
+    def parse_slot_import(content, fmt):
+        """Parse a CSV (header row: slot_number,slot_type,floor[,priority]) or JSON slot list.
+
+        Raises ValueError when the document itself cannot be read.
+        """
+        if fmt == 'json':
+            try:
+                data = json.loads(content)
+            except ValueError:
+                raise ValueError('Invalid JSON document.')
+            if isinstance(data, dict):
+                data = data.get('slots')
+            if not isinstance(data, list):
+                raise ValueError('JSON must be a list of slots or {"slots": [...]}.')
+            return data
+
+        if fmt == 'csv':
+            reader = csv.DictReader(io.StringIO(content))
+            if not reader.fieldnames or 'slot_number' not in [name.strip().lower() for name in reader.fieldnames]:
+                raise ValueError('CSV needs a header row with a slot_number column.')
+            return [
+                {key.strip().lower(): (value or '').strip() for key, value in row.items() if key is not None}
+                for row in reader
+            ]
+
+        raise ValueError('Unsupported import format. Use CSV or JSON.')
+
+
+class BookingRepository:
+    """Bookings of one lot.
+
+    Implemented by BookingManager (SQLite) and MemoryBookingRepository. Both
+    keep `db` (the object the lot's event bus and caches hang off),
+    `counters` (the 'bookings:*' counters) and `events`, and return rows in
+    the same column order.
+    """
+
+    # Booking packages with rates
+    PACKAGES = {
+        'hourly': {'name': 'Hourly', 'rate': 50, 'duration_hours': 1},
+        'half_day': {'name': 'Half Day (6 hours)', 'rate': 250, 'duration_hours': 6},
+        'full_day': {'name': 'Full Day (24 hours)', 'rate': 400, 'duration_hours': 24},
+        'weekly': {'name': 'Weekly (7 days)', 'rate': 2500, 'duration_hours': 168},
+        'monthly': {'name': 'Monthly (30 days)', 'rate': 8000, 'duration_hours': 720}
+    }
+
+    # Largest page the admin listings will return
+    MAX_PAGE_SIZE = 200
+
+    # Most vehicles a single fleet booking may cover
+    MAX_FLEET_SIZE = 500
+
+    def book_slot(self, user_id, slot_id, vehicle_number, booking_date=None, booking_time=None, package='hourly',
+                  slot_type=None, floor=None):
+        raise NotImplementedError
+
+    def cancel_booking(self, booking_id, user_id):
+        raise NotImplementedError
+
+    def book_fleet(self, user_id, vehicle_numbers, slot_type='Regular', floor=None, package='hourly', atomic=True):
+        raise NotImplementedError
+
+    def checkout_fleet(self, user_id, booking_ids=None):
+        raise NotImplementedError
+
+    def settle_bookings(self, floor=None, overstayed=False, older_than_hours=None, dry_run=False, now=None):
+        raise NotImplementedError
+
+    def get_user_bookings(self, user_id, status=None, include_history=False):
+        raise NotImplementedError
+
+    def get_active_booking(self, user_id):
+        raise NotImplementedError
+
+    def get_all_bookings(self, limit=None, cursor=None, status=None, date_from=None, date_to=None, floor=None,
+                         include_history=False):
+        raise NotImplementedError
+
+    def get_active_bookings(self, limit=None, cursor=None, date_from=None, date_to=None, floor=None,
+                            include_history=False):
+        raise NotImplementedError
+
+    def get_overstays(self, floor=None, limit=None, ended_after=None, now=None):
+        raise NotImplementedError
+
+    def get_scheduled_bookings(self, user_id=None):
+        raise NotImplementedError
+
+    def cancel_scheduled_booking(self, booking_id, user_id):
+        raise NotImplementedError
+
+    def get_pending_schedule(self):
+        raise NotImplementedError
+
+    def activate_due_bookings(self, booking_ids, grace_minutes=15, now=None):
+        raise NotImplementedError
+
+    @staticmethod
+    def booking_start(booking_date=None, booking_time=None):
+        """(booking_time string, is_scheduled) for a requested start; raises ValueError with a user-facing message.
+
+        No date and time means now. A start more than 5 minutes ahead makes a scheduled booking.
+        """
+        if not (booking_date and booking_time):
+            return datetime.now().strftime("%Y-%m-%d %H:%M:%S"), False
+
+        try:
+            booking_datetime = datetime.strptime(f"{booking_date} {booking_time}", "%Y-%m-%d %H:%M")
+        except ValueError:
+            raise ValueError('Invalid date or time format.')
+
+        current_time = datetime.now()
+        if booking_datetime < current_time:
+            raise ValueError('Booking time cannot be in the past.')
+
+        is_scheduled = (booking_datetime - current_time).total_seconds() > 300
+        return booking_datetime.strftime("%Y-%m-%d %H:%M:%S"), is_scheduled
+
+    @staticmethod
+    def expected_end(booking_ts, duration_hours):
+        """Epoch at which a booking's package runs out (the value the schema triggers store)"""
+        if booking_ts is None:
+            return None
+        return booking_ts + int((duration_hours if duration_hours is not None else 1.0) * 3600)
+
+    def _fleet_vehicles(self, vehicle_numbers):
+        """Normalise a fleet's vehicle numbers; returns ([(row, vehicle_number)], errors)"""
+        errors = []
+        vehicles = []
+        seen = set()
+        for row_number, vehicle_number in enumerate(vehicle_numbers, start=1):
+            vehicle_number = str(vehicle_number or '').strip().upper()
+            if not Validator.validate_vehicle_number(vehicle_number):
+                errors.append({'row': row_number, 'vehicle_number': vehicle_number, 'message': 'Invalid vehicle number format.'})
+            elif vehicle_number in seen:
+                errors.append({'row': row_number, 'vehicle_number': vehicle_number, 'message': 'Duplicate vehicle number in request.'})
+            else:
+                seen.add(vehicle_number)
+                vehicles.append((row_number, vehicle_number))
+        return vehicles, errors
+
+    @staticmethod
+    def _fleet_result(booked, errors, atomic, package_info, booking_time_str):
+        """book_fleet report"""
+        errors.sort(key=lambda error: error['row'])
+        message = f'{len(booked)} vehicle(s) booked'
+        if errors:
+            message += f', {len(errors)} rejected'
+            if atomic:
+                message += ' (nothing was booked)'
+
+        return {
+            'success': bool(booked) or not errors,
+            'message': message + '.',
+            'package': package_info['name'],
+            'cost': round(package_info['rate'] * len(booked), 2),
+            'booking_time': booking_time_str,
+            'booked': booked,
+            'errors': errors
+        }
+
+    @staticmethod
+    def _checkout_fleet_result(checked_out, errors):
+        """checkout_fleet report"""
+        total_cost = round(sum(booking['actual_cost'] for booking in checked_out), 2)
+        message = f'{len(checked_out)} booking(s) checked out'
+        if errors:
+            message += f', {len(errors)} rejected'
+
+        return {
+            'success': bool(checked_out) or not errors,
+            'message': message + '.',
+            'checked_out': checked_out,
+            'total_cost': total_cost,
+            'errors': errors
+        }
+
+    @staticmethod
+    def _bill_checkouts(rows, checkout_ts):
+        """Duration and cost of every checkout row checked out at checkout_ts, in one batch.
+
+        Rows are (id, slot_id, slot_number, vehicle_number, booking_time,
+        booking_ts, package_type, package_cost, expected_duration, floor,
+        slot_type, user_id).
+        """
+        starts = [row[5] if row[5] is not None else Helper.to_epoch(row[4]) for row in rows]
+        durations = BillingEngine.epoch_durations(starts, [checkout_ts] * len(rows))
+        costs = BillingEngine.checkout_costs(durations, [row[7] for row in rows], [row[8] for row in rows])
+        return [
+            {'booking_id': row[0], 'user_id': row[11], 'slot_id': row[1], 'slot_number': row[2],
+             'vehicle_number': row[3], 'floor': row[9], 'start_ts': start_ts, 'duration': duration,
+             'actual_cost': cost, 'overstayed': duration > (row[8] or 1.0)}
+            for row, start_ts, duration, cost in zip(rows, starts, durations, costs)
+        ]
+
+    @staticmethod
+    def _settle_report(settled, dry_run, checkout_time):
+        """settle_bookings report for the completed (or, on a dry run, billed) bookings"""
+        by_floor = {}
+        for booking in settled:
+            totals = by_floor.setdefault(booking['floor'], {'floor': booking['floor'], 'bookings': 0, 'revenue': 0})
+            totals['bookings'] += 1
+            totals['revenue'] = round(totals['revenue'] + booking['actual_cost'], 2)
+
+        verb = 'would be settled' if dry_run else 'settled'
+        return {
+            'success': True,
+            'message': f'{len(settled)} booking(s) {verb}.',
+            'dry_run': dry_run,
+            'checkout_time': checkout_time,
+            'settled': len(settled),
+            'overstayed': sum(1 for booking in settled if booking['overstayed']),
+            'total_hours': round(sum(booking['duration'] for booking in settled), 2),
+            'total_cost': round(sum(booking['actual_cost'] for booking in settled), 2),
+            'by_floor': [by_floor[key] for key in sorted(by_floor)],
+            'booking_ids': [booking['booking_id'] for booking in settled]
+        }
+
+    @staticmethod
+    def _overstay_report(rows, now_ts):
+        """get_overstays dicts for rows of (id, user_id, username, phone, slot_number, floor,
+        vehicle_number, booking_time, booking_ts, expected_end_ts, package_type, package_cost,
+        expected_duration)"""
+        durations = BillingEngine.epoch_durations([row[8] for row in rows], [now_ts] * len(rows))
+        costs = BillingEngine.checkout_costs(durations, [row[11] for row in rows], [row[12] for row in rows])
+        return [
+            {
+                'booking_id': row[0],
+                'user_id': row[1],
+                'username': row[2],
+                'phone': row[3],
+                'slot_number': row[4],
+                'floor': row[5],
+                'vehicle_number': row[6],
+                'booking_time': row[7],
+                'expected_end': Helper.from_epoch(row[9]),
+                'overdue_minutes': (now_ts - row[9]) // 60,
+                'duration': duration,
+                'package': row[10],
+                'package_cost': row[11] or DEFAULT_PACKAGE_COST,
+                'current_cost': cost,
+                'overage': round(cost - (row[11] or DEFAULT_PACKAGE_COST), 2)
+            }
+            for row, duration, cost in zip(rows, durations, costs)
+        ]
+
+    def get_bookings_page(self, view='all', limit=50, cursor=None, **filters):
+        """Get one page of the admin booking listing plus the cursor for the next page"""
+        limit = max(1, min(int(limit), self.MAX_PAGE_SIZE))
+
+        if view == 'active':
+            filters.pop('status', None)
+            rows = self.get_active_bookings(limit=limit + 1, cursor=cursor, **filters)
+        else:
+            rows = self.get_all_bookings(limit=limit + 1, cursor=cursor, **filters)
+
+        # One extra row tells us whether another page exists without a COUNT
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        # Listing rows end with booking_ts
+        next_cursor = self.encode_cursor(rows[-1][-1], rows[-1][0]) if has_more else None
+
+        return {'bookings': rows, 'next_cursor': next_cursor}
+
+    @staticmethod
+    def encode_cursor(booking_ts, booking_id):
+        """Build an opaque page cursor from the last row shown (a NULL booking_ts is left empty)"""
+        raw = f"{'' if booking_ts is None else booking_ts}|{booking_id}".encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """Decode a page cursor into (booking_ts, id), booking_ts None when the last row
+        had none; None for a missing or malformed cursor"""
+        if not cursor:
+            return None
+        try:
+            booking_ts, booking_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+            return (int(booking_ts) if booking_ts else None), int(booking_id)
+        except (ValueError, UnicodeDecodeError):
+            return None
+
+    def get_booking_statistics(self):
+        """Get booking statistics (Admin)"""
+        counters = self.counters.snapshot()
+        total = counters.get('bookings:total', 0)
+        active = counters.get('bookings:Active', 0)
+        completed = counters.get('bookings:Completed', 0)
+        scheduled = counters.get('bookings:Scheduled', 0)
+        cancelled = counters.get('bookings:Cancelled', 0)
+
+        return {
+            'total': total,
+            'active': active,
+            'completed': completed,
+            'scheduled': scheduled,
+            'cancelled': cancelled
+        }
+
+    def _publish_slot_status(self, slot_id, slot_number, floor, status):
+        """Announce a slot status flip on the event bus"""
+        self.events.publish('slot.status', {
+            'slot_id': slot_id,
+            'slot_number': slot_number,
+            'floor': floor,
+            'status': status
+        }, floor=floor)
@@ -0,0 +1,72 @@
+"""
+Response Cache Module
+Admin dashboard / stats responses cached until the next committed write
+"""
+
+import time
+
+from config import Config
+from utils.cache import LRUCache
+
+
+class ResponseCache(LRUCache):
+    """LRU cache of rendered responses keyed by view name.
+
+    Each entry remembers the database write version it was built at and is
+    served only while that version is current, so any committed booking or
+    slot write invalidates it. Writes made by other processes (such as the
+    archive CLI) move the version too, once db.sync() sees the write epoch
+    advance (at most DB_SYNC_SECONDS later). max_age bounds how long an
+    entry may be served at all; 0 disables caching.
+    """
+
+    def __init__(self, db, max_size=None, max_age=None):
+        super().__init__(max_size or Config.RESPONSE_CACHE_SIZE)
+        self.db = db
+        self.max_age = max_age if max_age is not None else Config.RESPONSE_CACHE_MAX_AGE
+        self.stale = 0
+        self.expired = 0
+
+    @classmethod
+    def for_database(cls, db):
+        """Return the shared cache for a database"""
+        return db.shared('response_cache', cls)
+
+    def get_or_load(self, key, loader):
+        """Return the cached response for key, calling loader() when it is missing or out of date"""
+        if self.max_age <= 0:
+            return loader()
+
+        # Read the version before loading: a write that commits while the
+        # response is built leaves the entry behind, so it is rebuilt next time
+        version = self.db.data_version
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                entry_version, loaded_at, value = entry
+                if entry_version == version and now - loaded_at <= self.max_age:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                if entry_version != version:
+                    self.stale += 1
+                else:
+                    self.expired += 1
+            self.misses += 1
+
+        value = loader()
+        self.put(key, (version, now, value))
+        return value
+
+    def stats(self):
+        """LRU counters plus why misses happened"""
+        stats = super().stats()
+        with self._lock:
+            stats.update({
+                'stale': self.stale,
+                'expired': self.expired,
+                'max_age': self.max_age,
+                'data_version': self.db.data_version
+            })
+        return stats
@@ -0,0 +1,144 @@
+"""
+Slot Allocator Module
+Picks the best free slot for auto-assigned bookings from per-(floor, type) priority queues
+"""
+
+import heapq
+import threading
+
+from modules.slot_index import SlotAvailabilityIndex
+
+
+class SlotAllocator:
+    """Min-heaps of available slots per (floor, slot_type), ordered by
+    (priority, slot_number); a lower priority is nearer the entrance.
+
+    reserve() pops the best slot in O(log n) and holds it, so concurrent
+    auto-assigned bookings are handed different slots instead of racing for
+    the same one; the booking transaction then claims it in the database and
+    calls release(). Each bucket is guarded by one of STRIPES locks, so
+    bookings for different floors and types never wait on each other.
+
+    Heaps are built lazily from the availability index and fed by its
+    listener when slots become free. Entries that went stale (slot taken,
+    moved or re-prioritised) are dropped when they reach the top.
+    """
+
+    STRIPES = 16
+
+    def __init__(self, db):
+        self.index = SlotAvailabilityIndex.for_database(db)
+        self._stripes = [threading.Lock() for _ in range(self.STRIPES)]
+        self._heaps = {}        # (floor, slot_type) -> [(priority, slot_number, slot_id)]
+        self._generation = {}   # (floor, slot_type) -> index generation the heap was built from
+        self._reserved = set()
+        self.index.listeners.append(self._slot_available)
+
+    @classmethod
+    def for_database(cls, db):
+        """Return the shared allocator for a database"""
+        return db.shared('slot_allocator', cls)
+
+    def _lock(self, key):
+        return self._stripes[hash(key) % self.STRIPES]
+
+    # Lock order is always stripe lock, then index lock
+
+    def _heap(self, key):
+        """The bucket's heap, rebuilt from the index when missing or stale (stripe lock held)"""
+        heap = self._heaps.get(key)
+        generation = self.index.current_generation()
+        if heap is None or self._generation.get(key) != generation:
+            heap = self.index.priority_entries(*key)
+            heapq.heapify(heap)
+            self._heaps[key] = heap
+            self._generation[key] = generation
+        return heap
+
+    def _pop_stale(self, key, heap):
+        """Drop entries from the top until the best one is free and current (stripe lock held)"""
+        floor, slot_type = key
+        while heap:
+            priority, slot_number, slot_id = heap[0]
+            if slot_id not in self._reserved and \
+                    self.index.slot(slot_id) == (slot_number, slot_type, floor, 'Available', priority):
+                return heap[0]
+            heapq.heappop(heap)
+        return None
+
+    def _take(self, key):
+        """Reserve the best slot of one bucket; returns its id or None"""
+        with self._lock(key):
+            heap = self._heap(key)
+            best = self._pop_stale(key, heap)
+            if best is None:
+                return None
+            heapq.heappop(heap)
+            self._reserved.add(best[2])
+            return best[2]
+
+    def _peek(self, key):
+        """(priority, slot_number) of a bucket's best slot without reserving it"""
+        with self._lock(key):
+            best = self._pop_stale(key, self._heap(key))
+            return best[:2] if best else None
+
+    def _slot_available(self, slot_id, slot_number, slot_type, floor, priority):
+        """Index listener: queue a slot that just became free"""
+        key = (floor, slot_type)
+        with self._lock(key):
+            heap = self._heaps.get(key)
+            if heap is None:
+                return
+            heapq.heappush(heap, (priority, slot_number, slot_id))
+            # reserve() discards stale entries as it goes; rebuild if churn outpaces it
+            if len(heap) > 2 * self.index.count(floor, slot_type) + 64:
+                del self._heaps[key]
+
+    def reserve(self, slot_type, floor=None):
+        """Reserve the best available slot of a type; returns its id or None.
+
+        A free slot on the preferred floor always wins. Otherwise the slot
+        with the lowest priority on any floor is taken, nearer floors
+        breaking ties.
+        """
+        if floor is not None:
+            slot_id = self._take((floor, slot_type))
+            if slot_id is not None:
+                return slot_id
+
+        for _ in range(3):
+            ranked = []
+            for other in self.index.floors_with(slot_type):
+                if other == floor:
+                    continue
+                best = self._peek((other, slot_type))
+                if best is not None:
+                    distance = abs(other - floor) if floor is not None else 0
+                    ranked.append((best[0], distance, best[1], other))
+            if not ranked:
+                return None
+            # Another booking may take a bucket's best slot between peek and take
+            for _, _, _, other in sorted(ranked):
+                slot_id = self._take((other, slot_type))
+                if slot_id is not None:
+                    return slot_id
+        return None
+
+    def release(self, slot_id, requeue=False):
+        """End a reservation; requeue=True returns a slot that was not taken to its queue"""
+        self._reserved.discard(slot_id)
+        if not requeue:
+            return
+        slot = self.index.slot(slot_id)
+        if slot and slot[3] == 'Available':
+            slot_number, slot_type, floor, _, priority = slot
+            key = (floor, slot_type)
+            with self._lock(key):
+                heap = self._heaps.get(key)
+                if heap is not None:
+                    heapq.heappush(heap, (priority, slot_number, slot_id))
+
+    def reserved(self):
+        """Number of slots currently held by in-flight bookings"""
+        return len(self._reserved)
@@ -0,0 +1,198 @@
+"""
+Slot Availability Index Module
+In-memory index of available slots grouped by floor and slot type
+"""
+
+import bisect
+import heapq
+import threading
+
+
+class SlotAvailabilityIndex:
+    """Sorted sets of available slots keyed by (floor, slot_type).
+
+    Loaded from the slots table on first use, then kept current by the
+    post-commit hooks of SlotManager and BookingManager, so availability
+    listings are answered without touching SQLite. Writes committed by other
+    processes (such as the settle CLI) are picked up by db.sync(), which
+    discards the index so it reloads. Callables in `listeners` are told
+    (outside the index lock) whenever a slot becomes available.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._slots = {}       # slot_id -> [slot_number, slot_type, floor, status, priority]
+        self._available = {}   # (floor, slot_type) -> sorted [(slot_number, slot_id)]
+        self._listings = {}    # (floor, slot_type) filter -> cached result rows
+        self.listeners = []    # callback(slot_id, slot_number, slot_type, floor, priority)
+        self.generation = 0    # bumped on every (re)load, so dependents know to rebuild
+        db.on_external_write(self.reload)
+
+    @classmethod
+    def for_database(cls, db):
+        """Return the shared index for a database"""
+        return db.shared('slot_index', cls)
+
+    def _ensure_loaded(self):
+        self.db.sync()
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            rows = self.db.fetch_all(
+                "SELECT id, slot_number, slot_type, status, floor, priority FROM slots ORDER BY slot_number"
+            )
+            self._slots = {}
+            self._available = {}
+            self._listings = {}
+            for slot_id, slot_number, slot_type, status, floor, priority in rows:
+                self._slots[slot_id] = [slot_number, slot_type, floor, status, priority]
+                if status == 'Available':
+                    # Rows arrive in slot_number order, so appending keeps buckets sorted
+                    self._available.setdefault((floor, slot_type), []).append((slot_number, slot_id))
+            self.generation += 1
+            self._loaded = True
+
+    def reload(self):
+        """Discard the index; it is rebuilt from the database on next use"""
+        with self._lock:
+            self._loaded = False
+            self._listings = {}
+
+    # Mutations (called after the corresponding write has committed)
+
+    def _insert(self, slot_id):
+        """Index the slot if available; returns the listener arguments when it is"""
+        slot_number, slot_type, floor, status, priority = self._slots[slot_id]
+        if status == 'Available':
+            bisect.insort(self._available.setdefault((floor, slot_type), []), (slot_number, slot_id))
+            return slot_id, slot_number, slot_type, floor, priority
+        return None
+
+    def _notify(self, available):
+        if available:
+            for listener in self.listeners:
+                listener(*available)
+
+    def _discard(self, slot_id):
+        slot_number, slot_type, floor, status, _ = self._slots[slot_id]
+        if status != 'Available':
+            return
+        bucket = self._available.get((floor, slot_type), [])
+        position = bisect.bisect_left(bucket, (slot_number, slot_id))
+        if position < len(bucket) and bucket[position] == (slot_number, slot_id):
+            del bucket[position]
+        if not bucket:
+            self._available.pop((floor, slot_type), None)
+
+    def add(self, slot_id, slot_number, slot_type, floor, status='Available', priority=0):
+        """Track a newly created slot"""
+        with self._lock:
+            if not self._loaded:
+                return
+            if slot_id in self._slots:
+                self._discard(slot_id)
+            self._slots[slot_id] = [slot_number, slot_type, floor, status, priority]
+            available = self._insert(slot_id)
+            self._listings = {}
+        self._notify(available)
+
+    def remove(self, slot_id):
+        """Forget a deleted slot"""
+        with self._lock:
+            if not self._loaded or slot_id not in self._slots:
+                return
+            self._discard(slot_id)
+            del self._slots[slot_id]
+            self._listings = {}
+
+    def update(self, slot_id, slot_number=None, slot_type=None, floor=None, status=None, priority=None):
+        """Apply changed slot attributes"""
+        with self._lock:
+            if not self._loaded or slot_id not in self._slots:
+                return
+            self._discard(slot_id)
+            slot = self._slots[slot_id]
+            for position, value in enumerate((slot_number, slot_type, floor, status, priority)):
+                if value is not None:
+                    slot[position] = value
+            available = self._insert(slot_id)
+            self._listings = {}
+        self._notify(available)
+
+    def set_status(self, slot_id, status):
+        """Record a status flip (Available/Occupied/...)"""
+        self.update(slot_id, status=status)
+
+    # Queries
+
+    def current_generation(self):
+        """Generation of the index as loaded now, reloading it first if it was discarded"""
+        self._ensure_loaded()
+        return self.generation
+
+    def slot(self, slot_id):
+        """(slot_number, slot_type, floor, status, priority) of a slot, or None"""
+        self._ensure_loaded()
+        with self._lock:
+            slot = self._slots.get(slot_id)
+            return tuple(slot) if slot else None
+
+    def priority_entries(self, floor, slot_type):
+        """Available slots of one bucket as (priority, slot_number, slot_id)"""
+        self._ensure_loaded()
+        with self._lock:
+            return [
+                (self._slots[slot_id][4], slot_number, slot_id)
+                for slot_number, slot_id in self._available.get((floor, slot_type), [])
+            ]
+
+    def floors_with(self, slot_type):
+        """Floors with at least one available slot of the given type"""
+        self._ensure_loaded()
+        with self._lock:
+            return sorted(bucket_floor for bucket_floor, bucket_type in self._available if bucket_type == slot_type)
+
+    def available(self, floor=None, slot_type=None):
+        """Available slots as (id, slot_number, slot_type, floor), ordered by slot_number"""
+        self._ensure_loaded()
+        with self._lock:
+            key = (floor, slot_type)
+            cached = self._listings.get(key)
+            if cached is not None:
+                return list(cached)
+
+            buckets = [
+                (bucket_key, entries) for bucket_key, entries in self._available.items()
+                if (floor is None or bucket_key[0] == floor)
+                and (slot_type is None or bucket_key[1] == slot_type)
+            ]
+            merged = heapq.merge(*[
+                [(slot_number, slot_id, bucket_key) for slot_number, slot_id in entries]
+                for bucket_key, entries in buckets
+            ])
+            rows = [
+                (slot_id, slot_number, bucket_key[1], bucket_key[0])
+                for slot_number, slot_id, bucket_key in merged
+            ]
+            self._listings[key] = rows
+            return list(rows)
+
+    def count(self, floor=None, slot_type=None):
+        """Number of available slots matching the filter"""
+        self._ensure_loaded()
+        with self._lock:
+            return sum(
+                len(entries) for (bucket_floor, bucket_type), entries in self._available.items()
+                if (floor is None or bucket_floor == floor)
+                and (slot_type is None or bucket_type == slot_type)
+            )
+
+    def floors(self):
+        """Floors that currently have at least one available slot"""
+        self._ensure_loaded()
+        with self._lock:
+            return sorted({bucket_floor for bucket_floor, _ in self._available})
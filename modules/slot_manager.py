@@ -3,18 +3,29 @@ Parking Slot Management Module
 Handles all parking slot operations (Admin)
 """
 
-from database.db_manager import DatabaseManager
+import json
+import sqlite3
+
+from database.lot_router import LotRouter
+from database.counters import StatsCounters
+from modules.repositories import SlotRepository
+from modules.slot_index import SlotAvailabilityIndex
+from modules.event_bus import EventBus
 from utils.validators import Validator
 
 
-class SlotManager:
-    """Manages parking slot operations"""
+class SlotManager(SlotRepository):
+    """Manages parking slot operations (the SQLite slot repository)"""
     
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db=None, lot=None):
+        self.lot = lot
+        self.db = db or LotRouter.default().database(lot)
+        self.counters = StatsCounters.for_database(self.db)
+        self.index = SlotAvailabilityIndex.for_database(self.db)
+        self.events = EventBus.for_database(self.db)
     
-    def add_slot(self, slot_number, slot_type='Regular', floor=1):
-        """Add new parking slot"""
+    def add_slot(self, slot_number, slot_type='Regular', floor=1, priority=0):
+        """Add new parking slot (lower priority = nearer the entrance, assigned first)"""
         if not Validator.validate_slot_number(slot_number):
             return {'success': False, 'message': 'Invalid slot number format.'}
         
@@ -29,16 +40,87 @@ class SlotManager:
         
         # Insert new slot
         insert_query = """
-            INSERT INTO slots (slot_number, slot_type, status, floor)
-            VALUES (?, ?, 'Available', ?)
+            INSERT INTO slots (slot_number, slot_type, status, floor, priority)
+            VALUES (?, ?, 'Available', ?, ?)
         """
-        success = self.db.execute_query(insert_query, (slot_number, slot_type, floor))
-        
-        if success:
+        slot_id = self.db.execute_insert(insert_query, (slot_number, slot_type, floor, priority))
+        
+        if slot_id:
+            self.index.add(slot_id, slot_number, slot_type, floor, priority=priority)
+            self.events.publish('slot.added', {
+                'slot_id': slot_id,
+                'slot_number': slot_number,
+                'slot_type': slot_type,
+                'floor': floor,
+                'priority': priority,
+                'status': 'Available'
+            }, floor=floor)
             return {'success': True, 'message': f'Slot {slot_number} added successfully.'}
         return {'success': False, 'message': 'Failed to add slot.'}
     
-    def update_slot(self, slot_id, slot_number=None, slot_type=None, floor=None):
+    def add_slots_bulk(self, slots, atomic=False):
+        """Add many parking slots in one transaction.
+        
+        `slots` is a sequence of dicts with slot_number, slot_type (default
+        Regular), floor (default 1) and priority (default 0). Rows are validated up front, existing
+        slot numbers are found with one query, and the rest are inserted with
+        executemany. Returns a per-row error report; with atomic=True nothing
+        is inserted unless every row is valid.
+        """
+        valid, errors = self._validate_slot_rows(slots)
+        
+        added = []
+        if valid and not (atomic and errors):
+            try:
+                with self.db.transaction('add_slots_bulk') as cursor:
+                    # One set-based lookup for every slot number that already exists
+                    numbers = json.dumps([slot_number for _, slot_number, _, _, _ in valid])
+                    cursor.execute(
+                        "SELECT slot_number FROM slots WHERE slot_number IN (SELECT value FROM json_each(?))",
+                        (numbers,)
+                    )
+                    existing = {row[0] for row in cursor.fetchall()}
+                    
+                    new_rows = []
+                    for row_number, slot_number, slot_type, floor, priority in valid:
+                        if slot_number in existing:
+                            errors.append({'row': row_number, 'slot_number': slot_number, 'message': 'Slot number already exists.'})
+                        else:
+                            new_rows.append((slot_number, slot_type, floor, priority))
+                    
+                    if new_rows and not (atomic and errors):
+                        cursor.executemany("""
+                            INSERT INTO slots (slot_number, slot_type, status, floor, priority)
+                            VALUES (?, ?, 'Available', ?, ?)
+                        """, new_rows)
+                        cursor.execute(
+                            "SELECT id, slot_number, slot_type, floor, priority FROM slots "
+                            "WHERE slot_number IN (SELECT value FROM json_each(?))",
+                            (json.dumps([row[0] for row in new_rows]),)
+                        )
+                        added = cursor.fetchall()
+                        self.db.on_commit(lambda: self._announce_bulk(added))
+            except sqlite3.Error as e:
+                print(f"Bulk slot insert error: {e}")
+                return {
+                    'success': False,
+                    'message': 'Failed to add slots.',
+                    'added': 0,
+                    'errors': sorted(errors, key=lambda error: error['row'])
+                }
+        
+        return self._bulk_result(len(added), errors, atomic)
+    
+    def _announce_bulk(self, added):
+        """Index newly imported slots and publish one event per floor"""
+        per_floor = {}
+        for slot_id, slot_number, slot_type, floor, priority in added:
+            self.index.add(slot_id, slot_number, slot_type, floor, priority=priority)
+            per_floor[floor] = per_floor.get(floor, 0) + 1
+        for floor, count in sorted(per_floor.items()):
+            self.events.publish('slot.imported', {'floor': floor, 'count': count}, floor=floor)
+    
+    def update_slot(self, slot_id, slot_number=None, slot_type=None, floor=None, priority=None):
         """Update existing slot"""
         updates = []
         params = []
@@ -57,6 +139,10 @@ class SlotManager:
             updates.append("floor = ?")
             params.append(floor)
         
+        if priority is not None:
+            updates.append("priority = ?")
+            params.append(priority)
+        
         if not updates:
             return {'success': False, 'message': 'No updates provided.'}
         
@@ -66,6 +152,17 @@ class SlotManager:
         success = self.db.execute_query(update_query, tuple(params))
         
         if success:
+            self.index.update(slot_id, slot_number.upper() if slot_number else None, slot_type, floor,
+                              priority=priority)
+            slot = self.get_slot_by_id(slot_id)
+            if slot:
+                self.events.publish('slot.updated', {
+                    'slot_id': slot[0],
+                    'slot_number': slot[1],
+                    'slot_type': slot[2],
+                    'status': slot[3],
+                    'floor': slot[4]
+                }, floor=slot[4])
             return {'success': True, 'message': 'Slot updated successfully.'}
         return {'success': False, 'message': 'Failed to update slot.'}
     
@@ -78,52 +175,52 @@ class SlotManager:
         if result and result[0] > 0:
             return {'success': False, 'message': 'Cannot delete slot with active bookings.'}
         
+        slot = self.get_slot_by_id(slot_id)
+        
         delete_query = "DELETE FROM slots WHERE id = ?"
         success = self.db.execute_query(delete_query, (slot_id,))
         
         if success:
+            self.index.remove(slot_id)
+            if slot:
+                self.events.publish('slot.deleted', {
+                    'slot_id': slot_id,
+                    'slot_number': slot[1],
+                    'floor': slot[4]
+                }, floor=slot[4])
             return {'success': True, 'message': 'Slot deleted successfully.'}
         return {'success': False, 'message': 'Failed to delete slot.'}
     
     def get_all_slots(self):
         """Get all parking slots"""
-        query = "SELECT id, slot_number, slot_type, status, floor, created_at FROM slots ORDER BY slot_number"
+        query = "SELECT id, slot_number, slot_type, status, floor, created_at, priority FROM slots ORDER BY slot_number"
         return self.db.fetch_all(query)
     
-    def get_available_slots(self):
-        """Get all available parking slots"""
-        query = """
-            SELECT id, slot_number, slot_type, floor 
-            FROM slots 
-            WHERE status = 'Available' 
-            ORDER BY slot_number
-        """
-        return self.db.fetch_all(query)
+    def get_available_slots(self, floor=None, slot_type=None):
+        """Get available parking slots, optionally for one floor and/or slot type"""
+        return self.index.available(floor, slot_type)
+    
+    def get_available_floors(self):
+        """Get floors that have at least one available slot"""
+        return self.index.floors()
     
     def get_slot_by_id(self, slot_id):
         """Get slot details by ID"""
         query = "SELECT id, slot_number, slot_type, status, floor FROM slots WHERE id = ?"
         return self.db.fetch_one(query, (slot_id,))
     
-    def get_slot_statistics(self):
-        """Get parking slot statistics"""
-        total_query = "SELECT COUNT(*) FROM slots"
-        available_query = "SELECT COUNT(*) FROM slots WHERE status = 'Available'"
-        occupied_query = "SELECT COUNT(*) FROM slots WHERE status = 'Occupied'"
-        
-        total = self.db.fetch_one(total_query)[0]
-        available = self.db.fetch_one(available_query)[0]
-        occupied = self.db.fetch_one(occupied_query)[0]
-        
-        return {
-            'total': total,
-            'available': available,
-            'occupied': occupied,
-            'occupancy_rate': round((occupied / total * 100) if total > 0 else 0, 2)
-        }
-    
     def update_slot_status(self, slot_id, status):
         """Update slot status (Available/Occupied)"""
         update_query = "UPDATE slots SET status = ? WHERE id = ?"
         success = self.db.execute_query(update_query, (status, slot_id))
+        if success:
+            self.index.set_status(slot_id, status)
+            slot = self.get_slot_by_id(slot_id)
+            if slot:
+                self.events.publish('slot.status', {
+                    'slot_id': slot_id,
+                    'slot_number': slot[1],
+                    'floor': slot[4],
+                    'status': status
+                }, floor=slot[4])
         return success
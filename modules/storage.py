@@ -0,0 +1,79 @@
+"""
+Storage Module
+Selects the storage backend and hands out its user, slot and booking repositories
+"""
+
+from config import Config
+from database.lot_router import LotRouter, UnknownLot
+from database.memory_store import MemoryStore
+from modules.authentication import Authentication
+from modules.slot_manager import SlotManager
+from modules.booking_manager import BookingManager
+from modules.memory_repositories import MemoryUserRepository, MemorySlotRepository, MemoryBookingRepository
+
+
+class Storage:
+    """The repositories of one storage backend, for every configured lot.
+
+    'sqlite' routes each lot to its shard through LotRouter and hands out
+    Authentication, SlotManager and BookingManager. 'memory' keeps each lot in
+    its own MemoryStore (users and admins in one more) behind the Memory*
+    repositories: no file I/O at all and nothing kept after the process
+    exits. Features built on SQL (reports, archive, billing reconciliation,
+    the query profiler) exist only on 'sqlite'; check `has_sql`.
+    """
+
+    BACKENDS = ('sqlite', 'memory')
+
+    def __init__(self, backend=None, router=None):
+        self.backend = backend or Config.STORAGE_BACKEND
+        if self.backend not in self.BACKENDS:
+            raise ValueError(f"Unknown storage backend {self.backend!r}; use one of: {', '.join(self.BACKENDS)}")
+
+        if self.backend == 'sqlite':
+            self.router = router or LotRouter.default()
+            self.lots, self.default_lot = self.router.lots, self.router.default_lot
+            self.users_db = self.router.users_db
+            self.users = Authentication(self.users_db)
+        else:
+            self.router = None
+            self.lots, self.default_lot = LotRouter.configured()
+            self._stores = {lot: MemoryStore(lot) for lot in self.lots}
+            self.users_db = MemoryStore('users')
+            self.users = MemoryUserRepository(self.users_db)
+
+    @property
+    def has_sql(self):
+        """True when the lots live in SQLite databases"""
+        return self.router is not None
+
+    def lot_ids(self):
+        """Configured lot ids, default lot first"""
+        return [self.default_lot] + [lot for lot in self.lots if lot != self.default_lot]
+
+    def resolve(self, lot=None):
+        """The lot id to use for `lot` (None means the default lot)"""
+        lot = lot or self.default_lot
+        if lot not in self.lots:
+            raise UnknownLot(lot)
+        return lot
+
+    def database(self, lot=None):
+        """A lot's DatabaseManager or MemoryStore (what its event bus and caches hang off)"""
+        if self.router:
+            return self.router.database(lot)
+        return self._stores[self.resolve(lot)]
+
+    def slots(self, lot=None):
+        """A slot repository for a lot"""
+        lot = self.resolve(lot)
+        if self.router:
+            return SlotManager(self.database(lot), lot=lot)
+        return MemorySlotRepository(self.database(lot), lot=lot)
+
+    def bookings(self, lot=None):
+        """A booking repository for a lot"""
+        lot = self.resolve(lot)
+        if self.router:
+            return BookingManager(self.database(lot), lot=lot)
+        return MemoryBookingRepository(self.database(lot), lot=lot, users=self.users_db)
@@ -0,0 +1,43 @@
+"""
+User Cache Module
+Per-user profile and current booking cache shared by all managers
+"""
+
+from config import Config
+from utils.cache import LRUCache
+
+
+class UserCache(LRUCache):
+    """LRU cache of per-user lookups keyed by (kind, user_id).
+
+    Kinds are 'profile', 'active' (current active booking) and 'scheduled'
+    (upcoming bookings). Writers invalidate a user's entries after commit;
+    a write committed by another process, found by db.sync(), clears it all.
+    """
+
+    KINDS = ('profile', 'active', 'scheduled')
+
+    def __init__(self, db=None, max_size=None):
+        super().__init__(max_size or Config.USER_CACHE_SIZE)
+        self.db = db
+        if db is not None:
+            db.on_external_write(self.clear)
+
+    @classmethod
+    def for_database(cls, db):
+        """Return the shared cache for a database"""
+        return db.shared('user_cache', cls)
+
+    def get_or_load(self, key, loader):
+        """Return the cached value, after catching up with other processes' writes"""
+        if self.db is not None:
+            self.db.sync()
+        return super().get_or_load(key, loader)
+
+    def invalidate_user(self, user_id, kinds=KINDS):
+        """Drop cached entries for one user"""
+        self.invalidate(*[(kind, user_id) for kind in kinds])
+
+    def invalidate_bookings(self, user_id):
+        """Drop a user's cached active and scheduled bookings"""
+        self.invalidate_user(user_id, ('active', 'scheduled'))
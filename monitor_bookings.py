@@ -1,52 +1,76 @@
 """
 Monitor for new bookings
+Follows the server's /api/stream event feed instead of polling the database
 """
-import sqlite3
-import time
-
-conn = sqlite3.connect('smart_parking.db')
-cursor = conn.cursor()
-
-print("Monitoring for new bookings... (checking every 2 seconds)")
-print("Press Ctrl+C to stop")
-print("=" * 80)
-
-last_count = 0
-cursor.execute("SELECT COUNT(*) FROM bookings")
-last_count = cursor.fetchone()[0]
-
-try:
-    while True:
-        cursor.execute("SELECT COUNT(*) FROM bookings")
-        current_count = cursor.fetchone()[0]
-        
-        if current_count > last_count:
-            print(f"\n🆕 NEW BOOKING DETECTED! (Total: {current_count})")
-            
-            # Get the latest booking
-            cursor.execute("""
-                SELECT b.id, u.username, s.slot_number, b.vehicle_number, 
-                       b.status, b.booking_time
-                FROM bookings b
-                JOIN users u ON b.user_id = u.id
-                JOIN slots s ON b.slot_id = s.id
-                ORDER BY b.id DESC
-                LIMIT 1
-            """)
-            booking = cursor.fetchone()
-            
-            print(f"   ID: {booking[0]}")
-            print(f"   User: {booking[1]}")
-            print(f"   Slot: {booking[2]}")
-            print(f"   Vehicle: {booking[3]}")
-            print(f"   Status: {booking[4]}")
-            print(f"   Time: {booking[5]}")
-            print("=" * 80)
-            
-            last_count = current_count
-        
-        time.sleep(2)
-        
-except KeyboardInterrupt:
-    print("\n\nMonitoring stopped.")
-    conn.close()
+import argparse
+import http.cookiejar
+import json
+import urllib.parse
+import urllib.request
+
+
+def open_stream(base_url, username, password, floor=None):
+    """Log in as admin and open the server-sent events stream"""
+    jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+
+    login_data = urllib.parse.urlencode({
+        'username': username,
+        'password': password,
+        'role': 'admin'
+    }).encode()
+    opener.open(f"{base_url}/login", login_data)
+
+    stream_url = f"{base_url}/api/stream"
+    if floor is not None:
+        stream_url += f"?floor={floor}"
+    return opener.open(stream_url)
+
+
+def read_events(response):
+    """Yield (event_type, data) pairs from an SSE response"""
+    event_type, data_lines = None, []
+    for raw_line in response:
+        line = raw_line.decode('utf-8').rstrip('\n')
+        if not line:
+            if data_lines:
+                yield event_type, json.loads('\n'.join(data_lines))
+            event_type, data_lines = None, []
+        elif line.startswith('event:'):
+            event_type = line[6:].strip()
+        elif line.startswith('data:'):
+            data_lines.append(line[5:].strip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch live booking and slot events")
+    parser.add_argument('--url', default='http://localhost:5000', help='Server base URL')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--floor', type=int, help='Only follow one floor')
+    args = parser.parse_args()
+
+    print("Monitoring live booking events... (server push, no polling)")
+    print("Press Ctrl+C to stop")
+    print("=" * 80)
+
+    try:
+        response = open_stream(args.url, args.username, args.password, args.floor)
+        for event_type, data in read_events(response):
+            if event_type and event_type.startswith('booking.'):
+                print(f"\n🆕 BOOKING EVENT: {event_type}")
+                print(f"   ID: {data.get('booking_id')}")
+                print(f"   User ID: {data.get('user_id')}")
+                print(f"   Slot: {data.get('slot_number')}")
+                if data.get('vehicle_number'):
+                    print(f"   Vehicle: {data['vehicle_number']}")
+                print(f"   Time: {data.get('booking_time') or data.get('checkout_time')}")
+                print("=" * 80)
+            elif event_type == 'slot.status':
+                print(f"🅿️  Slot {data['slot_number']} (floor {data['floor']}) is now {data['status']}")
+    except KeyboardInterrupt:
+        print("\n\nMonitoring stopped.")
+
+
+if __name__ == '__main__':
+    main()
@@ -14,60 +14,25 @@ def populate_demo_slots():
     print("🅿️  POPULATING DEMO PARKING SLOTS")
     print("=" * 60)
     
-    # Floor 1 - Regular slots
-    regular_slots_f1 = ['A1', 'A2', 'A3', 'A4', 'A5', 'B1', 'B2', 'B3', 'B4', 'B5']
-    
-    print("\nAdding Floor 1 - Regular Slots...")
-    for slot in regular_slots_f1:
-        result = slot_manager.add_slot(slot, 'Regular', 1)
-        if result['success']:
-            print(f"  ✓ Added slot {slot}")
-        else:
-            print(f"  ✗ Failed: {slot} - {result['message']}")
-    
-    # Floor 1 - VIP slots
-    vip_slots_f1 = ['VIP1', 'VIP2', 'VIP3']
-    
-    print("\nAdding Floor 1 - VIP Slots...")
-    for slot in vip_slots_f1:
-        result = slot_manager.add_slot(slot, 'VIP', 1)
-        if result['success']:
-            print(f"  ✓ Added slot {slot}")
-        else:
-            print(f"  ✗ Failed: {slot} - {result['message']}")
-    
-    # Floor 1 - Handicapped slots
-    handicapped_slots = ['H1', 'H2']
-    
-    print("\nAdding Floor 1 - Handicapped Slots...")
-    for slot in handicapped_slots:
-        result = slot_manager.add_slot(slot, 'Handicapped', 1)
-        if result['success']:
-            print(f"  ✓ Added slot {slot}")
-        else:
-            print(f"  ✗ Failed: {slot} - {result['message']}")
-    
-    # Floor 2 - Regular slots
-    regular_slots_f2 = ['C1', 'C2', 'C3', 'C4', 'C5', 'D1', 'D2', 'D3', 'D4', 'D5']
-    
-    print("\nAdding Floor 2 - Regular Slots...")
-    for slot in regular_slots_f2:
-        result = slot_manager.add_slot(slot, 'Regular', 2)
-        if result['success']:
-            print(f"  ✓ Added slot {slot}")
-        else:
-            print(f"  ✗ Failed: {slot} - {result['message']}")
-    
-    # Floor 2 - EV Charging slots
-    ev_slots = ['EV1', 'EV2', 'EV3']
-    
-    print("\nAdding Floor 2 - EV Charging Slots...")
-    for slot in ev_slots:
-        result = slot_manager.add_slot(slot, 'EV Charging', 2)
-        if result['success']:
-            print(f"  ✓ Added slot {slot}")
-        else:
-            print(f"  ✗ Failed: {slot} - {result['message']}")
+    groups = [
+        ("Floor 1 - Regular", ['A1', 'A2', 'A3', 'A4', 'A5', 'B1', 'B2', 'B3', 'B4', 'B5'], 'Regular', 1),
+        ("Floor 1 - VIP", ['VIP1', 'VIP2', 'VIP3'], 'VIP', 1),
+        ("Floor 1 - Handicapped", ['H1', 'H2'], 'Handicapped', 1),
+        ("Floor 2 - Regular", ['C1', 'C2', 'C3', 'C4', 'C5', 'D1', 'D2', 'D3', 'D4', 'D5'], 'Regular', 2),
+        ("Floor 2 - EV Charging", ['EV1', 'EV2', 'EV3'], 'EV Charging', 2),
+    ]
+    
+    slots = []
+    for label, numbers, slot_type, floor in groups:
+        print(f"  {label}: {', '.join(numbers)}")
+        slots.extend({'slot_number': number, 'slot_type': slot_type, 'floor': floor} for number in numbers)
+    
+    # One validated, transactional insert for the whole layout
+    print("\nAdding slots...")
+    result = slot_manager.add_slots_bulk(slots)
+    print(f"  {'✓' if result['success'] else '✗'} {result['message']}")
+    for error in result['errors']:
+        print(f"  ✗ Failed: {error['slot_number']} - {error['message']}")
     
     # Get statistics
     stats = slot_manager.get_slot_statistics()
@@ -0,0 +1,40 @@
+"""
+Settle active bookings
+Checks out every active booking matching the filters in one transaction and
+prints the settlement report. Run it from cron to close out the lot at night;
+a running app notices the commit through its write epoch check (DB_SYNC_SECONDS)
+and reloads its slot index, counters and caches.
+"""
+import argparse
+
+from modules.booking_manager import BookingManager
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check out matching active bookings in one transaction')
+    parser.add_argument('--floor', type=int, default=None,
+                        help='only settle bookings on this floor')
+    parser.add_argument('--overstayed', action='store_true',
+                        help='only settle bookings that ran past their package duration')
+    parser.add_argument('--older-than-hours', type=float, default=None,
+                        help='only settle bookings that started at least this many hours ago')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='print the report without checking anything out')
+    parser.add_argument('--lot', default=None,
+                        help='parking lot to settle (default: the default lot)')
+    args = parser.parse_args()
+
+    booking_manager = BookingManager(lot=args.lot)
+    result = booking_manager.settle_bookings(floor=args.floor, overstayed=args.overstayed,
+                                             older_than_hours=args.older_than_hours, dry_run=args.dry_run)
+    if not result['success']:
+        print(result['message'])
+        return
+    print(f"{result['message']} Total: ₹{result['total_cost']:.2f} for {result['total_hours']} hour(s), "
+          f"{result['overstayed']} overstayed")
+    for floor in result['by_floor']:
+        print(f"  Floor {floor['floor']}: {floor['bookings']} booking(s), ₹{floor['revenue']:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""
+Admin route tests
+Serves the web app from a scratch SQLite lot and checks what the admin
+booking and slot pages render and return.
+"""
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from config import Config
+from database.connection_pool import ConnectionPool
+from database.lot_router import LotRouter
+from modules.storage import Storage
+from utils.helpers import Helper
+
+
+class AdminRoutesTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        # app.py opens its database at import time
+        with mock.patch.object(Config, 'DATABASE_NAME', os.path.join(cls.tmpdir, 'app.db')), \
+                mock.patch.object(Config, 'SCHEDULER_ENABLED', False):
+            import app
+        cls.web = app
+        cls.previous = app.storage
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.web.init_storage(cls.previous)
+        shutil.rmtree(cls.tmpdir, ignore_errors=True)
+
+    def setUp(self):
+        self.path = os.path.join(self.tmpdir, f'{self._testMethodName}.db')
+        with mock.patch.object(Config, 'SCHEDULER_ENABLED', False):
+            self.web.init_storage(Storage('sqlite', router=LotRouter(lots={'main': self.path})))
+        self.storage = self.web.storage
+        self.slots, self.bookings = self.storage.slots(), self.storage.bookings()
+        self.db = self.storage.database()
+        for i in range(4):
+            self.storage.users.register_user(f'driver{i}', 'secret1', f'driver{i}@example.com',
+                                             f'98765432{i:02d}', f'KA01AB{i:04d}')
+        self.client = self.web.app.test_client()
+        with self.client.session_transaction() as session:
+            session['user_id'] = 1
+            session['role'] = 'admin'
+
+    def tearDown(self):
+        ConnectionPool.discard(self.path)
+
+    def test_active_view_shows_parking_duration(self):
+        self.slots.add_slot('A1', 'Regular', 1)
+        self.bookings.book_slot(1, None, 'KA01AB0000')
+        started = (datetime.now() - timedelta(hours=2, minutes=5)).strftime("%Y-%m-%d %H:%M:%S")
+        with self.db.transaction() as cursor:
+            cursor.execute("UPDATE bookings SET booking_time = ?", (started,))
+
+        html = self.client.get('/admin/bookings?filter=active').get_data(as_text=True)
+
+        self.assertRegex(re.findall(r'badge bg-info">([^<]*)<', html)[0], r'^2h 5m( \d+s)?$')
+
+    def seed_bookings(self):
+        """Insert 24 bookings in shuffled id order: ties of three on each booking_time,
+        and every seventh one with a booking_time that leaves booking_ts NULL"""
+        self.slots.add_slot('A1', 'Regular', 1)
+        self.slots.add_slot('A2', 'Regular', 1)
+        self.slots.add_slot('B1', 'Regular', 2)
+        floors = {1: 1, 2: 1, 3: 2}
+        seeded = []
+        with self.db.transaction() as cursor:
+            for n in range(24):
+                i = n * 5 % 24
+                booking_time = ('legacy' if i % 7 == 0 else
+                                f"2026-03-{1 + i // 8:02d} {10 + i % 8 // 3:02d}:00:00")
+                slot_id = 1 + i % 3
+                status = ('Active', 'Completed', 'Cancelled')[i % 3]
+                cursor.execute("""
+                    INSERT INTO bookings (user_id, slot_id, vehicle_number, booking_time, status)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (1 + i % 4, slot_id, f'KA01AB{i:04d}', booking_time, status))
+                seeded.append({'id': cursor.lastrowid, 'booking_time': booking_time,
+                               'ts': Helper.to_epoch(booking_time), 'status': status, 'floor': floors[slot_id]})
+        return seeded
+
+    @staticmethod
+    def expected_ids(seeded, status=None, date_from=None, date_to=None, floor=None):
+        """Booking ids a listing should return, newest first with NULL booking_ts last"""
+        rows = [
+            row for row in seeded
+            if (status is None or row['status'] == status)
+            and (floor is None or row['floor'] == floor)
+            and (date_from is None or (row['ts'] is not None and row['booking_time'][:10] >= date_from))
+            and (date_to is None or (row['ts'] is not None and row['booking_time'][:10] <= date_to))
+        ]
+        rows.sort(key=lambda row: (row['ts'] is not None, row['ts'] or 0, row['id']), reverse=True)
+        return [row['id'] for row in rows]
+
+    def page_through(self, view, limit, **filters):
+        rows, cursor = [], None
+        for _ in range(100):
+            page = self.bookings.get_bookings_page(view=view, limit=limit, cursor=cursor, **filters)
+            rows += page['bookings']
+            cursor = page['next_cursor']
+            if cursor is None:
+                return rows
+        self.fail('paging did not finish')
+
+    def test_keyset_pages_match_the_unpaged_listing(self):
+        seeded = self.seed_bookings()
+        self.assertEqual(self.db.fetch_one("SELECT COUNT(*) FROM bookings WHERE booking_ts IS NULL")[0], 4)
+
+        for filters in ({}, {'status': 'Completed'}, {'floor': 1},
+                        {'date_from': '2026-03-02', 'date_to': '2026-03-02'},
+                        {'status': 'Active', 'floor': 2, 'date_from': '2026-03-02'}):
+            unpaged = self.bookings.get_all_bookings(**filters)
+            self.assertEqual([row[0] for row in unpaged], self.expected_ids(seeded, **filters), filters)
+            for limit in (1, 3, 4, 50):
+                with self.subTest(filters=filters, limit=limit):
+                    self.assertEqual(self.page_through('all', limit, **filters), unpaged)
+
+        for filters in ({}, {'floor': 1}):
+            unpaged = self.bookings.get_active_bookings(**filters)
+            self.assertEqual([row[0] for row in unpaged], self.expected_ids(seeded, 'Active', **filters))
+            for limit in (1, 2, 3):
+                with self.subTest(view='active', filters=filters, limit=limit):
+                    self.assertEqual(self.page_through('active', limit, **filters), unpaged)
+
+    def test_bookings_api_pages_with_next_cursor(self):
+        seeded = self.seed_bookings()
+
+        for query, expected in (('floor=1', self.expected_ids(seeded, floor=1)),
+                                ('view=active', self.expected_ids(seeded, 'Active'))):
+            ids, cursor = [], ''
+            for _ in range(100):
+                response = self.client.get(f'/api/admin/bookings?{query}&limit=3{cursor}')
+                body = response.get_json()
+                self.assertEqual((response.status_code, body['success']), (200, True))
+                self.assertLessEqual(len(body['bookings']), 3)
+                ids += [booking['id'] for booking in body['bookings']]
+                if body['next_cursor'] is None:
+                    break
+                cursor = f"&cursor={body['next_cursor']}"
+            self.assertEqual(ids, expected, query)
+
+        active = self.client.get('/api/admin/bookings?view=active&limit=1').get_json()['bookings'][0]
+        self.assertEqual(set(active), {'id', 'username', 'phone', 'slot_number', 'vehicle_number', 'booking_time'})
+
+    def test_bookings_api_rejects_bad_filters(self):
+        for query in ('floor=x', 'from=03/01/2026'):
+            response = self.client.get(f'/api/admin/bookings?{query}')
+            self.assertEqual(response.status_code, 400, query)
+            self.assertFalse(response.get_json()['success'])
+        self.assertEqual(self.client.get('/api/admin/bookings?floor=x').get_json()['message'], 'Invalid floor.')
+
+    def slot_rows(self):
+        return self.db.fetch_all("SELECT slot_number, slot_type, floor, priority FROM slots ORDER BY slot_number")
+
+    def test_bulk_import_reports_each_rejected_row(self):
+        self.slots.add_slot('A1', 'Regular', 1)
+
+        result = self.slots.add_slots_bulk([
+            {'slot_number': 'A2', 'floor': 1, 'priority': 2},
+            {'slot_number': 'bad slot!'},
+            {'slot_number': 'a2', 'floor': 3},
+            {'slot_number': 'A1'},
+            {'slot_number': 'B1', 'slot_type': 'VIP', 'floor': 2},
+        ])
+
+        self.assertEqual((result['success'], result['added']), (True, 2))
+        self.assertEqual(result['message'], '2 slot(s) added, 3 row(s) rejected.')
+        self.assertEqual([(error['row'], error['slot_number'], error['message']) for error in result['errors']], [
+            (2, 'bad slot!', 'Invalid slot number format.'),
+            (3, 'A2', 'Duplicate slot number in import.'),
+            (4, 'A1', 'Slot number already exists.'),
+        ])
+        self.assertEqual(self.slot_rows(), [('A1', 'Regular', 1, 0), ('A2', 'Regular', 1, 2), ('B1', 'VIP', 2, 0)])
+
+    def test_atomic_bulk_import_adds_nothing_on_any_error(self):
+        self.slots.add_slot('A1', 'Regular', 1)
+
+        # An existing slot is only found inside the transaction; the valid rows must not stay behind
+        for rejected in ({'slot_number': 'A1'}, {'slot_number': 'C1', 'floor': 'x'}):
+            result = self.slots.add_slots_bulk([{'slot_number': 'A2'}, rejected, {'slot_number': 'B1', 'floor': 2}],
+                                               atomic=True)
+            self.assertEqual((result['success'], result['added'], len(result['errors'])), (False, 0, 1), rejected)
+            self.assertTrue(result['message'].endswith('(nothing was imported).'))
+            self.assertEqual(self.slot_rows(), [('A1', 'Regular', 1, 0)])
+
+        self.assertTrue(self.slots.add_slots_bulk([{'slot_number': 'A2'}], atomic=True)['success'])
+        self.assertEqual(len(self.slot_rows()), 2)
+
+    def test_slot_import_api_reads_json_and_csv_bodies(self):
+        response = self.client.post('/api/admin/slots/import', json={'slots': [
+            {'slot_number': 'A1', 'floor': 1}, {'slot_number': 'A2', 'slot_type': 'EV Charging', 'floor': '1', 'priority': '3'}
+        ]})
+        self.assertEqual((response.status_code, response.get_json()['added']), (200, 2))
+
+        # CSV header names are trimmed and case-insensitive
+        csv_body = "Slot_Number, Slot_Type ,floor,priority\nb1,VIP,2,1\nB2,,2,\nA1,Regular,1,0\n"
+        response = self.client.post('/api/admin/slots/import', data=csv_body, content_type='text/csv')
+        body = response.get_json()
+        self.assertEqual((response.status_code, body['added']), (200, 2))
+        self.assertEqual([(error['row'], error['message']) for error in body['errors']],
+                         [(3, 'Slot number already exists.')])
+
+        self.assertEqual(self.slot_rows(), [('A1', 'Regular', 1, 0), ('A2', 'EV Charging', 1, 3),
+                                            ('B1', 'VIP', 2, 1), ('B2', 'Regular', 2, 0)])
+
+        for data, content_type, message in (
+            ('{"slots": ', 'application/json', 'Invalid JSON document.'),
+            ('{"rows": []}', 'application/json', 'JSON must be a list of slots or {"slots": [...]}.'),
+            ('number,floor\nC1,3\n', 'text/csv', 'CSV needs a header row with a slot_number column.'),
+        ):
+            response = self.client.post('/api/admin/slots/import', data=data, content_type=content_type)
+            self.assertEqual((response.status_code, response.get_json()['message']), (400, message))
+
+        response = self.client.post('/api/admin/slots/import?atomic=1', json=[{'slot_number': 'C1', 'floor': 3},
+                                                                              {'slot_number': 'B2'}])
+        self.assertEqual((response.status_code, response.get_json()['added']), (422, 0))
+        self.assertEqual(len(self.slot_rows()), 4)
+
+    def test_slot_import_form_reads_uploaded_files(self):
+        def upload(content, filename, atomic='0'):
+            response = self.client.post('/admin/slots/import', content_type='multipart/form-data',
+                                        data={'file': (io.BytesIO(content), filename), 'atomic': atomic})
+            self.assertEqual(response.status_code, 302)
+            with self.client.session_transaction() as session:
+                return session.pop('_flashes', [])
+
+        # Spreadsheet exports often start with a BOM
+        flashes = upload('\ufeffslot_number,slot_type,floor\nA1,Regular,1\nA2,Disabled,1\n'.encode('utf-8'),
+                         'slots.CSV')
+        self.assertEqual(flashes, [('success', '1 slot(s) added, 1 row(s) rejected.'),
+                                   ('warning', 'Row 2 (A2): Unknown slot type Disabled.')])
+
+        flashes = upload(json.dumps([{'slot_number': 'B1', 'floor': 2}]).encode(), 'slots.json')
+        self.assertEqual(flashes, [('success', '1 slot(s) added.')])
+
+        flashes = upload(b'slot_number,floor\nC1,3\nB1,2\n', 'more.csv', atomic='1')
+        self.assertEqual(flashes[0], ('danger', '0 slot(s) added, 1 row(s) rejected (nothing was imported).'))
+        self.assertEqual(self.slot_rows(), [('A1', 'Regular', 1, 0), ('B1', 'Regular', 2, 0)])
+
+        self.assertEqual(upload(b'[{', 'bad.json'), [('danger', 'Invalid JSON document.')])
+
+
+if __name__ == '__main__':
+    unittest.main()
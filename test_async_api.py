@@ -0,0 +1,180 @@
+"""
+Async API server tests
+Drives the ASGI application directly: the async views must answer exactly as
+the Flask routes do, and every other route must still reach Flask.
+"""
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from config import Config
+from database.async_db import AsyncDatabase
+from database.connection_pool import ConnectionPool
+
+
+class AsyncApiTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        # app.py opens its database at import time
+        with mock.patch.object(Config, 'DATABASE_NAME', os.path.join(cls.tmpdir, 'async.db')), \
+                mock.patch.object(Config, 'SCHEDULER_ENABLED', False):
+            import app
+            import asgi
+        cls.web = app
+        cls.asgi = asgi
+        cls.server = asgi.ApiServer(app.app, AsyncDatabase(workers=2))
+
+        app.slot_manager.add_slot('F1', 'Regular', 1)
+        app.slot_manager.add_slot('F2', 'VIP', 1)
+        app.auth.register_user('asyncuser', 'secret1', 'async@example.com', '9876543210', 'KA01AB1234')
+        cls.user_id = app.auth.user_login('asyncuser', 'secret1')['user_id']
+        app.booking_manager.book_slot(cls.user_id, app.slot_manager.get_available_slots()[0][0], 'KA01AB1234')
+
+    @classmethod
+    def tearDownClass(cls):
+        ConnectionPool.discard(cls.web.db.db_path)
+        shutil.rmtree(cls.tmpdir, ignore_errors=True)
+
+    def flask_client(self, user_id, role):
+        client = self.web.app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = user_id
+            session['role'] = role
+        return client
+
+    def call(self, path, client=None):
+        """Run one GET through the ASGI app; returns (status, headers, body)"""
+        headers = []
+        if client is not None:
+            headers.append((b'cookie', f"session={client.get_cookie('session').value}".encode()))
+        scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'headers': headers}
+        sent = []
+
+        async def run():
+            connected = asyncio.Event()
+            messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                await connected.wait()
+
+            async def send(message):
+                sent.append(message)
+
+            await self.server(scope, receive, send)
+
+        asyncio.run(run())
+        start = sent[0]
+        return start['status'], dict(start['headers']), b''.join(m.get('body', b'') for m in sent[1:])
+
+    def test_async_views_match_flask_routes(self):
+        client = self.flask_client(self.user_id, 'user')
+        admin = self.flask_client(1, 'admin')
+
+        for path, session_client in [('/api/booking/active', client), ('/api/slots/floor/1', client),
+                                     ('/api/stats', admin)]:
+            status, headers, body = self.call(path, session_client)
+            self.assertEqual(status, 200, path)
+            self.assertEqual(headers[b'content-type'], b'application/json')
+            self.assertEqual(json.loads(body), session_client.get(path).get_json(), path)
+
+    def test_async_views_require_login(self):
+        status, headers, _ = self.call('/api/booking/active')
+        self.assertEqual((status, headers[b'location']), (302, b'/login'))
+        status, _, _ = self.call('/api/stats', self.flask_client(self.user_id, 'user'))
+        self.assertEqual(status, 302)
+
+    def test_html_routes_reach_flask(self):
+        status, headers, body = self.call('/login')
+        self.assertEqual(status, 200)
+        self.assertIn(b'<form', body)
+
+    @staticmethod
+    def open_request(server, path, query=b'', cookie=None):
+        """Start one GET on the ASGI app; returns (task, sent messages, event that disconnects the client)"""
+        headers = [(b'cookie', f"session={cookie}".encode())] if cookie else []
+        scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query, 'headers': headers}
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+        sent, gone = [], asyncio.Event()
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await gone.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        return asyncio.ensure_future(server(scope, receive, send)), sent, gone
+
+    def test_open_streams_leave_html_routes_responsive(self):
+        server = self.asgi.ApiServer(self.web.app, AsyncDatabase(workers=1), wsgi_workers=2)
+        cookie = self.flask_client(self.user_id, 'user').get_cookie('session').value
+        bus = self.web.lots[self.web.storage.default_lot].event_bus
+
+        async def run():
+            streams = [self.open_request(server, '/api/stream', b'floor=1', cookie) for _ in range(4)]
+            await asyncio.sleep(0.2)
+
+            started = time.perf_counter()
+            task, sent, _ = self.open_request(server, '/login')
+            await asyncio.wait_for(task, timeout=5)
+            elapsed = time.perf_counter() - started
+
+            bus.publish('slot.status', {'slot_id': 1, 'slot_number': 'F1', 'floor': 1, 'status': 'Available'},
+                        floor=1)
+            await asyncio.sleep(0.2)
+            for stream_task, _, gone in streams:
+                gone.set()
+            await asyncio.wait_for(asyncio.gather(*[stream_task for stream_task, _, _ in streams]), timeout=5)
+            return sent, elapsed, [b''.join(m.get('body', b'') for m in stream_sent) for _, stream_sent, _ in streams]
+
+        sent, elapsed, bodies = asyncio.run(run())
+        server.wsgi_executor.shutdown(wait=False)
+        server.database.close()
+
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertLess(elapsed, 2)
+        for body in bodies:
+            self.assertTrue(body.startswith(b'retry: 3000'))
+            self.assertIn(b'event: slot.status', body)
+        self.assertEqual(bus.subscriber_count(), 0)
+
+    def test_stream_needs_a_floor_unless_admin(self):
+        status, _, body = self.call('/api/stream', self.flask_client(self.user_id, 'user'))
+        self.assertEqual((status, json.loads(body)['success']), (400, False))
+        status, headers, _ = self.call('/api/stream')
+        self.assertEqual((status, headers[b'location']), (302, b'/login'))
+
+    def test_concurrent_identical_calls_share_one_query(self):
+        database = AsyncDatabase(workers=4)
+        calls = []
+        lock = threading.Lock()
+
+        def load():
+            with lock:
+                calls.append(1)
+            time.sleep(0.05)
+            return 'slots'
+
+        async def run():
+            return await asyncio.gather(*[database.call(('floor_slots', 1), load) for _ in range(50)])
+
+        self.assertEqual(asyncio.run(run()), ['slots'] * 50)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(database.stats()['shared'], 49)
+        database.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Batch billing tests
+Checks that BillingEngine reproduces the scalar Helper / checkout cost path
+exactly, row for row.
+"""
+import itertools
+import random
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from utils.billing import BillingEngine, np
+from utils.helpers import Helper
+
+
+def scalar_checkout_cost(duration, package_cost, expected_duration):
+    """The checkout rule as BookingManager.cancel_booking originally wrote it"""
+    package_cost = package_cost if package_cost else 50.0
+    expected_duration = expected_duration if expected_duration else 1.0
+    hourly_cost = Helper.calculate_cost(duration)
+    actual_cost = max(package_cost, hourly_cost) if duration > expected_duration else package_cost
+    return round(actual_cost, 2)
+
+
+class BillingEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(7)
+        base = datetime(2025, 1, 1)
+        self.now = datetime(2025, 6, 1, 12, 0, 0)
+        self.starts, self.ends, self.packages, self.expected = [], [], [], []
+        for _ in range(5000):
+            start = base + timedelta(seconds=rng.randint(0, 60 * 60 * 24 * 120))
+            self.starts.append(start.strftime("%Y-%m-%d %H:%M:%S"))
+            self.ends.append((start + timedelta(seconds=rng.randint(0, 60 * 60 * 200))).strftime("%Y-%m-%d %H:%M:%S"))
+            package, hours = rng.choice([(50, 1), (500, 24), (1500, 168), (None, None), (0, 0)])
+            self.packages.append(package)
+            self.expected.append(hours)
+        # Odd inputs the scalar path tolerates
+        self.starts += ['not a time', None, '2025-1-5 1:2:3', '2025-01-05T10:00:00']
+        self.ends += ['2025-01-05 12:00:00', '2025-01-05 12:00:00', '2025-01-05 12:00:00', None]
+        self.packages += [50, 50, 50, 50]
+        self.expected += [1, 1, 1, 1]
+
+    def test_durations_match_scalar(self):
+        now_str = self.now.strftime("%Y-%m-%d %H:%M:%S")
+        expected = [Helper.calculate_duration(start, end or now_str) for start, end in zip(self.starts, self.ends)]
+        self.assertEqual(BillingEngine.durations(self.starts, self.ends, now=self.now), expected)
+
+    def test_costs_match_scalar(self):
+        result = BillingEngine.bill(self.starts, self.ends, self.packages, self.expected, now=self.now)
+        expected = [
+            scalar_checkout_cost(duration, package, hours)
+            for duration, package, hours in zip(result['durations'], self.packages, self.expected)
+        ]
+        self.assertEqual(result['costs'], expected)
+        self.assertEqual(result['total'], round(sum(expected), 2))
+
+
+
+@unittest.skipUnless(np, 'NumPy is not installed')
+class NumpyFallbackParityTest(unittest.TestCase):
+    """The NumPy path and the pure-Python fallback give identical results"""
+
+    def both(self, method, *args, **kwargs):
+        """(NumPy result, fallback result) of one BillingEngine call"""
+        vectorized = method(*args, **kwargs)
+        with mock.patch('utils.billing.np', None):
+            fallback = method(*args, **kwargs)
+        return vectorized, fallback
+
+    def test_epoch_durations_on_rounding_ties(self):
+        # Every 18 seconds is 0.005 hours, so odd multiples land on a rounding tie
+        starts = [0, None, 100, 3600] + [1000] * 800
+        ends = [-18, 100, None, 3654] + [1000 + 9 * k for k in range(800)]
+        vectorized, fallback = self.both(BillingEngine.epoch_durations, starts, ends)
+        self.assertEqual(vectorized, fallback)
+
+    def test_checkout_costs_on_rounding_ties(self):
+        durations = [0.5, 0.99, 1.0, 1.005, 1.01, 2.675, 24.0, 24.01, 168.5] + [k / 100 for k in range(0, 4000, 7)]
+        packages = list(itertools.islice(itertools.cycle([50, 2.675, 0.125, None, 0, 1.005, 500]), len(durations)))
+        expected = list(itertools.islice(itertools.cycle([1, 0.5, None, 0, 24, 168]), len(durations)))
+        for rate in (50, 33.3, 0.125, 2.675):
+            vectorized, fallback = self.both(BillingEngine.checkout_costs, durations, packages, expected,
+                                             rate_per_hour=rate)
+            self.assertEqual(vectorized, fallback, f'rate {rate}')
+
+    def test_bill_totals_match(self):
+        rng = random.Random(11)
+        now = datetime(2025, 6, 1, 12, 0, 0)
+        starts, ends = [], []
+        for _ in range(3000):
+            start = now - timedelta(seconds=rng.randint(0, 60 * 60 * 300))
+            starts.append(start.strftime("%Y-%m-%d %H:%M:%S"))
+            # Open bookings run until now; the rest last a multiple of 18 s (0.005 h) half the time
+            seconds = rng.choice([rng.randint(0, 60 * 60 * 200), 18 * rng.randint(0, 10000)])
+            ends.append(None if rng.random() < 0.2 else (start + timedelta(seconds=seconds)).strftime("%Y-%m-%d %H:%M:%S"))
+        packages = [rng.choice([50, 500, 1500, None]) for _ in starts]
+        expected = [rng.choice([1, 24, 168, None]) for _ in starts]
+        vectorized, fallback = self.both(BillingEngine.bill, starts, ends, packages, expected, now=now)
+        self.assertEqual(vectorized, fallback)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,578 @@
+"""
+Booking engine tests
+Checks that booking and checkout run as single transactions and that
+concurrent bookings for the same slot never double-book it.
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from config import Config
+from database.connection_pool import ConnectionPool
+from database.db_manager import DatabaseManager
+from database.lot_router import LotRouter, UnknownLot, parse_lots
+from modules.authentication import Authentication
+from modules.booking_manager import BookingManager
+from modules.booking_scheduler import BookingScheduler
+from modules.overstay_monitor import OverstayMonitor
+from modules.reports import ReportManager
+from modules.booking_archiver import BookingArchiver
+from modules.response_cache import ResponseCache
+from modules.slot_manager import SlotManager
+
+
+class EngineTestCase(unittest.TestCase):
+    """Scratch database with eight registered drivers and one slot"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db = DatabaseManager(os.path.join(self.tmpdir, 'engine.db'), pool_size=8)
+        self.auth = Authentication(self.db)
+        self.slots = SlotManager(self.db)
+        self.bookings = BookingManager(self.db)
+        for i in range(8):
+            self.auth.register_user(f'driver{i}', 'secret1', f'driver{i}@example.com',
+                                    f'98765432{i:02d}', f'KA01AB{i:04d}')
+        self.slots.add_slot('A1', 'Regular', 1)
+        self.slot_id = self.slots.get_all_slots()[0][0]
+
+    def tearDown(self):
+        ConnectionPool.discard(self.db.db_path)
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+class BookingEngineTest(EngineTestCase):
+
+    def test_concurrent_bookings_claim_slot_once(self):
+        results = []
+        start = threading.Barrier(8)
+
+        def attempt(user_id):
+            start.wait()
+            results.append(self.bookings.book_slot(user_id, self.slot_id, f'KA01AB{user_id - 1:04d}'))
+
+        threads = [threading.Thread(target=attempt, args=(user_id,)) for user_id in range(1, 9)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sum(1 for r in results if r['success']), 1)
+        self.assertEqual(self.slots.get_slot_by_id(self.slot_id)[3], 'Occupied')
+        active = self.db.fetch_one("SELECT COUNT(*) FROM bookings WHERE slot_id = ? AND status = 'Active'",
+                                   (self.slot_id,))
+        self.assertEqual(active[0], 1)
+
+    def test_checkout_commits_booking_and_slot_together(self):
+        self.assertTrue(self.bookings.book_slot(1, self.slot_id, 'KA01AB0000')['success'])
+        booking_id = self.bookings.get_active_booking(1)[0]
+
+        result = self.bookings.cancel_booking(booking_id, 1)
+
+        self.assertTrue(result['success'])
+        self.assertEqual(self.slots.get_slot_by_id(self.slot_id)[3], 'Available')
+        self.assertFalse(self.bookings.cancel_booking(booking_id, 1)['success'])
+
+    def test_rejected_booking_leaves_no_writes(self):
+        self.assertTrue(self.bookings.book_slot(1, self.slot_id, 'KA01AB0000')['success'])
+        self.slots.add_slot('A2', 'Regular', 1)
+        other_slot = self.slots.get_available_slots()[0][0]
+
+        result = self.bookings.book_slot(1, other_slot, 'KA01AB0000')
+
+        self.assertFalse(result['success'])
+        self.assertEqual(self.slots.get_slot_by_id(other_slot)[3], 'Available')
+        self.assertEqual(self.bookings.get_booking_statistics()['total'], 1)
+
+    def test_cached_active_booking_follows_writes(self):
+        self.assertIsNone(self.bookings.get_active_booking(1))
+        self.assertTrue(self.bookings.book_slot(1, self.slot_id, 'KA01AB0000')['success'])
+        booking_id = self.bookings.get_active_booking(1)[0]
+        self.assertEqual(self.bookings.get_active_booking(1)[0], booking_id)
+
+        self.bookings.cancel_booking(booking_id, 1)
+
+        self.assertIsNone(self.bookings.get_active_booking(1))
+        self.assertGreater(self.bookings.cache.stats()['hits'], 0)
+
+    def test_epoch_columns_follow_string_writes(self):
+        with self.db.transaction() as cursor:
+            cursor.execute("""
+                INSERT INTO bookings (user_id, slot_id, vehicle_number, booking_time, status)
+                VALUES (1, ?, 'KA01AB0000', '2025-03-01 10:00:00', 'Completed')
+            """, (self.slot_id,))
+            booking_id = cursor.lastrowid
+            cursor.execute("UPDATE bookings SET checkout_time = '2025-03-01 12:30:00' WHERE id = ?", (booking_id,))
+
+        booking_ts, checkout_ts = self.db.fetch_one(
+            "SELECT booking_ts, checkout_ts FROM bookings WHERE id = ?", (booking_id,))
+        self.assertEqual(checkout_ts - booking_ts, 9000)
+        page = self.bookings.get_bookings_page(date_from='2025-03-01', date_to='2025-03-01')
+        self.assertEqual([row[0] for row in page['bookings']], [booking_id])
+
+    def test_archived_bookings_stay_visible_in_history(self):
+        self.assertTrue(self.bookings.book_slot(1, self.slot_id, 'KA01AB0000')['success'])
+        booking_id = self.bookings.get_active_booking(1)[0]
+        self.bookings.cancel_booking(booking_id, 1)
+        stats = self.bookings.get_booking_statistics()
+
+        result = BookingArchiver(self.db, older_than_days=1).run(now=datetime.now() + timedelta(days=2))
+
+        self.assertEqual(result['archived'], 1)
+        self.assertEqual(self.bookings.get_user_bookings(1), [])
+        self.assertEqual([row[0] for row in self.bookings.get_user_bookings(1, include_history=True)], [booking_id])
+        self.assertEqual(self.bookings.get_booking_statistics(), stats)
+
+    def test_query_metrics_render_as_prometheus_text(self):
+        self.assertTrue(self.bookings.book_slot(1, self.slot_id, 'KA01AB0000')['success'])
+        self.bookings.get_active_booking(1)
+        self.db.fetch_all("SELECT * FROM no_such_table")
+
+        text = self.db.metrics.render()
+
+        self.assertIn('smart_parking_db_query_duration_seconds_count{query="book_slot"} 1', text)
+        self.assertIn('smart_parking_db_query_rows_total{query="active_booking"} 1', text)
+        self.assertIn('smart_parking_db_query_errors_total{query="select no_such_table"} 1', text)
+        self.assertIn('smart_parking_db_query_duration_seconds_bucket{query="book_slot",le="+Inf"} 1', text)
+
+    def test_profiler_logs_slow_statements_with_plan(self):
+        profiler = self.db.profiler
+        profiler.slow_ms = 0
+        profiler.log_path = os.path.join(self.tmpdir, 'slow.log')
+        profiler.enable()
+
+        self.assertTrue(self.bookings.book_slot(1, self.slot_id, 'KA01AB0000')['success'])
+        self.bookings.get_active_booking(1)
+
+        top = {entry['sql']: entry for entry in profiler.top(100)}
+        claim = top['UPDATE slots SET status = ? WHERE id = ? AND status = ?']
+        self.assertEqual((claim['calls'], claim['rows'], claim['param_shapes']), (1, 1, ['(int)']))
+        with open(profiler.log_path) as log:
+            slow = [json.loads(line) for line in log]
+        active = [entry for entry in slow if 'b.status = ?' in entry['sql'] and 'b.user_id = ?' in entry['sql']]
+        self.assertEqual(active[0]['rows'], 1)
+        self.assertTrue(any('INDEX' in step for step in active[0]['plan']))
+
+    def test_response_cache_expires_on_write(self):
+        cache = ResponseCache(self.db, max_age=60)
+        load = lambda: self.bookings.get_booking_statistics()['active']
+
+        self.assertEqual(cache.get_or_load('stats', load), 0)
+        self.assertEqual(cache.get_or_load('stats', load), 0)
+        self.assertTrue(self.bookings.book_slot(1, self.slot_id, 'KA01AB0000')['success'])
+        self.assertEqual(cache.get_or_load('stats', load), 1)
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['stale']), (1, 2, 1))
+
+
+class AutoAssignTest(EngineTestCase):
+    """Auto-assigned bookings get the nearest free slot and never collide"""
+
+    def setUp(self):
+        super().setUp()
+        self.slots.update_slot(self.slot_id, priority=5)
+        self.slots.add_slots_bulk([
+            {'slot_number': 'A2', 'floor': 1, 'priority': 1},
+            {'slot_number': 'B1', 'floor': 2, 'priority': 0},
+            {'slot_number': 'B2', 'floor': 2, 'priority': 3},
+            {'slot_number': 'V1', 'slot_type': 'VIP', 'floor': 1},
+        ])
+
+    def test_assigns_by_priority_and_floor_preference(self):
+        first = self.bookings.book_slot(1, None, 'KA01AB0000', floor=1)
+        second = self.bookings.book_slot(2, None, 'KA01AB0001')
+        third = self.bookings.book_slot(3, None, 'KA01AB0002', floor=1)
+
+        self.assertEqual([first['slot_number'], second['slot_number'], third['slot_number']], ['A2', 'B1', 'A1'])
+        # Floor 1 is full now, so the preference falls back to the best slot elsewhere
+        self.assertEqual(self.bookings.book_slot(4, None, 'KA01AB0003', floor=1)['slot_number'], 'B2')
+        self.assertFalse(self.bookings.book_slot(5, None, 'KA01AB0004')['success'])
+
+        self.bookings.cancel_booking(self.bookings.get_active_booking(2)[0], 2)
+        self.assertEqual(self.bookings.book_slot(5, None, 'KA01AB0004', floor=1)['slot_number'], 'B1')
+        self.assertEqual(self.bookings.book_slot(6, None, 'KA01AB0005', slot_type='VIP')['slot_number'], 'V1')
+
+    def test_rejected_booking_returns_slot_to_queue(self):
+        self.assertTrue(self.bookings.book_slot(1, None, 'KA01AB0000')['success'])
+        self.assertFalse(self.bookings.book_slot(1, None, 'KA01AB0000')['success'])
+        self.assertEqual(self.bookings.book_slot(2, None, 'KA01AB0001')['slot_number'], 'A2')
+        self.assertEqual(self.bookings.allocator.reserved(), 0)
+
+    def test_concurrent_auto_assign_never_collides(self):
+        results = []
+        start = threading.Barrier(8)
+
+        def attempt(user_id):
+            start.wait()
+            results.append(self.bookings.book_slot(user_id, None, f'KA01AB{user_id - 1:04d}'))
+
+        threads = [threading.Thread(target=attempt, args=(user_id,)) for user_id in range(1, 9)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        booked = sorted(r['slot_number'] for r in results if r['success'])
+        self.assertEqual(booked, ['A1', 'A2', 'B1', 'B2'])
+        self.assertEqual(self.bookings.allocator.reserved(), 0)
+
+
+class SlotIndexTest(EngineTestCase):
+    """The availability index follows slot and booking writes without reloading"""
+
+    def assert_index_matches_table(self, step):
+        index = self.slots.index
+        rows = self.db.fetch_all(
+            "SELECT id, slot_number, slot_type, floor FROM slots WHERE status = 'Available' ORDER BY slot_number"
+        )
+        for floor in (None, 1, 2, 3):
+            for slot_type in (None,) + SlotManager.SLOT_TYPES:
+                expected = [row for row in rows
+                            if (floor is None or row[3] == floor) and (slot_type is None or row[2] == slot_type)]
+                # Every listing is memoised here, so a stale memo shows up after the next step
+                self.assertEqual(index.available(floor, slot_type), expected, (step, floor, slot_type))
+                self.assertEqual(index.count(floor, slot_type), len(expected), (step, floor, slot_type))
+
+    def slot_id_of(self, slot_number):
+        return self.db.fetch_one("SELECT id FROM slots WHERE slot_number = ?", (slot_number,))[0]
+
+    def test_listings_follow_every_write(self):
+        self.assert_index_matches_table('loaded')
+        generation = self.slots.index.current_generation()
+
+        steps = [
+            ('add A2', lambda: self.slots.add_slot('A2', 'Regular', 1)),
+            ('add B1', lambda: self.slots.add_slot('B1', 'VIP', 2)),
+            ('bulk add', lambda: self.slots.add_slots_bulk([{'slot_number': 'B2', 'slot_type': 'EV Charging',
+                                                            'floor': 2}, {'slot_number': 'C1', 'floor': 3}])),
+            ('move A2 to floor 2', lambda: self.slots.update_slot(self.slot_id_of('A2'), floor=2)),
+            ('retype B1', lambda: self.slots.update_slot(self.slot_id_of('B1'), slot_type='Regular')),
+            ('renumber and move A2', lambda: self.slots.update_slot(self.slot_id_of('A2'), slot_number='c0',
+                                                                    slot_type='VIP', floor=3)),
+            ('book B1', lambda: self.bookings.book_slot(1, self.slot_id_of('B1'), 'KA01AB0000')),
+            # An occupied slot that moves must come back on its new floor
+            ('move occupied B1', lambda: self.slots.update_slot(self.slot_id_of('B1'), floor=3)),
+            ('auto-assign on floor 3', lambda: self.bookings.book_slot(2, None, 'KA01AB0001', floor=3)),
+            ('delete B2', lambda: self.slots.delete_slot(self.slot_id_of('B2'))),
+            ('cancel B1', lambda: self.bookings.cancel_booking(self.bookings.get_active_booking(1)[0], 1)),
+            ('cancel auto-assigned', lambda: self.bookings.cancel_booking(self.bookings.get_active_booking(2)[0], 2)),
+            ('delete A1', lambda: self.slots.delete_slot(self.slot_id)),
+        ]
+        for step, write in steps:
+            self.assertTrue(write()['success'], step)
+            self.assert_index_matches_table(step)
+
+        # Nothing above went through a reload, which would hide a missed update
+        self.assertEqual(self.slots.index.current_generation(), generation)
+        self.assertIs(self.bookings.slot_index, self.slots.index)
+
+
+class FleetBookingTest(EngineTestCase):
+    """Fleet bookings claim many slots in one transaction and check out together"""
+
+    def setUp(self):
+        super().setUp()
+        self.slots.add_slots_bulk([
+            {'slot_number': 'A2', 'floor': 1, 'priority': 1},
+            {'slot_number': 'B1', 'floor': 2},
+        ])
+
+    def test_atomic_fleet_books_all_or_nothing(self):
+        result = self.bookings.book_fleet(1, ['KA01FL0001', 'KA01FL0002', 'KA01FL0003', 'KA01FL0004'])
+        self.assertFalse(result['success'])
+        self.assertEqual(result['booked'], [])
+        self.assertEqual(result['errors'][0]['row'], 4)
+        self.assertEqual(len(self.slots.get_available_slots()), 3)
+        self.assertEqual(self.bookings.allocator.reserved(), 0)
+
+        result = self.bookings.book_fleet(1, ['ka01fl0001', 'KA01FL0002', 'KA01FL0003'], floor=2)
+        self.assertTrue(result['success'])
+        self.assertEqual([b['slot_number'] for b in result['booked']], ['B1', 'A1', 'A2'])
+        self.assertEqual(self.slots.get_available_slots(), [])
+        self.assertEqual(len(self.bookings.get_user_bookings(1, status='Active')), 3)
+
+    def test_best_effort_fleet_skips_rejected_vehicles(self):
+        self.bookings.book_slot(2, None, 'KA01FL0002')
+        result = self.bookings.book_fleet(1, ['KA01FL0001', 'KA01FL0002', 'KA01FL0001', 'bad!', 'KA01FL0003',
+                                              'KA01FL0004'], atomic=False)
+        self.assertTrue(result['success'])
+        self.assertEqual([b['vehicle_number'] for b in result['booked']], ['KA01FL0001', 'KA01FL0003'])
+        self.assertEqual([e['row'] for e in result['errors']], [2, 3, 4, 6])
+
+    def test_fleet_checkout_bills_every_booking(self):
+        booked = self.bookings.book_fleet(1, ['KA01FL0001', 'KA01FL0002'], package='half_day')['booked']
+        with self.db.transaction() as cursor:
+            cursor.execute("UPDATE bookings SET booking_ts = booking_ts - 8 * 3600 WHERE id = ?",
+                           (booked[0]['booking_id'],))
+
+        result = self.bookings.checkout_fleet(1, [b['booking_id'] for b in booked] + [999])
+        self.assertTrue(result['success'])
+        self.assertEqual([b['actual_cost'] for b in result['checked_out']], [400.0, 250.0])
+        self.assertEqual(result['total_cost'], 650.0)
+        self.assertEqual(result['errors'], [{'booking_id': 999, 'message': 'Booking not found or already cancelled.'}])
+        self.assertEqual(len(self.slots.get_available_slots()), 3)
+        self.assertEqual(self.bookings.checkout_fleet(1)['checked_out'], [])
+
+
+class SettlementTest(EngineTestCase):
+    """End-of-day settlement completes matching active bookings in one pass"""
+
+    def setUp(self):
+        super().setUp()
+        self.slots.add_slots_bulk([{'slot_number': 'A2', 'floor': 1}, {'slot_number': 'B1', 'floor': 2}])
+        for user_id in (1, 2, 3):
+            self.bookings.book_slot(user_id, None, f'KA01AB{user_id - 1:04d}')
+        # Driver 1 parked 3 hours on an hourly package, driver 2 ten minutes ago
+        with self.db.transaction() as cursor:
+            cursor.execute("UPDATE bookings SET booking_ts = booking_ts - 3 * 3600 WHERE user_id = 1")
+            cursor.execute("UPDATE bookings SET booking_ts = booking_ts - 600 WHERE user_id = 2")
+
+    def test_filters_and_dry_run(self):
+        preview = self.bookings.settle_bookings(overstayed=True, dry_run=True)
+        self.assertEqual((preview['settled'], preview['total_cost']), (1, 150.0))
+        self.assertEqual(self.bookings.settle_bookings(older_than_hours=0.1, floor=2, dry_run=True)['settled'], 0)
+        self.assertEqual(len(self.bookings.get_active_bookings()), 3)
+
+    def test_settles_everything_in_one_transaction(self):
+        report = self.bookings.settle_bookings()
+        self.assertEqual(report['settled'], 3)
+        self.assertEqual(report['overstayed'], 1)
+        self.assertEqual(report['total_cost'], 250.0)
+        self.assertEqual(report['by_floor'], [{'floor': 1, 'bookings': 2, 'revenue': 200.0},
+                                              {'floor': 2, 'bookings': 1, 'revenue': 50.0}])
+        self.assertEqual(self.bookings.get_active_bookings(), [])
+        self.assertEqual(len(self.slots.get_available_slots()), 3)
+        self.assertIsNone(self.bookings.get_active_booking(1))
+        self.assertEqual(self.bookings.get_booking_statistics()['completed'], 3)
+
+
+class ExternalWriteTest(EngineTestCase):
+    """Writes committed by another process (the CLIs) reach this process's mirrors"""
+
+    def setUp(self):
+        patcher = mock.patch.object(Config, 'DB_SYNC_SECONDS', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+        self.slots.add_slot('A2', 'Regular', 1)
+        for user_id in (1, 2):
+            self.bookings.book_slot(user_id, None, f'KA01AB{user_id - 1:04d}')
+
+    def run_script(self, *args):
+        root = os.path.dirname(os.path.abspath(__file__))
+        result = subprocess.run([sys.executable, os.path.join(root, args[0]), *args[1:]], cwd=root,
+                                env=dict(os.environ, SMART_PARKING_DB=self.db.db_path),
+                                capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_settlement_by_cli_frees_slots_here(self):
+        self.assertFalse(self.bookings.book_slot(3, None, 'KA01AB0002')['success'])
+        self.assertIsNotNone(self.bookings.get_active_booking(1))
+        self.assertEqual(self.slots.get_slot_statistics()['occupied'], 2)
+
+        self.run_script('settle_bookings.py')
+
+        self.assertIsNone(self.bookings.get_active_booking(1))
+        self.assertEqual(self.slots.get_slot_statistics()['occupied'], 0)
+        self.assertEqual(self.slots.count_available_slots(), 2)
+        self.assertTrue(self.bookings.book_slot(3, None, 'KA01AB0002')['success'])
+
+    def test_cached_responses_drop_after_cli_write(self):
+        cache = ResponseCache(self.db, max_age=3600)
+        load = lambda: self.bookings.get_booking_statistics()['active']
+        self.assertEqual(cache.get_or_load('stats', load), 2)
+
+        self.run_script('settle_bookings.py')
+
+        self.assertEqual(cache.get_or_load('stats', load), 0)
+        self.assertEqual(cache.stale, 1)
+
+    def test_archive_by_cli_refreshes_cached_listings(self):
+        for user_id in (1, 2):
+            self.bookings.cancel_booking(self.bookings.get_active_booking(user_id)[0], user_id)
+        with self.db.transaction() as cursor:
+            cursor.execute("UPDATE bookings SET booking_ts = booking_ts - 86400, checkout_ts = checkout_ts - 86400")
+        cache = ResponseCache(self.db, max_age=3600)
+        load = lambda: len(self.bookings.get_all_bookings())
+        self.assertEqual(cache.get_or_load('bookings', load), 2)
+
+        self.run_script('archive_bookings.py', '--older-than-days', '0.5')
+
+        self.assertEqual(cache.get_or_load('bookings', load), 0)
+        self.assertEqual(self.bookings.get_booking_statistics()['completed'], 2)
+
+    def test_own_commits_keep_the_index(self):
+        generation = self.bookings.slot_index.current_generation()
+        self.bookings.cancel_booking(self.bookings.get_active_booking(1)[0], 1)
+        self.assertEqual(self.bookings.slot_index.current_generation(), generation)
+
+
+class OverstayTest(EngineTestCase):
+    """Overstays are found from the stored expected end, not by scanning active bookings"""
+
+    def setUp(self):
+        super().setUp()
+        self.slots.add_slots_bulk([{'slot_number': 'A2', 'floor': 1}, {'slot_number': 'B1', 'floor': 2}])
+        self.bookings.book_slot(1, None, 'KA01AB0000')
+        self.bookings.book_slot(2, None, 'KA01AB0001', package='half_day')
+        self.bookings.book_slot(3, None, 'KA01AB0002')
+        # Driver 1 is 2 hours past an hourly package; driver 2 is within the 6-hour one
+        with self.db.transaction() as cursor:
+            cursor.execute("UPDATE bookings SET booking_ts = booking_ts - 3 * 3600 WHERE user_id IN (1, 2)")
+
+    def test_expected_end_follows_booking_ts(self):
+        rows = self.db.fetch_all("SELECT booking_ts, expected_duration, expected_end_ts FROM bookings ORDER BY id")
+        self.assertEqual([end - start for start, _, end in rows], [3600, 6 * 3600, 3600])
+
+    def test_overstays_carry_live_overage(self):
+        overstays = self.bookings.get_overstays()
+        self.assertEqual([o['booking_id'] for o in overstays], [1])
+        self.assertEqual((overstays[0]['overdue_minutes'], overstays[0]['current_cost'], overstays[0]['overage']),
+                         (120, 150.0, 100.0))
+        self.assertEqual(self.bookings.get_overstays(floor=2), [])
+
+    def test_sweep_announces_each_overstay_once(self):
+        monitor = OverstayMonitor(self.bookings, interval_seconds=0)
+        announced = []
+        monitor.events.listen(['booking.overstayed'], announced.append)
+
+        self.assertEqual(len(monitor.sweep()), 1)
+        self.assertEqual(monitor.sweep(), [])
+        self.assertEqual(len(monitor.sweep(now=datetime.now() + timedelta(hours=4))), 2)
+        self.assertEqual([event['data']['booking_id'] for event in announced], [1, 3, 2])
+
+
+class LotShardingTest(unittest.TestCase):
+    """Each lot books in its own database; users are shared through a read-only attachment"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.router = LotRouter(lots=parse_lots(f"north={self.tmpdir}/north.db,south={self.tmpdir}/south.db"),
+                                users_name=os.path.join(self.tmpdir, 'users.db'))
+        Authentication(self.router.users_db).register_user('driver0', 'secret1', 'driver0@example.com',
+                                                           '9876543200', 'KA01AB0000')
+        self.lots = {}
+        for lot in self.router.lot_ids():
+            db = self.router.database(lot)
+            SlotManager(db, lot=lot).add_slot('A1', 'Regular', 1)
+            self.lots[lot] = BookingManager(db, lot=lot)
+
+    def tearDown(self):
+        for path in {self.router.database(lot).db_path for lot in self.lots} | {self.router.users_db.db_path}:
+            ConnectionPool.discard(path)
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_lots_are_independent_shards(self):
+        north, south = self.lots['north'], self.lots['south']
+        self.assertEqual(self.router.lot_ids(), ['north', 'south'])
+        self.assertTrue(north.book_slot(1, None, 'KA01AB0000')['success'])
+        # The one-active-booking rule is per lot
+        self.assertTrue(south.book_slot(1, None, 'KA01AB0000')['success'])
+        self.assertEqual(north.get_all_bookings()[0][1], 'driver0')
+        self.assertEqual(north.get_booking_statistics()['active'], 1)
+        self.assertFalse(north.db.execute_query("UPDATE users SET phone = '0'"))
+        self.assertRaises(UnknownLot, self.router.database, 'east')
+        self.assertRaises(ValueError, parse_lots, 'north')
+
+    def test_busy_lot_does_not_block_another(self):
+        with self.lots['north'].db.transaction() as cursor:
+            cursor.execute("UPDATE slots SET floor = 2")
+            started = time.perf_counter()
+            self.assertTrue(self.lots['south'].book_slot(1, None, 'KA01AB0000')['success'])
+            self.assertLess(time.perf_counter() - started, 1)
+
+
+class BookingSchedulerTest(EngineTestCase):
+    """Scheduled bookings are activated on time and expired as no-shows"""
+
+    def add_scheduled(self, user_id, start):
+        booking_time = start.strftime("%Y-%m-%d %H:%M:%S")
+        with self.db.transaction() as cursor:
+            cursor.execute("""
+                INSERT INTO bookings (user_id, slot_id, vehicle_number, booking_time, status)
+                VALUES (?, ?, ?, ?, 'Scheduled')
+            """, (user_id, self.slot_id, f'KA01AB{user_id - 1:04d}', booking_time))
+            return cursor.lastrowid, booking_time
+
+    def status_of(self, booking_id):
+        return self.db.fetch_one("SELECT status FROM bookings WHERE id = ?", (booking_id,))[0]
+
+    def test_activates_when_due(self):
+        scheduler = BookingScheduler(self.bookings, grace_minutes=1, retry_seconds=1)
+        booking_id, booking_time = self.add_scheduled(1, datetime.now() + timedelta(seconds=1))
+        scheduler.start()
+        try:
+            deadline = time.time() + 5
+            while self.status_of(booking_id) == 'Scheduled' and time.time() < deadline:
+                time.sleep(0.1)
+        finally:
+            scheduler.stop()
+
+        self.assertEqual(self.status_of(booking_id), 'Active')
+        self.assertEqual(self.slots.get_slot_by_id(self.slot_id)[3], 'Occupied')
+        self.assertEqual(self.slots.count_available_slots(), 0)
+
+    def test_restart_queues_each_booking_once(self):
+        scheduler = BookingScheduler(self.bookings)
+        self.add_scheduled(1, datetime.now() + timedelta(hours=1))
+        scheduler.start()
+        scheduler.stop()
+        scheduler.start()
+        try:
+            self.assertEqual(scheduler.pending_count(), 1)
+        finally:
+            scheduler.stop()
+
+    def test_waits_for_slot_then_expires_no_show(self):
+        scheduler = BookingScheduler(self.bookings, grace_minutes=10, retry_seconds=60)
+        self.assertTrue(self.bookings.book_slot(2, self.slot_id, 'KA01AB0001')['success'])
+        start = datetime.now().replace(microsecond=0) - timedelta(minutes=5)
+        booking_id, booking_time = self.add_scheduled(1, start)
+        entry = [(start.timestamp(), booking_id, booking_time)]
+
+        result = scheduler.run_batch(entry)
+        self.assertEqual(result['waiting'], [(booking_id, booking_time)])
+        self.assertEqual(self.status_of(booking_id), 'Scheduled')
+
+        result = scheduler.run_batch(entry, now=start + timedelta(minutes=11))
+        self.assertEqual(result['expired'], [booking_id])
+        self.assertEqual(self.status_of(booking_id), 'Cancelled')
+
+
+class RollupTest(EngineTestCase):
+    """Checkout folds each stay into the hourly and daily rollups"""
+
+    def test_checkout_updates_rollups(self):
+        self.assertTrue(self.bookings.book_slot(1, self.slot_id, 'KA01AB0000')['success'])
+        booking_id = self.bookings.get_active_booking(1)[0]
+        # Back-date the stay so it spans three clock hours
+        start = (datetime.now() - timedelta(hours=2, minutes=30)).strftime("%Y-%m-%d %H:%M:%S")
+        self.db.execute_query("UPDATE bookings SET booking_time = ? WHERE id = ?", (start, booking_id))
+        self.bookings.cancel_booking(booking_id, 1)
+
+        booking_ts, checkout_ts, cost = self.db.fetch_one(
+            "SELECT booking_ts, checkout_ts, actual_cost FROM bookings WHERE id = ?", (booking_id,))
+        today = datetime.now().strftime("%Y-%m-%d")
+        day = ReportManager(self.db).get_report(today, today, group_by=['floor', 'package_type'])
+        hours = ReportManager(self.db).get_report(start[:10], today, granularity='hour')
+
+        self.assertEqual(len(day['rows']), 1)
+        self.assertEqual(day['rows'][0]['floor'], 1)
+        self.assertEqual(day['totals']['bookings'], 1)
+        self.assertEqual(day['totals']['revenue'], cost)
+        self.assertEqual(sum(r['bookings'] for r in hours['rows']), 1)
+        self.assertAlmostEqual(sum(r['occupied_slot_hours'] for r in hours['rows']),
+                               (checkout_ts - booking_ts) / 3600, places=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
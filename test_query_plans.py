@@ -0,0 +1,141 @@
+"""
+Query plan regression tests
+Runs every BookingManager/SlotManager operation against a scratch database,
+captures the SQL it issues and asserts via EXPLAIN QUERY PLAN that none of it
+falls back to a full table scan.
+"""
+import os
+import re
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from database.connection_pool import ConnectionPool
+from database.db_manager import DatabaseManager
+from database.migrations import SchemaMigrator
+from modules.authentication import Authentication
+from modules.booking_manager import BookingManager
+from modules.slot_manager import SlotManager
+from modules.reports import ReportManager
+from modules.booking_archiver import BookingArchiver
+
+# Tables that are tiny by design and may be read in full
+SCAN_ALLOWED = {'stats_counters', 'schema_version'}
+
+BARE_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+class QueryPlanTest(unittest.TestCase):
+    """Every statement issued by the managers must be index-driven"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        db_path = os.path.join(self.tmpdir, 'plans.db')
+        # A single pooled connection lets one trace callback see every statement
+        self.db = DatabaseManager(db_path, pool_size=1)
+        self.auth = Authentication(self.db)
+        self.slots = SlotManager(self.db)
+        self.bookings = BookingManager(self.db)
+
+        self.auth.register_user('planuser', 'secret1', 'plan@example.com', '9876543210', 'KA01AB1234')
+        self.auth.register_user('planuser2', 'secret2', 'plan2@example.com', '9876543211', 'KA01AB5678')
+        for number, slot_type, floor in [('A1', 'Regular', 1), ('A2', 'VIP', 1), ('B1', 'Regular', 2)]:
+            self.slots.add_slot(number, slot_type, floor)
+
+        self.statements = []
+        with self.db.pool.connection() as conn:
+            conn.set_trace_callback(self.statements.append)
+
+    def tearDown(self):
+        with self.db.pool.connection() as conn:
+            conn.set_trace_callback(None)
+        ConnectionPool.discard(self.db.db_path)
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def exercise_managers(self):
+        """Call every public read/write path once"""
+        slot_id = self.slots.get_available_slots()[0][0]
+        later = datetime.now() + timedelta(days=1)
+
+        self.bookings.book_slot(1, slot_id, 'KA01AB1234')
+        self.bookings.book_slot(2, 3, 'KA01AB5678',
+                                booking_date=later.strftime("%Y-%m-%d"),
+                                booking_time=later.strftime("%H:%M"))
+        active = self.bookings.get_active_booking(1)
+        self.bookings.get_user_bookings(1)
+        self.bookings.get_user_bookings(1, status='Active')
+        self.bookings.get_all_bookings()
+        self.bookings.get_active_bookings()
+        page = self.bookings.get_bookings_page(limit=1)
+        self.bookings.get_bookings_page(limit=1, cursor=page['next_cursor'], status='Scheduled',
+                                        date_from='2020-01-01', date_to='2099-12-31')
+        self.bookings.get_bookings_page(limit=1, cursor=page['next_cursor'])
+        self.bookings.get_bookings_page(limit=1, cursor=self.bookings.encode_cursor(None, 10))
+        self.bookings.get_bookings_page(view='active', limit=1, floor=1)
+        self.bookings.get_scheduled_bookings()
+        self.bookings.get_scheduled_bookings(2)
+        self.bookings.get_booking_statistics()
+        self.bookings.reconcile_billing('2020-01-01', '2099-12-31')
+        self.bookings.cancel_booking(active[0], 1)
+        self.bookings.book_slot(1, None, 'KA01AB1234', slot_type='Regular', floor=2)
+        self.bookings.cancel_booking(self.bookings.get_active_booking(1)[0], 1)
+        fleet = self.bookings.book_fleet(1, ['KA01FL0001', 'KA01FL0002'], atomic=False)
+        self.bookings.checkout_fleet(1, [booking['booking_id'] for booking in fleet['booked']])
+        self.bookings.checkout_fleet(1)
+        self.bookings.book_slot(1, None, 'KA01AB1234')
+        self.bookings.settle_bookings(floor=1, overstayed=True, older_than_hours=1, dry_run=True)
+        self.bookings.get_overstays(floor=1, limit=10)
+        self.bookings.get_overstays(ended_after=0)
+        self.bookings.settle_bookings()
+        scheduled = self.bookings.get_scheduled_bookings(2)
+        self.bookings.cancel_scheduled_booking(scheduled[0][0], 2)
+
+        BookingArchiver(self.db, older_than_days=0).run(now=datetime.now() + timedelta(days=2))
+        self.bookings.get_user_bookings(1, include_history=True)
+        self.bookings.get_bookings_page(limit=1, include_history=True, status='Completed', floor=1)
+        reports = ReportManager(self.db)
+        reports.get_report('2020-01-01', '2020-12-31', group_by=['floor', 'slot_type'], floor=1)
+        reports.get_report('2020-01-01', '2020-01-02', granularity='hour')
+
+        self.slots.get_all_slots()
+        self.slots.get_slot_by_id(slot_id)
+        self.slots.get_slot_statistics()
+        self.slots.count_available_slots()
+        self.slots.update_slot(slot_id, slot_type='VIP')
+        self.slots.update_slot_status(slot_id, 'Available')
+        self.slots.update_slot(slot_id, priority=5)
+        self.slots.add_slot('C1', 'Regular', 3, priority=2)
+        self.slots.add_slots_bulk([{'slot_number': 'C2', 'floor': 3, 'priority': 1}, {'slot_number': 'A1', 'floor': 1}])
+        self.slots.delete_slot(self.slots.get_all_slots()[-1][0])
+
+    def explain(self, sql):
+        with self.db.pool.connection() as conn:
+            return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+
+    def test_manager_queries_use_indexes(self):
+        self.exercise_managers()
+
+        with self.db.pool.connection() as conn:
+            conn.set_trace_callback(None)
+
+        checked = 0
+        for sql in dict.fromkeys(self.statements):
+            verb = sql.strip().split(None, 1)[0].upper()
+            if verb not in ('SELECT', 'UPDATE', 'DELETE', 'INSERT'):
+                continue
+            for detail in self.explain(sql):
+                match = BARE_SCAN.match(detail)
+                if match and match.group(1) not in SCAN_ALLOWED:
+                    self.fail(f"Full table scan ({detail}) in query:\n{sql}")
+            checked += 1
+
+        self.assertGreater(checked, 10)
+
+    def test_migrations_recorded(self):
+        version = self.db.fetch_one("SELECT MAX(version) FROM schema_version")[0]
+        self.assertEqual(version, max(m['version'] for m in SchemaMigrator.MIGRATIONS))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,235 @@
+"""
+Storage backend tests
+Runs the same booking scenario on the SQLite and in-memory repositories and
+expects identical answers, then serves the web app from the memory backend.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from config import Config
+from database.connection_pool import ConnectionPool
+from database.lot_router import LotRouter
+from modules.event_bus import EventBus
+from modules.storage import Storage
+from utils.helpers import Helper
+
+
+def run_scenario(storage):
+    """Drive one lot through registration, slots, bookings and checkouts; returns what it saw"""
+    users, slots, bookings = storage.users, storage.slots(), storage.bookings()
+    seen = []
+
+    for i in range(3):
+        seen.append(users.register_user(f'driver{i}', 'secret1', f'driver{i}@example.com',
+                                        f'98765432{i:02d}', f'ka01ab{i:04d}'))
+    seen.append(users.register_user('driver0', 'secret1', 'other@example.com', '9876543299', 'KA01AB9999'))
+    seen.append(users.user_login('driver1', 'secret1'))
+    seen.append(users.user_login('driver1', 'wrong'))
+    seen.append(users.admin_login('admin', 'admin123'))
+    seen.append(users.get_user_profile(2))
+
+    seen.append(slots.add_slot('a1', 'Regular', 1, priority=5))
+    seen.append(slots.add_slot('A1', 'Regular', 1))
+    seen.append(slots.add_slots_bulk([
+        {'slot_number': 'A2', 'floor': 1, 'priority': 1},
+        {'slot_number': 'B1', 'floor': 2},
+        {'slot_number': 'B2', 'slot_type': 'VIP', 'floor': 2},
+        {'slot_number': 'A1'},
+        {'slot_number': 'C1', 'slot_type': 'Rocket'},
+    ]))
+    seen.append(slots.update_slot(3, priority=0))
+    seen.append([row[:5] + row[6:] for row in slots.get_all_slots()])
+
+    # Auto-assign on floor 2 takes B1; an explicit slot; then conflicts
+    seen.append({k: v for k, v in bookings.book_slot(1, None, 'KA01AB0000', floor=2).items() if k != 'booking_time'})
+    seen.append({k: v for k, v in bookings.book_slot(2, 1, 'KA01AB0001', package='full_day').items()
+                 if k != 'booking_time'})
+    seen.append(bookings.book_slot(3, 1, 'KA01AB0002'))
+    seen.append(bookings.book_slot(1, 2, 'KA01AB0000'))
+    start = (datetime.now() + timedelta(hours=3)).strftime("%Y-%m-%d %H:%M")
+    seen.append(bookings.book_slot(3, 2, 'KA01AB0002', *start.split(' '))['is_scheduled'])
+
+    seen.append(slots.get_available_slots())
+    seen.append((slots.get_available_floors(), slots.count_available_slots(), slots.get_slot_statistics()))
+    seen.append(bookings.get_active_booking(2)[1:4] + bookings.get_active_booking(2)[5:])
+    seen.append([row[:4] + row[6:8] for row in bookings.get_user_bookings(3)])
+    seen.append([row[1:4] for row in bookings.get_scheduled_bookings(3)])
+    seen.append(slots.delete_slot(1))
+
+    page = bookings.get_bookings_page('all', limit=2)
+    seen.append(([row[1:4] + row[5:7] for row in page['bookings']], page['next_cursor'] is not None))
+    seen.append([row[1:5] for row in bookings.get_bookings_page('all', limit=2, cursor=page['next_cursor'])['bookings']])
+    seen.append([row[1:5] for row in bookings.get_bookings_page('active', limit=5)['bookings']])
+
+    fleet = bookings.book_fleet(3, ['KA01FL0001', 'KA01AB0000', 'bad!'], atomic=False)
+    seen.append(([booking['slot_number'] for booking in fleet['booked']], fleet['errors'], fleet['cost']))
+    seen.append(bookings.book_fleet(3, ['KA01FL0002', 'KA01FL0003'])['errors'])
+
+    later = datetime.now() + timedelta(hours=2)
+    seen.append([(overstay['slot_number'], overstay['package']) for overstay in bookings.get_overstays(now=later)])
+    preview = bookings.settle_bookings(overstayed=True, dry_run=True, now=later)
+    seen.append((preview['settled'], preview['by_floor'], preview['booking_ids']))
+    seen.append({k: v for k, v in bookings.checkout_fleet(3).items() if k != 'checked_out'})
+
+    checkout = bookings.cancel_booking(bookings.get_active_booking(1)[0], 1)
+    seen.append({k: v for k, v in checkout.items() if k not in ('checkout_time', 'duration')})
+    seen.append(bookings.cancel_booking(1, 1)['success'])
+    scheduled_id = bookings.get_scheduled_bookings(3)[0][0]
+    seen.append(bookings.cancel_scheduled_booking(scheduled_id, 3))
+    seen.append(bookings.get_booking_statistics())
+    seen.append(slots.get_slot_statistics())
+    return seen
+
+
+class StorageBackendTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'parity.db')
+
+    def tearDown(self):
+        ConnectionPool.discard(self.path)
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_memory_backend_matches_sqlite(self):
+        sqlite = Storage('sqlite', router=LotRouter(lots={'main': self.path}))
+        memory = Storage('memory')
+
+        for step, (expected, actual) in enumerate(zip(run_scenario(sqlite), run_scenario(memory))):
+            self.assertEqual(actual, expected, f'step {step}')
+
+    def test_memory_backend_activates_scheduled_bookings(self):
+        storage = Storage('memory')
+        storage.users.register_user('driver0', 'secret1', 'driver0@example.com', '9876543200', 'KA01AB0000')
+        slots, bookings = storage.slots(), storage.bookings()
+        slots.add_slot('A1', 'Regular', 1)
+        start = datetime.now() + timedelta(minutes=30)
+        bookings.book_slot(1, 1, 'KA01AB0000', start.strftime("%Y-%m-%d"), start.strftime("%H:%M"))
+        booking_id = bookings.get_pending_schedule()[0][0]
+
+        self.assertEqual(bookings.activate_due_bookings([booking_id], now=start - timedelta(minutes=1))['waiting'],
+                         [(booking_id, bookings.get_pending_schedule()[0][1])])
+        self.assertEqual(bookings.activate_due_bookings([booking_id], now=start + timedelta(minutes=1))['activated'],
+                         [booking_id])
+        self.assertEqual(slots.get_slot_by_id(1)[3], 'Occupied')
+        self.assertEqual(bookings.get_pending_schedule(), [])
+
+    def test_floor_channels_carry_no_booking_events(self):
+        for storage in (Storage('sqlite', router=LotRouter(lots={'main': self.path})), Storage('memory')):
+            bus = EventBus.for_database(storage.database())
+            floors = bus.subscribe([EventBus.floor_channel(1), EventBus.floor_channel(2)])
+            admin = bus.subscribe([EventBus.ADMIN_CHANNEL])
+            run_scenario(storage)
+            bookings = storage.bookings()
+            start = datetime.now() + timedelta(minutes=30)
+            bookings.book_slot(1, storage.slots().get_available_slots()[0][0], 'KA01AB0000',
+                               start.strftime("%Y-%m-%d"), start.strftime("%H:%M"))
+            bookings.activate_due_bookings([bookings.get_pending_schedule()[0][0]], now=start + timedelta(minutes=1))
+
+            floor_types = {event['type'] for event in iter(lambda: floors.get(timeout=0), None)}
+            admin_types = {event['type'] for event in iter(lambda: admin.get(timeout=0), None)}
+            self.assertIn('slot.status', floor_types)
+            self.assertEqual({event_type for event_type in floor_types if not event_type.startswith('slot.')}, set())
+            self.assertTrue({'booking.active', 'booking.scheduled', 'booking.completed',
+                             'booking.cancelled'} <= admin_types)
+
+    def test_memory_status_listings_follow_status_changes(self):
+        storage = Storage('memory')
+        run_scenario(storage)
+        store, bookings = storage.database(), storage.bookings()
+
+        for status in ('Active', 'Completed', 'Cancelled', 'Scheduled'):
+            expected = sorted(((booking['booking_ts'] or 0, booking['id'])
+                               for booking in store.bookings_with_status(status)), reverse=True)
+            self.assertEqual([row[0] for row in bookings.get_all_bookings(status=status)],
+                             [booking_id for _, booking_id in expected], status)
+
+    def test_pages_run_through_bookings_without_a_timestamp(self):
+        def add_sqlite(storage, booking_time):
+            with storage.database().transaction() as cursor:
+                cursor.execute("""
+                    INSERT INTO bookings (user_id, slot_id, vehicle_number, booking_time, status)
+                    VALUES (1, 1, 'KA01AB0000', ?, 'Completed')
+                """, (booking_time,))
+
+        def add_memory(storage, booking_time):
+            store = storage.database()
+            with store.lock:
+                store.insert_booking(user_id=1, slot_id=1, vehicle_number='KA01AB0000', booking_time=booking_time,
+                                     booking_ts=Helper.to_epoch(booking_time), status='Completed',
+                                     package_type='hourly', package_cost=50.0, expected_duration=1.0,
+                                     expected_end_ts=None)
+
+        for storage, add in ((Storage('sqlite', router=LotRouter(lots={'main': self.path})), add_sqlite),
+                             (Storage('memory'), add_memory)):
+            storage.users.register_user('driver0', 'secret1', 'driver0@example.com', '9876543200', 'KA01AB0000')
+            storage.slots().add_slot('A1', 'Regular', 1)
+            # Three dated bookings, then three legacy ones whose booking_time does not parse
+            for booking_time in ('2025-01-01 10:00:00', '2025-01-02 10:00:00', '2025-01-03 10:00:00',
+                                 'legacy', 'legacy', 'legacy'):
+                add(storage, booking_time)
+
+            seen, cursor = [], None
+            for _ in range(6):
+                page = storage.bookings().get_bookings_page(limit=2, cursor=cursor)
+                seen += [row[0] for row in page['bookings']]
+                cursor = page['next_cursor']
+                if cursor is None:
+                    break
+            self.assertEqual(seen, [3, 2, 1, 6, 5, 4])
+            self.assertIsNone(cursor)
+
+    def test_unknown_backend_is_rejected(self):
+        with self.assertRaises(ValueError):
+            Storage('postgres')
+
+
+class MemoryAppTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.mkdtemp()
+        # app.py opens its database at import time
+        with mock.patch.object(Config, 'DATABASE_NAME', os.path.join(cls.tmpdir, 'app.db')), \
+                mock.patch.object(Config, 'SCHEDULER_ENABLED', False):
+            import app
+        cls.web = app
+        cls.previous = app.storage
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.web.init_storage(cls.previous)
+        shutil.rmtree(cls.tmpdir, ignore_errors=True)
+
+    def setUp(self):
+        with mock.patch.object(Config, 'SCHEDULER_ENABLED', False):
+            self.web.init_storage(Storage('memory'))
+        self.client = self.web.app.test_client()
+
+    def test_booking_flow_on_memory_backend(self):
+        self.web.slot_manager.add_slot('M1', 'Regular', 1)
+        self.web.auth.register_user('memuser', 'secret1', 'mem@example.com', '9876543210', 'KA01AB1234')
+        self.client.post('/login', data={'username': 'memuser', 'password': 'secret1', 'role': 'user'})
+
+        self.client.post('/user/book-slot', data={'slot_id': 1, 'vehicle_number': 'KA01AB1234',
+                                                  'package': 'hourly', 'booking_time_option': 'now'})
+        active = self.client.get('/api/booking/active').get_json()
+
+        self.assertEqual(active['booking']['slot_number'], 'M1')
+        self.assertEqual(self.client.get('/api/slots/floor/1').get_json(), [])
+
+    def test_sql_routes_report_unavailable(self):
+        with self.client.session_transaction() as session:
+            session['user_id'] = 1
+            session['role'] = 'admin'
+
+        self.assertEqual(self.client.get('/api/reports?from=2025-01-01').status_code, 501)
+        self.assertEqual(self.client.get('/api/stats').get_json()['slots']['total'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+"""
+Batch billing utilities
+Array versions of Helper.calculate_duration / calculate_cost and the checkout
+cost rule, for reconciling large numbers of bookings at once
+"""
+
+from datetime import datetime
+
+from utils.helpers import Helper, TIME_FORMAT
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the pure-Python path gives the same results
+    np = None
+
+DEFAULT_RATE = 50
+DEFAULT_PACKAGE_COST = 50.0
+DEFAULT_EXPECTED_DURATION = 1.0
+
+
+class BillingEngine:
+    """Vectorized duration and cost calculation.
+
+    Every method matches the scalar path in Helper and BookingManager.cancel_booking
+    element for element, including its rounding and its fallbacks for missing
+    or unparseable values.
+    """
+
+    @staticmethod
+    def checkout_cost(duration, package_cost=None, expected_duration=None, rate_per_hour=DEFAULT_RATE):
+        """Cost charged at checkout for one booking (duration already rounded to hours)"""
+        package_cost = package_cost if package_cost else DEFAULT_PACKAGE_COST
+        expected_duration = expected_duration if expected_duration else DEFAULT_EXPECTED_DURATION
+
+        # Package cost, or the hourly rate when that is higher and the stay overran the package
+        if duration > expected_duration:
+            hourly_cost = rate_per_hour if duration < 1 else round(duration * rate_per_hour, 2)
+            return round(max(package_cost, hourly_cost), 2)
+        return round(package_cost, 2)
+
+    @staticmethod
+    def _parse_seconds(values, memo):
+        """Timestamp strings -> epoch seconds (None where unparseable), parsing each distinct value once"""
+        seconds = []
+        for value in values:
+            if value not in memo:
+                memo[value] = Helper.to_epoch(value)
+            seconds.append(memo[value])
+        return seconds
+
+    @staticmethod
+    def _round2(values):
+        """round(x, 2) over a float64 array, bit-identical to Python's round"""
+        scaled = values * 100
+        result = np.rint(scaled) / 100
+        # np.rint works on the scaled binary value; near a .5 tie Python's
+        # correctly-rounded decimal result can differ, so defer to it there
+        fraction = np.abs(scaled - np.floor(scaled) - 0.5)
+        for i in np.nonzero(fraction < 1e-6)[0]:
+            result[i] = round(float(values[i]), 2)
+        return result
+
+    @classmethod
+    def durations(cls, start_times, end_times=None, now=None):
+        """Parking durations in hours (rounded to 2 places); open bookings run until now"""
+        now_str = (now or datetime.now()).strftime(TIME_FORMAT)
+        count = len(start_times)
+        if end_times is None:
+            end_times = [None] * count
+        if len(end_times) != count:
+            raise ValueError('start_times and end_times must have the same length')
+
+        memo = {}
+        starts = cls._parse_seconds(start_times, memo)
+        ends = cls._parse_seconds([end or now_str for end in end_times], memo)
+        return cls.epoch_durations(starts, ends)
+
+    @classmethod
+    def epoch_durations(cls, starts, ends):
+        """Durations in hours between integer epoch columns (0 where either side is missing)"""
+        if len(starts) != len(ends):
+            raise ValueError('starts and ends must have the same length')
+
+        if np is None:
+            return [
+                round((end - start) / 3600, 2) if start is not None and end is not None else 0
+                for start, end in zip(starts, ends)
+            ]
+
+        valid = np.array([s is not None and e is not None for s, e in zip(starts, ends)], dtype=bool)
+        start_arr = np.array([s if s is not None else 0 for s in starts], dtype=np.int64)
+        end_arr = np.array([e if e is not None else 0 for e in ends], dtype=np.int64)
+        hours = cls._round2((end_arr - start_arr) / 3600)
+        return np.where(valid, hours, 0).tolist()
+
+    @classmethod
+    def checkout_costs(cls, durations, package_costs=None, expected_durations=None, rate_per_hour=DEFAULT_RATE):
+        """checkout_cost applied to arrays of durations and package fields"""
+        count = len(durations)
+        package_costs = package_costs if package_costs is not None else [None] * count
+        expected_durations = expected_durations if expected_durations is not None else [None] * count
+        if not len(package_costs) == len(expected_durations) == count:
+            raise ValueError('durations and package fields must have the same length')
+
+        if np is None:
+            return [
+                cls.checkout_cost(duration, package_cost, expected, rate_per_hour)
+                for duration, package_cost, expected in zip(durations, package_costs, expected_durations)
+            ]
+
+        duration_arr = np.asarray(durations, dtype=np.float64)
+        package_arr = np.array([p if p else DEFAULT_PACKAGE_COST for p in package_costs], dtype=np.float64)
+        expected_arr = np.array([e if e else DEFAULT_EXPECTED_DURATION for e in expected_durations],
+                                dtype=np.float64)
+
+        hourly = np.where(duration_arr < 1, float(rate_per_hour), cls._round2(duration_arr * rate_per_hour))
+        overran = duration_arr > expected_arr
+        cost = np.where(overran, np.maximum(package_arr, hourly), package_arr)
+        return cls._round2(cost).tolist()
+
+    @classmethod
+    def bill(cls, start_times, end_times=None, package_costs=None, expected_durations=None,
+             now=None, rate_per_hour=DEFAULT_RATE):
+        """Durations and checkout costs for a batch of bookings"""
+        durations = cls.durations(start_times, end_times, now=now)
+        costs = cls.checkout_costs(durations, package_costs, expected_durations, rate_per_hour)
+        return {
+            'durations': durations,
+            'costs': costs,
+            'total': round(sum(costs), 2)
+        }
@@ -0,0 +1,96 @@
+"""
+Cache utilities
+Thread-safe bounded LRU cache with hit/miss accounting
+"""
+
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Bounded least-recently-used cache.
+
+    None is a legitimate cached value (e.g. "user has no active booking"),
+    so lookups use a private sentinel to tell a miss from a cached None.
+    """
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._invalidations = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the cached value and mark it recently used"""
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entry when full"""
+        with self._lock:
+            self._store(key, value)
+
+    def _store(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_load(self, key, loader):
+        """Return the cached value, calling loader() on a miss.
+
+        A value loaded while an invalidation happened is returned but not
+        stored, so a slow read can never re-insert data a writer just expired.
+        """
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is not _MISSING:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+            generation = self._invalidations
+
+        value = loader()
+
+        with self._lock:
+            if generation == self._invalidations:
+                self._store(key, value)
+        return value
+
+    def invalidate(self, *keys):
+        """Drop the given keys"""
+        with self._lock:
+            self._invalidations += 1
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._invalidations += 1
+            self._data.clear()
+
+    def stats(self):
+        """Size and hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups * 100, 2) if lookups else 0.0
+            }
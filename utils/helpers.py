@@ -2,7 +2,22 @@
 Helper utilities for common operations
 """
 
-from datetime import datetime
+import calendar
+import re
+from datetime import datetime, timezone
+from functools import lru_cache
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+_CANONICAL_TIME = re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2} [0-9]{2}:[0-9]{2}:[0-9]{2}$')
+
+
+@lru_cache(maxsize=65536)
+def _format_datetime(dt_string):
+    try:
+        dt = datetime.strptime(dt_string, TIME_FORMAT)
+        return dt.strftime("%d-%b-%Y %I:%M %p")
+    except (TypeError, ValueError):
+        return dt_string
 
 
 class Helper:
@@ -10,14 +25,39 @@ class Helper:
     
     @staticmethod
     def format_datetime(dt_string):
-        """Format datetime string for display"""
+        """Format datetime string for display (memoized; booking times repeat across requests)"""
         if not dt_string:
             return "N/A"
+        return _format_datetime(dt_string)
+    
+    @staticmethod
+    def format_epoch(timestamp):
+        """Format an epoch column value for display"""
+        if timestamp is None:
+            return "N/A"
+        return _format_datetime(Helper.from_epoch(timestamp))
+    
+    @staticmethod
+    def to_epoch(dt_string):
+        """Convert a stored "%Y-%m-%d %H:%M:%S" time to the integer epoch columns' value.
+        
+        The wall-clock time is read as if it were UTC (like SQLite's strftime('%s')),
+        so differences and ordering match the string columns. None if unparseable.
+        """
         try:
-            dt = datetime.strptime(dt_string, "%Y-%m-%d %H:%M:%S")
-            return dt.strftime("%d-%b-%Y %I:%M %p")
-        except:
-            return dt_string
+            # fromisoformat is much faster and agrees with strptime on the canonical shape
+            if _CANONICAL_TIME.match(dt_string):
+                dt = datetime.fromisoformat(dt_string)
+            else:
+                dt = datetime.strptime(dt_string, TIME_FORMAT)
+        except (TypeError, ValueError):
+            return None
+        return calendar.timegm(dt.timetuple())
+    
+    @staticmethod
+    def from_epoch(timestamp):
+        """Convert an epoch column value back to the "%Y-%m-%d %H:%M:%S" string form"""
+        return datetime.fromtimestamp(timestamp, timezone.utc).strftime(TIME_FORMAT)
     
     @staticmethod
     def calculate_duration(start_time, end_time=None):
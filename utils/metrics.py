@@ -0,0 +1,144 @@
+"""
+Metrics utilities
+Request and query latency histograms exported in Prometheus text format
+"""
+
+import bisect
+import re
+import threading
+from functools import lru_cache
+
+# Upper bounds in seconds, shared by request and query histograms
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|TABLE)\s+([\w.]+)', re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def query_label(query):
+    """Stable low-cardinality name for an unnamed query, e.g. 'select bookings'"""
+    words = query.split(None, 1)
+    if not words:
+        return 'empty'
+    table = _TABLE.search(query)
+    return f"{words[0].lower()} {table.group(1).lower()}" if table else words[0].lower()
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram (not thread-safe on its own)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """(upper bound, observations <= bound) pairs ending with +Inf"""
+        total = 0
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            total += count
+            yield bound, total
+
+
+def _labels(**labels):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+class Metrics:
+    """Per-route and per-query latency, row and error counters.
+
+    One instance is shared by everything using a database (see for_database),
+    so the query instrumentation in DatabaseManager and the request timing in
+    app.py report through the same /metrics page.
+    """
+
+    PREFIX = 'smart_parking'
+
+    def __init__(self, db=None):
+        self._lock = threading.Lock()
+        self._requests = {}        # (route, method) -> Histogram
+        self._responses = {}       # (route, method, status) -> count
+        self._queries = {}         # name -> Histogram
+        self._query_rows = {}      # name -> rows returned or changed
+        self._query_errors = {}    # name -> failed executions
+
+    @classmethod
+    def for_database(cls, db):
+        """Return the shared metrics for a database"""
+        return db.shared('metrics', cls)
+
+    def observe_request(self, route, method, status, seconds):
+        """Record one HTTP request"""
+        with self._lock:
+            histogram = self._requests.get((route, method))
+            if histogram is None:
+                histogram = self._requests[(route, method)] = Histogram()
+            histogram.observe(seconds)
+            key = (route, method, status)
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def observe_query(self, name, seconds, rows=0, error=False):
+        """Record one query execution"""
+        with self._lock:
+            histogram = self._queries.get(name)
+            if histogram is None:
+                histogram = self._queries[name] = Histogram()
+                self._query_rows[name] = 0
+                self._query_errors[name] = 0
+            histogram.observe(seconds)
+            self._query_rows[name] += rows
+            if error:
+                self._query_errors[name] += 1
+
+    def _histogram_lines(self, metric, label_name, histograms):
+        lines = []
+        for key, histogram in sorted(histograms.items()):
+            labels = dict(zip(label_name, key if isinstance(key, tuple) else (key,)))
+            for bound, count in histogram.cumulative():
+                lines.append(f"{metric}_bucket{_labels(**labels, le=bound)} {count}")
+            lines.append(f"{metric}_sum{_labels(**labels)} {histogram.sum:.6f}")
+            lines.append(f"{metric}_count{_labels(**labels)} {histogram.count}")
+        return lines
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        p = self.PREFIX
+        with self._lock:
+            lines = [
+                f"# HELP {p}_http_request_duration_seconds Request latency by route.",
+                f"# TYPE {p}_http_request_duration_seconds histogram",
+            ]
+            lines += self._histogram_lines(f"{p}_http_request_duration_seconds",
+                                           ('route', 'method'), self._requests)
+            lines += [
+                f"# HELP {p}_http_responses_total Responses by route and status code.",
+                f"# TYPE {p}_http_responses_total counter",
+            ]
+            lines += [f"{p}_http_responses_total{_labels(route=r, method=m, status=s)} {count}"
+                      for (r, m, s), count in sorted(self._responses.items())]
+            lines += [
+                f"# HELP {p}_db_query_duration_seconds Query latency by query name.",
+                f"# TYPE {p}_db_query_duration_seconds histogram",
+            ]
+            lines += self._histogram_lines(f"{p}_db_query_duration_seconds", ('query',), self._queries)
+            lines += [
+                f"# HELP {p}_db_query_rows_total Rows returned or changed by query name.",
+                f"# TYPE {p}_db_query_rows_total counter",
+            ]
+            lines += [f"{p}_db_query_rows_total{_labels(query=name)} {rows}"
+                      for name, rows in sorted(self._query_rows.items())]
+            lines += [
+                f"# HELP {p}_db_query_errors_total Failed executions by query name.",
+                f"# TYPE {p}_db_query_errors_total counter",
+            ]
+            lines += [f"{p}_db_query_errors_total{_labels(query=name)} {errors}"
+                      for name, errors in sorted(self._query_errors.items())]
+        return '\n'.join(lines) + '\n'
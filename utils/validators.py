@@ -3,6 +3,7 @@ Validation utilities for input validation
 """
 
 import re
+from datetime import datetime
 
 
 class Validator:
@@ -45,3 +46,12 @@ class Validator:
         """Validate slot number format"""
         pattern = r'^[A-Z0-9-]{1,10}$'
         return re.match(pattern, slot_number.upper()) is not None
+    
+    @staticmethod
+    def validate_date(date_string):
+        """Validate date format (YYYY-MM-DD)"""
+        try:
+            datetime.strptime(date_string, "%Y-%m-%d")
+            return True
+        except (TypeError, ValueError):
+            return False